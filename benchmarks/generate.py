@@ -0,0 +1,240 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+基准测试数据生成器
+
+按固定随机种子生成Shopify产品导出文件和领星ERP产品文件，相同参数生成的文件内容完全一致。
+数据覆盖：多变体产品（变体行的品名、品牌、分类为空）、缺少品名的产品、
+超长SKU（截断后冲突）、含非法字符的SKU、重复SKU、HTML描述（含样式块和实体）、
+带前导零的条形码，以及GBK编码的导出文件。
+
+用法:
+  python benchmarks/generate.py --rows 10000 -o benchmarks/data
+"""
+
+import argparse
+import os
+import random
+import sys
+
+import pandas as pd
+
+
+# 默认随机种子
+DEFAULT_SEED = 20240101
+
+# Shopify导出文件的列（与Shopify后台导出的产品CSV一致）
+SHOPIFY_COLUMNS = [
+    'Handle', 'Title', 'Body (HTML)', 'Vendor', 'Product Category', 'Type', 'Tags', 'Published',
+    'Option1 Name', 'Option1 Value', 'Variant SKU', 'Variant Grams', 'Variant Barcode', 'Image Src',
+    'Cost per item', 'Status', 'SEO Title', '物品材质 (product.metafields.shopify.item-material)',
+]
+
+# 领星ERP产品文件的列
+ERP_COLUMNS = ['*SKU', '品名', '识别码', '品牌', '状态']
+
+VENDORS = ['Acme', 'Northwind', '优品家居', 'Blue Harbor', '星辰数码', 'Evergreen Outfitters']
+
+CATEGORIES = [
+    'Apparel & Accessories > Clothing > Shirts',
+    'Apparel & Accessories > Shoes',
+    'Electronics > Audio > Headphones',
+    'Electronics > Computers > Laptop Accessories',
+    'Home & Garden > Decor',
+    'Home & Garden > Kitchen & Dining > Tableware',
+    'Toys',
+    'Sporting Goods > Outdoor Recreation > Camping',
+]
+
+ADJECTIVES = ['Classic', 'Premium', 'Vintage', 'Portable', 'Wireless', 'Organic', '纯棉', '加厚', '便携式', '防水']
+
+NOUNS = ['T-Shirt', 'Hoodie', 'Headphones', 'Mug', 'Backpack', 'Lamp', '保温杯', '帆布包', '收纳盒', '运动鞋']
+
+OPTIONS = ['S', 'M', 'L', 'XL', '黑色', '白色', '蓝色', '红色']
+
+MATERIALS = ['Cotton', 'Polyester', '不锈钢', 'ABS', 'Leather', '']
+
+STATUSES = ['active', 'active', 'active', 'draft', 'archived', '']
+
+# 超长SKU的公共前缀（截断到50字符后互相冲突）
+LONG_SKU_PREFIX = 'BENCH-VERY-LONG-SKU-PREFIX-FOR-TRUNCATION-TESTS-'
+
+
+def generate_shopify(rows, seed=DEFAULT_SEED):
+    """
+    生成Shopify产品导出数据
+    
+    Args:
+        rows: 总行数（包括变体行）
+        seed: 随机种子
+    
+    Returns:
+        DataFrame（所有值都是字符串，空值为空字符串）
+    """
+    rng = random.Random(seed)
+    records = []
+    product = 0
+    
+    while len(records) < rows:
+        product += 1
+        handle = f'bench-product-{product}'
+        title = f'{rng.choice(ADJECTIVES)} {rng.choice(NOUNS)} {product}'
+        if rng.random() < 0.02:
+            # 缺少品名的产品
+            title = ''
+        variants = min(rng.choice([1, 1, 1, 2, 3, 4]), rows - len(records))
+        
+        for variant in range(1, variants + 1):
+            first = variant == 1
+            records.append({
+                'Handle': handle,
+                'Title': title if first else '',
+                'Body (HTML)': _body_html(rng, title, product) if first else '',
+                'Vendor': rng.choice(VENDORS) if first else '',
+                'Product Category': (rng.choice(CATEGORIES) if rng.random() > 0.05 else '') if first else '',
+                'Type': '',
+                'Tags': 'bench' if first else '',
+                'Published': 'TRUE' if first else '',
+                'Option1 Name': 'Option' if first else '',
+                'Option1 Value': rng.choice(OPTIONS),
+                'Variant SKU': _variant_sku(rng, product, variant, records),
+                'Variant Grams': str(rng.randint(50, 5000)) if rng.random() > 0.1 else '',
+                'Variant Barcode': f'{rng.randint(0, 10 ** 13 - 1):013d}' if rng.random() > 0.2 else '',
+                'Image Src': f'https://cdn.example.com/products/{handle}-{variant}.jpg' if first else '',
+                'Cost per item': f'{rng.uniform(1, 200):.2f}' if rng.random() > 0.1 else '',
+                'Status': rng.choice(STATUSES) if first else '',
+                'SEO Title': title if first else '',
+                '物品材质 (product.metafields.shopify.item-material)': rng.choice(MATERIALS) if first else '',
+            })
+    
+    return pd.DataFrame(records, columns=SHOPIFY_COLUMNS)
+
+
+def _variant_sku(rng, product, variant, records):
+    """生成变体SKU：大部分正常，少量超长、含非法字符、为空或与前一行重复"""
+    roll = rng.random()
+    if roll < 0.03:
+        return f'{LONG_SKU_PREFIX}{product}-{variant}'
+    if roll < 0.05:
+        return f'BP {product} 变体{variant}'
+    if roll < 0.07:
+        # SKU为空时使用Handle
+        return ''
+    if roll < 0.08 and records:
+        return records[-1]['Variant SKU']
+    return f'BP-{product:07d}-{variant}'
+
+
+def _body_html(rng, title, product):
+    """生成HTML描述：段落、列表、实体，少量超长描述带有样式块"""
+    paragraphs = [
+        f'<p>{title or "Product"} &amp; accessories &mdash; item {product}.</p>',
+        '<ul>' + ''.join(f'<li>Feature {i}: 高品质&nbsp;材料</li>' for i in range(rng.randint(1, 4))) + '</ul>',
+    ]
+    if rng.random() < 0.1:
+        paragraphs.insert(0, '<style>.spec td { padding: 4px; border: 1px solid #ccc; }</style>')
+        paragraphs.extend(f'<p>Detailed specification paragraph {i} for product {product}.</p>' for i in range(40))
+    return '\n'.join(paragraphs)
+
+
+def generate_erp(shopify_df, seed=DEFAULT_SEED):
+    """
+    生成与Shopify数据部分对应的领星ERP产品数据（行数与Shopify数据相同）
+    
+    约60%的行与Shopify变体对应：SKU相同，品名相同或略有改动（供模糊匹配），
+    部分条形码相同；其余为无关产品。行顺序随机打乱。
+    
+    Args:
+        shopify_df: generate_shopify生成的数据
+        seed: 随机种子
+    
+    Returns:
+        DataFrame（所有值都是字符串，空值为空字符串）
+    """
+    rng = random.Random(seed + 1)
+    titles = shopify_df['Title'].where(shopify_df['Title'] != '').ffill().fillna('')
+    records = []
+    
+    for sku, title, barcode in zip(shopify_df['Variant SKU'], titles, shopify_df['Variant Barcode']):
+        if rng.random() < 0.6 and sku:
+            if rng.random() < 0.3:
+                title = _perturb_title(rng, title)
+            records.append({
+                '*SKU': sku,
+                '品名': title,
+                '识别码': barcode if rng.random() < 0.5 else '',
+                '品牌': rng.choice(VENDORS),
+                '状态': '在售',
+            })
+        else:
+            number = len(records) + 1
+            records.append({
+                '*SKU': f'ERP-{number:08d}',
+                '品名': f'{rng.choice(ADJECTIVES)} {rng.choice(NOUNS)} ERP{number}',
+                '识别码': f'{rng.randint(0, 10 ** 13 - 1):013d}' if rng.random() > 0.5 else '',
+                '品牌': rng.choice(VENDORS),
+                '状态': rng.choice(['在售', '停售']),
+            })
+    
+    rng.shuffle(records)
+    return pd.DataFrame(records, columns=ERP_COLUMNS)
+
+
+def _perturb_title(rng, title):
+    """轻微改动品名：增加后缀、调整大小写或删除一个字符"""
+    if not title:
+        return title
+    roll = rng.random()
+    if roll < 0.4:
+        return f'{title} New'
+    if roll < 0.7:
+        return title.upper()
+    position = rng.randrange(len(title))
+    return title[:position] + title[position + 1:]
+
+
+def write_dataset(rows, output_dir, seed=DEFAULT_SEED):
+    """
+    生成并写入一组基准数据，已存在的文件直接复用
+    
+    Args:
+        rows: 总行数
+        output_dir: 输出目录
+        seed: 随机种子
+    
+    Returns:
+        {'shopify': UTF-8导出文件, 'shopify_gbk': GBK导出文件, 'erp': ERP产品文件(xlsx)}
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    prefix = os.path.join(output_dir, f'{rows}_{seed}')
+    paths = {
+        'shopify': f'{prefix}_shopify.csv',
+        'shopify_gbk': f'{prefix}_shopify_gbk.csv',
+        'erp': f'{prefix}_erp.xlsx',
+    }
+    if all(os.path.exists(path) for path in paths.values()):
+        return paths
+    
+    print(f"正在生成 {rows} 行基准数据: {output_dir}")
+    shopify_df = generate_shopify(rows, seed)
+    shopify_df.to_csv(paths['shopify'], index=False, encoding='utf-8')
+    shopify_df.to_csv(paths['shopify_gbk'], index=False, encoding='gbk')
+    generate_erp(shopify_df, seed).to_excel(paths['erp'], index=False)
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description='生成基准测试数据')
+    parser.add_argument('--rows', type=int, required=True, help='Shopify导出文件的总行数（ERP文件行数相同）')
+    parser.add_argument('-o', '--output-dir', default=os.path.join(os.path.dirname(__file__), 'data'),
+                        help='输出目录（默认：benchmarks/data）')
+    parser.add_argument('--seed', type=int, default=DEFAULT_SEED, help=f'随机种子（默认：{DEFAULT_SEED}）')
+    args = parser.parse_args()
+    
+    for name, path in write_dataset(args.rows, args.output_dir, args.seed).items():
+        print(f"  {name}: {path}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
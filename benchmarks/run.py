@@ -0,0 +1,199 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+转换和配对的基准测试
+
+用generate.py生成的确定性数据，计时 convert（UTF-8和GBK导出）以及
+sku/title/barcode/fuzzy 四种配对方法，并与保存的基准结果比较：
+- 结果指纹（输出文件全部sheet内容的哈希）不一致：输出发生了变化
+- 耗时超过基准的 --tolerance 倍（且至少慢 --min-delta 秒）：性能退化
+有任一情况时退出码为1。
+
+基准耗时与机器相关，在发布用的机器上用 --update-baseline 重新记录。
+
+用法:
+  python benchmarks/run.py                          # 默认 1k,10k
+  python benchmarks/run.py --sizes 1k,10k,100k,1m --cases convert,sku
+  python benchmarks/run.py --update-baseline
+"""
+
+import argparse
+import contextlib
+import hashlib
+import json
+import os
+import sys
+import tempfile
+import time
+
+from openpyxl import load_workbook
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCHMARK_DIR))
+sys.path.insert(0, BENCHMARK_DIR)
+
+from src.converter import ShopifyToLingxinConverter
+from src.matcher import ProductMatcher
+from generate import write_dataset, DEFAULT_SEED
+
+
+# 全部基准用例
+CASES = ['convert', 'convert_gbk', 'sku', 'title', 'barcode', 'fuzzy']
+
+# 默认规模
+DEFAULT_SIZES = '1k,10k'
+
+# 模糊匹配比精确匹配慢得多，超过该行数的规模默认跳过
+FUZZY_MAX_ROWS = 10000
+
+# 每个用例的默认执行次数（取最短耗时，减少计时波动）
+DEFAULT_REPEAT = 3
+
+DEFAULT_BASELINE = os.path.join(BENCHMARK_DIR, 'baseline.json')
+
+
+def parse_size(size):
+    """解析规模：1k=1000, 1m=1000000，也可以直接写行数"""
+    size = size.strip().lower()
+    if size.endswith('k'):
+        return int(size[:-1]) * 1000
+    if size.endswith('m'):
+        return int(size[:-1]) * 1000000
+    return int(size)
+
+
+def fingerprint(output_path):
+    """输出文件（包括CSV输出的附加sheet文件）全部内容的哈希"""
+    digest = hashlib.sha256()
+    if output_path.endswith('.xlsx'):
+        workbook = load_workbook(output_path, read_only=True)
+        for worksheet in workbook.worksheets:
+            digest.update(worksheet.title.encode('utf-8'))
+            for row in worksheet.iter_rows(values_only=True):
+                digest.update(repr(row).encode('utf-8'))
+        workbook.close()
+    else:
+        root, ext = os.path.splitext(output_path)
+        directory = os.path.dirname(output_path)
+        paths = [output_path] + sorted(
+            os.path.join(directory, name) for name in os.listdir(directory)
+            if os.path.join(directory, name).startswith(f'{root}_') and name.endswith(ext)
+        )
+        for path in paths:
+            with open(path, 'rb') as f:
+                digest.update(f.read())
+    return digest.hexdigest()[:16]
+
+
+def run_case(case, dataset, output_dir, output_format):
+    """
+    执行一次用例
+    
+    Returns:
+        (耗时秒数, 结果指纹)
+    """
+    output_path = os.path.join(output_dir, f'{case}.{output_format}')
+    
+    # 转换和配对会逐条打印警告，计时时不输出到终端
+    with open(os.devnull, 'w', encoding='utf-8') as devnull, contextlib.redirect_stdout(devnull):
+        started = time.perf_counter()
+        if case in ('convert', 'convert_gbk'):
+            source = dataset['shopify'] if case == 'convert' else dataset['shopify_gbk']
+            ShopifyToLingxinConverter().convert(source, output_path, output_format=output_format)
+        else:
+            # 不使用Excel解析缓存，每次都计入解析ERP文件的耗时
+            ProductMatcher(cache_dir=None).match(dataset['shopify'], dataset['erp'], output_path,
+                                   match_method=case, shop_name='Bench', output_format=output_format)
+        seconds = time.perf_counter() - started
+    
+    return seconds, fingerprint(output_path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='转换和配对的基准测试')
+    parser.add_argument('--sizes', default=DEFAULT_SIZES,
+                        help=f'数据规模，逗号分隔，如 1k,10k,100k,1m（默认：{DEFAULT_SIZES}）')
+    parser.add_argument('--cases', default=','.join(CASES),
+                        help=f'基准用例，逗号分隔（默认全部：{",".join(CASES)}）')
+    parser.add_argument('--fuzzy-max-rows', type=int, default=FUZZY_MAX_ROWS,
+                        help=f'超过该规模时跳过模糊匹配（默认：{FUZZY_MAX_ROWS}）')
+    parser.add_argument('--format', dest='output_format', choices=['xlsx', 'csv'], default='xlsx',
+                        help='输出格式（默认：xlsx）')
+    parser.add_argument('--data-dir', default=os.path.join(BENCHMARK_DIR, 'data'),
+                        help='基准数据目录（默认：benchmarks/data，已存在的数据直接复用）')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help='基准结果文件（默认：benchmarks/baseline.json）')
+    parser.add_argument('--update-baseline', action='store_true', help='用本次结果更新基准结果文件')
+    parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT,
+                        help=f'每个用例的执行次数，取最短耗时（默认：{DEFAULT_REPEAT}，模糊匹配只执行一次）')
+    parser.add_argument('--tolerance', type=float, default=1.5,
+                        help='耗时超过基准的倍数时视为性能退化（默认：1.5）')
+    parser.add_argument('--min-delta', type=float, default=0.25,
+                        help='比基准慢不到该秒数时不视为性能退化，避免短用例的计时波动（默认：0.25）')
+    parser.add_argument('--seed', type=int, default=DEFAULT_SEED, help=f'随机种子（默认：{DEFAULT_SEED}）')
+    args = parser.parse_args()
+    
+    cases = [case.strip() for case in args.cases.split(',')]
+    unknown = [case for case in cases if case not in CASES]
+    if unknown:
+        print(f"❌ 错误：未知的基准用例: {', '.join(unknown)}（可选：{', '.join(CASES)}）")
+        return 1
+    
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+    
+    results = {}
+    failures = 0
+    print(f"{'规模':>8}  {'用例':<12}{'耗时(秒)':>10}{'基准(秒)':>10}{'倍数':>8}  结果")
+    
+    for size in args.sizes.split(','):
+        rows = parse_size(size)
+        key = f'{rows}_{args.output_format}'
+        dataset = write_dataset(rows, args.data_dir, args.seed)
+        results[key] = {}
+        
+        for case in cases:
+            if case == 'fuzzy' and rows > args.fuzzy_max_rows:
+                print(f"{rows:>8}  {case:<12}{'跳过（超过 --fuzzy-max-rows）':>10}")
+                continue
+            
+            timings = []
+            for _ in range(1 if case == 'fuzzy' else max(args.repeat, 1)):
+                with tempfile.TemporaryDirectory() as output_dir:
+                    seconds, result = run_case(case, dataset, output_dir, args.output_format)
+                timings.append(seconds)
+            seconds = min(timings)
+            results[key][case] = {'seconds': round(seconds, 3), 'fingerprint': result}
+            
+            expected = baseline.get(key, {}).get(case)
+            if expected is None:
+                print(f"{rows:>8}  {case:<12}{seconds:>10.2f}{'-':>10}{'-':>8}  无基准")
+                continue
+            
+            ratio = seconds / expected['seconds'] if expected['seconds'] else 0
+            status = []
+            if result != expected['fingerprint']:
+                status.append('✗ 结果变化')
+            if ratio > args.tolerance and seconds - expected['seconds'] > args.min_delta:
+                status.append('✗ 变慢')
+            failures += bool(status)
+            print(f"{rows:>8}  {case:<12}{seconds:>10.2f}{expected['seconds']:>10.2f}{ratio:>8.2f}  "
+                  f"{'，'.join(status) or '✓'}")
+    
+    if args.update_baseline:
+        for key, case_results in results.items():
+            baseline.setdefault(key, {}).update(case_results)
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(baseline, f, ensure_ascii=False, indent=2, sort_keys=True)
+        print(f"\n已更新基准结果: {args.baseline}")
+        return 0
+    
+    if failures:
+        print(f"\n❌ {failures} 个用例与基准不一致")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -5,6 +5,7 @@ Shopify产品转领星ERP工具 - 命令行主入口
 """
 
 import argparse
+import glob
 import sys
 import os
 
@@ -13,16 +14,69 @@ sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
 
 from src.converter import ShopifyToLingxinConverter
 from src.matcher import ProductMatcher
+from src.writer import OUTPUT_FORMATS
+from src.profiler import PROFILE_MODES
+from src.match_keys import KEY_KINDS
+from src.frame_cache import DEFAULT_CACHE_DIR
+
+
+# --match-key 参数的说明（match 和 index-erp 共用）
+MATCH_KEY_HELP = ('指定列的配对键规范化方式，可重复使用；方式：sku=全角转半角、合并空白（区分大小写）, '
+                  'barcode=数字条形码去掉前导零并补全省略的校验位, title=全角转半角、合并空白并忽略大小写, '
+                  'text=只去掉首尾空白（默认SKU列按sku、条形码列按barcode、品名列按title）')
+
+
+def expand_inputs(patterns):
+    """展开输入文件中的通配符（Windows命令行不会自动展开），保持给出的顺序"""
+    paths = []
+    for pattern in patterns:
+        matches = sorted(glob.glob(pattern)) if glob.has_magic(pattern) else []
+        paths.extend(matches or [pattern])
+    return paths
+
+
+def positive_int(value):
+    """命令行参数：正整数"""
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"必须是正整数: {value}")
+    return number
+
+
+def key_kind(value):
+    """命令行参数：列名=配对键规范化方式"""
+    column, separator, kind = value.rpartition('=')
+    if not separator or not column or kind not in KEY_KINDS:
+        raise argparse.ArgumentTypeError(f"格式应为 列名=方式（方式: {', '.join(KEY_KINDS)}）: {value}")
+    return column, kind
+
+
+def add_cache_arguments(parser):
+    """添加Excel解析结果缓存的参数（match 和 index-erp 共用）"""
+    parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR, metavar='DIR',
+                        help=f'xlsx文件解析结果的缓存目录，同一个文件再次读取时不再解析Excel（默认：{DEFAULT_CACHE_DIR}）')
+    parser.add_argument('--no-cache', action='store_true', help='不使用xlsx解析结果缓存')
 
 
 def convert_command(args):
     """转换命令"""
     converter = ShopifyToLingxinConverter()
+    inputs = expand_inputs(args.input)
+    
+    if len(inputs) > 1 or args.merge:
+        return batch_convert_command(converter, inputs, args)
     
     try:
         output_path = converter.convert(
-            shopify_csv_path=args.input,
-            output_path=args.output
+            shopify_csv_path=inputs[0],
+            output_path=args.output,
+            stream=args.stream,
+            chunk_size=args.chunk_size,
+            output_format=args.output_format,
+            workers=args.workers,
+            since=args.since,
+            profile=args.profile,
+            max_rows_per_file=args.max_rows_per_file
         )
         print(f"\n✓ 转换成功！")
         print(f"输出文件: {output_path}")
@@ -43,9 +97,43 @@ def convert_command(args):
         return 1
 
 
+def batch_convert_command(converter, inputs, args):
+    """批量转换命令（多个店铺的导出文件）"""
+    if args.stream or args.since or args.max_rows_per_file:
+        print(f"\n❌ 错误：批量转换不支持 --stream、--since 和 --max-rows-per-file 参数\n"
+              f"   请逐个文件转换，或去掉这些参数")
+        return 1
+    
+    try:
+        converter.convert_batch(
+            shopify_csv_paths=inputs,
+            output_path=args.output,
+            merge=args.merge,
+            output_format=args.output_format,
+            workers=args.workers,
+            profile=args.profile
+        )
+        print(f"\n✓ 批量转换成功！")
+        return 0
+    except FileNotFoundError as e:
+        print(str(e))
+        return 1
+    except Exception as e:
+        error_msg = str(e)
+        if error_msg.startswith('\n❌'):
+            # 已经是友好的错误信息
+            print(error_msg)
+        else:
+            # 未处理的错误，显示详细信息
+            print(f"\n❌ 批量转换失败: {error_msg}")
+            import traceback
+            traceback.print_exc()
+        return 1
+
+
 def match_command(args):
     """配对命令"""
-    matcher = ProductMatcher()
+    matcher = ProductMatcher(cache_dir=None if args.no_cache else args.cache_dir)
     
     try:
         output_path = matcher.match(
@@ -53,7 +141,16 @@ def match_command(args):
             erp_file=args.erp,
             output_path=args.output,
             match_method=args.method,
-            shop_name=args.shop
+            shop_name=args.shop,
+            output_format=args.output_format,
+            profile=args.profile,
+            max_rows_per_file=args.max_rows_per_file,
+            workers=args.workers,
+            erp_index=args.erp_index,
+            cascade=args.cascade,
+            fuzzy_engine=args.fuzzy_engine,
+            rescore=args.rescore,
+            key_kinds=dict(args.match_keys)
         )
         print(f"\n✓ 配对成功！")
         print(f"输出文件: {output_path}")
@@ -74,6 +171,31 @@ def match_command(args):
         return 1
 
 
+def index_erp_command(args):
+    """建立ERP商品索引命令"""
+    matcher = ProductMatcher(cache_dir=None if args.no_cache else args.cache_dir)
+    
+    try:
+        index_path = matcher.build_erp_index(args.erp, args.output, key_kinds=dict(args.match_keys))
+        print(f"\n✓ 索引建立成功！")
+        print(f"索引文件: {index_path}")
+        return 0
+    except (FileNotFoundError, ValueError) as e:
+        print(str(e))
+        return 1
+    except Exception as e:
+        error_msg = str(e)
+        if error_msg.startswith('\n❌'):
+            # 已经是友好的错误信息
+            print(error_msg)
+        else:
+            # 未处理的错误，显示详细信息
+            print(f"\n❌ 建立索引失败: {error_msg}")
+            import traceback
+            traceback.print_exc()
+        return 1
+
+
 def main():
     """主函数"""
     parser = argparse.ArgumentParser(
@@ -87,14 +209,48 @@ def main():
   # 指定输出文件
   python main.py convert -i file/shopify_products_export.csv -o output.xlsx
   
+  # 流式转换超大导出文件（内存占用与文件大小无关）
+  python main.py convert -i file/shopify_products_export.csv --stream --chunk-size 50000
+  
   # 配对平台商品和ERP商品（基于SKU）
   python main.py match -p platform.csv -e erp.xlsx -s MyStore
   
   # 使用品名进行配对
   python main.py match -p platform.csv -e erp.xlsx -s MyStore -m title
   
-  # 使用模糊匹配
-  python main.py match -p platform.csv -e erp.xlsx -s MyStore -m fuzzy
+  # 同一个ERP文件配对多个店铺：先建立ERP索引，配对时加载索引（ERP文件变化时自动重建）
+  python main.py index-erp -e erp.xlsx -o erp.idx
+  python main.py match -p shop1.csv -e erp.xlsx -s Shop1 --erp-index erp.idx
+  
+  # 级联配对：先SKU、再条形码和品名精确匹配，剩余的商品最后模糊匹配
+  python main.py match -p platform.csv -e erp.xlsx -s MyStore -m cascade --cascade sku,barcode,title,fuzzy
+  
+  # 使用模糊匹配（--workers 多进程并行计算相似度）
+  python main.py match -p platform.csv -e erp.xlsx -s MyStore -m fuzzy --workers 4
+  
+  # 平台SKU列按原样配对（不做全角半角转换、不合并空白）
+  python main.py match -p platform.csv -e erp.xlsx -s MyStore --match-key "Variant SKU=text"
+  
+  # 模糊匹配使用n-gram向量余弦相似度引擎
+  python main.py match -p platform.csv -e erp.xlsx -s MyStore -m fuzzy --fuzzy-engine vector
+  
+  # 增量转换：只输出相对上一次导出新增和变更的产品
+  python main.py convert -i today.csv --since yesterday.csv
+  
+  # 输出CSV而不是Excel
+  python main.py convert -i file/shopify_products_export.csv --format csv
+  
+  # 记录各阶段耗时和内存峰值，写入 output_profile.json（--profile time 只记录耗时，几乎不影响速度）
+  python main.py convert -i file/shopify_products_export.csv -o output.xlsx --profile
+  
+  # 批量转换多个店铺，SKU全局去重，合并为一个导入文件
+  python main.py convert -i exports/*.csv --merge --workers 4
+  
+  # 批量转换多个店铺，每个店铺输出一个文件到out目录
+  python main.py convert -i exports/*.csv -o out --workers 4
+  
+  # 每个导入文件最多10000条产品，拆分为 output_part01.xlsx、output_part02.xlsx ... 和 output_manifest.json
+  python main.py convert -i file/shopify_products_export.csv -o output.xlsx --max-rows-per-file 10000
         """
     )
     
@@ -102,8 +258,28 @@ def main():
     
     # 转换命令
     convert_parser = subparsers.add_parser('convert', help='转换Shopify产品到领星ERP格式')
-    convert_parser.add_argument('-i', '--input', required=True, help='Shopify导出的CSV文件路径')
-    convert_parser.add_argument('-o', '--output', help='输出Excel文件路径（可选）')
+    convert_parser.add_argument('-i', '--input', required=True, nargs='+',
+                               help='Shopify导出的CSV文件路径，可指定多个文件或通配符（如 exports/*.csv）批量转换')
+    convert_parser.add_argument('-o', '--output',
+                               help='输出Excel文件路径（可选）；批量转换且不合并时为输出目录')
+    convert_parser.add_argument('--merge', action='store_true',
+                               help='批量转换时把所有店铺合并为一个导入文件（SKU始终在所有店铺间统一去重）')
+    convert_parser.add_argument('--stream', action='store_true',
+                               help='流式模式：分块读取并逐块写入，适合超大导出文件')
+    convert_parser.add_argument('--chunk-size', type=positive_int, default=50000,
+                               help='流式模式下每块读取的行数（默认：50000）')
+    convert_parser.add_argument('--format', dest='output_format', choices=OUTPUT_FORMATS, default='xlsx',
+                               help='输出格式：xlsx=领星导入Excel, csv=CSV文件（默认：xlsx）')
+    convert_parser.add_argument('--workers', type=positive_int, default=1,
+                               help='并行转换的进程数，按产品Handle分片；批量转换时每个进程处理一个文件（默认：1）')
+    convert_parser.add_argument('--since',
+                               help='上一次的Shopify导出文件，只输出新增和变更的产品，并列出已删除的SKU')
+    convert_parser.add_argument('--profile', nargs='?', const='memory', choices=PROFILE_MODES,
+                               help='记录各阶段耗时、CPU时间、行/秒和内存峰值，在输出文件旁写入 <文件名>_profile.json；'
+                               '默认memory模式用tracemalloc统计内存峰值（运行会明显变慢），time模式只记录耗时')
+    convert_parser.add_argument('--max-rows-per-file', type=positive_int, metavar='N',
+                               help='每个输出文件最多N条产品，超过时拆分为 <文件名>_partNN 多个文件'
+                               '（同一Handle的变体在同一文件中），并行写入并生成 <文件名>_manifest.json 清单')
     
     # 配对命令
     match_parser = subparsers.add_parser('match', help='配对平台商品和ERP商品，生成领星MSKU配对导入文件')
@@ -112,9 +288,43 @@ def main():
     match_parser.add_argument('-s', '--shop', required=True, help='店铺名称（必填），如：MyStore')
     match_parser.add_argument('-o', '--output', help='输出Excel文件路径（可选）')
     match_parser.add_argument('-m', '--method', 
-                             choices=['sku', 'title', 'barcode', 'fuzzy'],
+                             choices=['sku', 'title', 'barcode', 'fuzzy', 'cascade'],
                              default='sku',
-                             help='配对方法：sku=SKU匹配, title=品名匹配, barcode=条形码匹配, fuzzy=模糊匹配（默认：sku）')
+                             help='配对方法：sku=SKU匹配, title=品名匹配, barcode=条形码匹配, fuzzy=模糊匹配, '
+                             'cascade=按 --cascade 的顺序依次配对（默认：sku）')
+    match_parser.add_argument('--cascade', default=','.join(ProductMatcher.DEFAULT_CASCADE),
+                             help='级联配对的方法顺序，逗号分隔，每种方法只处理之前未配对的商品'
+                             f'（默认：{",".join(ProductMatcher.DEFAULT_CASCADE)}）')
+    match_parser.add_argument('--format', dest='output_format', choices=OUTPUT_FORMATS, default='xlsx',
+                             help='输出格式：xlsx=单个Excel文件, csv=每个sheet一个CSV文件（默认：xlsx）')
+    match_parser.add_argument('--profile', nargs='?', const='memory', choices=PROFILE_MODES,
+                             help='记录各阶段耗时、CPU时间、行/秒和内存峰值，在输出文件旁写入 <文件名>_profile.json；'
+                             '默认memory模式用tracemalloc统计内存峰值（运行会明显变慢），time模式只记录耗时')
+    match_parser.add_argument('--erp-index', metavar='PATH',
+                             help='ERP索引文件（由 index-erp 建立），加载索引代替读取ERP文件；'
+                             '索引不存在或ERP文件内容变化时自动重新建立')
+    match_parser.add_argument('--workers', type=positive_int, default=1,
+                             help='模糊匹配时并行计算相似度的进程数，结果与单进程一致（默认：1）')
+    match_parser.add_argument('--fuzzy-engine', choices=list(ProductMatcher.FUZZY_ENGINES), default='index',
+                             help='模糊匹配引擎：index=字符倒排索引筛选候选（结果与逐一比较相同）, '
+                             'vector=哈希n-gram向量余弦相似度分块计算，每个商品保留最相近的候选（默认：index）')
+    match_parser.add_argument('--no-rescore', dest='rescore', action='store_false',
+                             help='vector引擎直接以余弦相似度作为匹配度，不再用SequenceMatcher重新计算候选的相似度'
+                             '（更快，但匹配度与index引擎不可比）')
+    match_parser.add_argument('--match-key', dest='match_keys', type=key_kind, action='append', default=[],
+                             metavar='列名=方式', help=MATCH_KEY_HELP)
+    add_cache_arguments(match_parser)
+    match_parser.add_argument('--max-rows-per-file', type=positive_int, metavar='N',
+                             help='每个输出文件最多N个平台商品，超过时拆分为 <文件名>_partNN 多个文件，'
+                             '并行写入并生成 <文件名>_manifest.json 清单')
+    
+    # 建立ERP索引命令
+    index_parser = subparsers.add_parser('index-erp', help='建立ERP商品索引文件，供多次配对复用')
+    index_parser.add_argument('-e', '--erp', required=True, help='领星ERP商品文件路径（CSV或Excel）')
+    index_parser.add_argument('-o', '--output', help='索引文件路径（可选，默认为ERP文件同名的.idx文件）')
+    index_parser.add_argument('--match-key', dest='match_keys', type=key_kind, action='append', default=[],
+                             metavar='列名=方式', help=MATCH_KEY_HELP)
+    add_cache_arguments(index_parser)
     
     args = parser.parse_args()
     
@@ -127,6 +337,8 @@ def main():
         return convert_command(args)
     elif args.command == 'match':
         return match_command(args)
+    elif args.command == 'index-erp':
+        return index_erp_command(args)
     else:
         parser.print_help()
         return 1
@@ -4,11 +4,22 @@
 Shopify产品转换为领星ERP导入格式的核心模块
 """
 
+import numpy as np
 import pandas as pd
 import os
-import re
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
-from .utils import clean_text, truncate_field
+from functools import lru_cache
+from .utils import (
+    clean_text_series, truncate_series, intern_series, html_to_text, detect_encoding,
+    read_csv_header, read_csv_columns, DEFAULT_ENCODINGS,
+)
+from .sku import SkuNormalizer
+from .profiler import StageProfiler
+from .warning_sink import WarningSink
+from .writer import create_writer, manifest_path, PartitionedWriter
 
 
 class ShopifyToLingxinConverter:
@@ -30,6 +41,53 @@ class ShopifyToLingxinConverter:
         '三级分类': 50,
     }
     
+    # 领星ERP导入模板的列头
+    LINGXIN_COLUMNS = [
+        '*SKU', '品名', '产品类型', '单品SKU1', '关联数量1', '单位加工费', '加工备注',
+        '关联单品成本', '识别码', '状态', '型号', '单位', '产品材质', '一级分类',
+        '二级分类', '三级分类', '品牌', '产品标签', '开发人', '产品负责人', '产品描述',
+        '图片链接', '采购员', '采购交期', '采购成本(CNY)', '采购备注', '单品规格长',
+        '单品规格宽', '单品规格高', '单品规格单位', '单品净重', '单品净重单位',
+        '单品毛重', '单品毛重单位', '包装规格长', '包装规格宽', '包装规格高',
+        '包装规格单位', '外箱规格长', '外箱规格宽', '外箱规格高', '外箱规格单位',
+        '单箱数量(pcs)', '单箱重量', '单箱重量单位', '供应商名称', '币种', '含税',
+        '税率', '最小采购量', '单价', '含税单价', '交期', '采购链接', '报价备注',
+        '默认质检方式', '质检模板', '中文报关名', '英文报关名', '中文材质', '英文材质',
+        '中文用途', '英文用途', '品牌类型', '出口享惠情况', '内部编码', '特殊属性',
+        '报关单价', '报关单价币种', '报关HSCODE', '报关型号', '原产国(地区)',
+        '境内货源地', '报关单位', '其他申报要素', '征免', '生产销售企业名称',
+        '生产销售企业代码', '清关型号', '配货备注', '织造方式', '默认清关HSCODE',
+        '默认清关单价', '默认清关单价币种', '默认清关税率', '默认清关备注',
+        '全部国家头程费用(含税)', '全部国家头程费用币种'
+    ]
+    
+    # 分类层级对应的领星ERP列
+    CATEGORY_COLUMNS = ['一级分类', '二级分类', '三级分类']
+    
+    # 低基数、重复度高的列，以分类（categorical）类型保存
+    INTERNED_COLUMNS = ['状态', '品牌'] + CATEGORY_COLUMNS
+    
+    # Shopify产品材质元字段列名
+    MATERIAL_COLUMN = '物品材质 (product.metafields.shopify.item-material)'
+    
+    # 转换必需的Shopify列
+    REQUIRED_COLUMNS = [
+        'Handle', 'Title', 'Vendor', 'Variant SKU', 'Body (HTML)', 'Variant Grams',
+        'Variant Barcode', 'Image Src', 'Cost per item', 'Status', 'Product Category',
+    ]
+    
+    # 转换用到的全部Shopify列（其余列不读取）
+    SHOPIFY_COLUMNS = REQUIRED_COLUMNS + [MATERIAL_COLUMN]
+    
+    # 增量模式下列出已删除SKU的sheet
+    REMOVED_SHEET = '已删除SKU'
+    
+    # 列出全部分类路径及SKU数的sheet
+    CATEGORY_SHEET = '分类字典'
+    
+    # 并行转换时每个进程分到的分片数（分片越多负载越均衡）
+    SHARDS_PER_WORKER = 4
+    
     # 状态映射
     STATUS_MAP = {
         'active': '在售',
@@ -38,19 +96,39 @@ class ShopifyToLingxinConverter:
     }
     
     def __init__(self):
-        self.sku_warnings = []
-        self.duplicate_count = 0
-        
-    def convert(self, shopify_csv_path, output_path=None):
+        self.warnings = WarningSink()
+        self.sku_normalizer = SkuNormalizer()
+        # 当前批次第一行在本次转换全部数据行中的位置（警告记录中的row从0开始，不含空行）
+        self.row_offset = 0
+        self.delta_counts = None
+        self.category_counts = {}
+        self.profiler = StageProfiler()
+        # 拆分输出时每个文件的行数上限，以及并行写入各部分的进程池
+        self.max_rows_per_file = None
+        self.write_executor = None
+    
+    def convert(self, shopify_csv_path, output_path=None, stream=False, chunk_size=50000,
+                output_format='xlsx', workers=1, since=None, profile=None, max_rows_per_file=None):
         """
         执行转换
         
         Args:
             shopify_csv_path: Shopify导出的CSV文件路径
             output_path: 输出文件路径（可选）
+            stream: 是否使用流式模式（分块读取、逐块写入，内存占用与文件大小无关）
+            chunk_size: 流式模式下每块读取的行数
+            output_format: 输出格式（'xlsx' 或 'csv'）
+            workers: 并行转换的进程数（大于1时按Handle分组分片，结果与单进程一致）
+            since: 上一次的Shopify导出文件（可选），提供时只输出新增和变更的产品，
+                   并在单独的sheet中列出已删除的SKU
+            profile: 性能分析模式（'memory' 或 'time'，可选），提供时记录各阶段的耗时（和内存峰值），
+                     并在输出文件旁写入JSON报告
+            max_rows_per_file: 每个输出文件的最大产品数（可选），提供时按行数拆分为
+                               <文件名>_partNN 多个文件（同一Handle的变体在同一文件中），
+                               各文件在子进程中并行写入，并生成 <文件名>_manifest.json 清单
         
         Returns:
-            输出文件路径
+            输出文件路径（拆分输出时为清单文件路径）
         """
         # 检查输入文件是否存在
         if not os.path.exists(shopify_csv_path):
@@ -60,294 +138,762 @@ class ShopifyToLingxinConverter:
                 f"   请检查文件路径是否正确"
             )
         
-        print(f"正在读取Shopify产品数据: {shopify_csv_path}")
-        
-        # 读取CSV文件
-        shopify_df = self._read_shopify_csv(shopify_csv_path)
-        
-        # 过滤空行
-        shopify_df = shopify_df[shopify_df['Handle'].notna()]
-        print(f"共读取 {len(shopify_df)} 条产品数据")
-        
-        # 转换数据
-        lingxin_df = self._transform_data(shopify_df)
-        
-        # 去重
-        lingxin_df = self._remove_duplicates(lingxin_df)
-        
         # 生成输出路径
         if output_path is None:
             timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
             output_dir = os.path.dirname(shopify_csv_path)
-            output_path = os.path.join(output_dir, f'lingxin_import_{timestamp}.xlsx')
+            output_path = os.path.join(output_dir, f'lingxin_import_{timestamp}.{output_format}')
+        
+        with StageProfiler(profile) as profiler:
+            self.profiler = profiler
+            self.warnings = WarningSink(f"{os.path.splitext(output_path)[0]}_warnings.jsonl")
+            # SKU冲突序号、警告行号和分类、增量统计只在本次转换内有效，同一个转换器多次转换时重新开始
+            self.sku_normalizer = SkuNormalizer()
+            self.row_offset = 0
+            self.category_counts = {}
+            self.delta_counts = None
+            
+            executor = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+            self.max_rows_per_file = max_rows_per_file
+            # 拆分输出的各部分在子进程中写入；单进程转换时单独创建写入用的进程池
+            # （不能复用为转换的进程池，否则会触发分片转换）
+            self.write_executor = executor
+            if max_rows_per_file and executor is None:
+                self.write_executor = ProcessPoolExecutor()
+            try:
+                previous_hashes = None
+                if since is not None:
+                    with self.profiler.stage('snapshot') as stage:
+                        previous_hashes = self._load_snapshot_hashes(since, chunk_size, executor, workers)
+                        stage['rows'] = len(previous_hashes)
+                
+                print(f"正在读取Shopify产品数据: {shopify_csv_path}")
+                
+                if stream:
+                    total = self._convert_stream(shopify_csv_path, output_path, chunk_size, output_format,
+                                                 executor, workers, previous_hashes)
+                else:
+                    total = self._convert_in_memory(shopify_csv_path, output_path, output_format,
+                                                    executor, workers, previous_hashes)
+            finally:
+                self.warnings.close()
+                if self.write_executor is not None and self.write_executor is not executor:
+                    self.write_executor.shutdown()
+                if executor is not None:
+                    executor.shutdown()
+                self.max_rows_per_file = None
+                self.write_executor = None
+            
+            # 显示警告信息
+            with self.profiler.stage('warnings'):
+                self._print_warnings()
+                self._print_delta()
+            
+            print(f"转换完成！共转换 {total} 条产品，{len(self.category_counts)} 个分类路径")
+            
+            self.profiler.write_report(output_path, command='convert', input=shopify_csv_path,
+                                       mode='stream' if stream else 'in_memory', workers=workers,
+                                       since=since, rows=total, max_rows_per_file=max_rows_per_file)
+            if max_rows_per_file:
+                output_path = manifest_path(output_path)
+            print(f"输出文件: {output_path}")
+            return output_path
+    
+    def convert_batch(self, shopify_csv_paths, output_path=None, merge=False, output_format='xlsx', workers=1,
+                      profile=None):
+        """
+        批量转换多个店铺的Shopify导出文件
         
-        # 写入Excel
-        self._write_excel(lingxin_df, output_path)
+        各文件在进程池中并行读取和转换；SKU截断冲突和去重按文件顺序在所有店铺间统一处理，
+        先出现的店铺优先保留重复的SKU。
         
-        # 显示警告信息
-        self._print_warnings()
+        Args:
+            shopify_csv_paths: Shopify导出的CSV文件路径列表（文件名作为店铺名）
+            output_path: 合并输出时为输出文件路径，否则为输出目录（可选，默认与输入文件同目录）
+            merge: 是否合并为一个导入文件（否则每个店铺输出一个文件）
+            output_format: 输出格式（'xlsx' 或 'csv'）
+            workers: 并行读取和转换的进程数（每个进程每次处理一个文件）
+            profile: 性能分析模式（'memory' 或 'time'，可选），提供时记录各阶段的耗时（和内存峰值），
+                     并写入JSON报告（合并输出时在输出文件旁，否则在输出目录中）
         
-        print(f"转换完成！共转换 {len(lingxin_df)} 条产品")
-        print(f"输出文件: {output_path}")
+        Returns:
+            输出文件路径列表
+        """
+        for shopify_csv_path in shopify_csv_paths:
+            if not os.path.exists(shopify_csv_path):
+                raise FileNotFoundError(
+                    f"\n❌ 错误：找不到Shopify导出文件\n"
+                    f"   文件路径: {shopify_csv_path}\n"
+                    f"   请检查文件路径是否正确"
+                )
         
-        return output_path
-    
-    def _read_shopify_csv(self, file_path):
-        """读取Shopify CSV文件，自动检测编码"""
-        encodings = ['utf-8', 'utf-8-sig', 'gbk', 'gb2312', 'latin1', 'iso-8859-1']
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        if merge and output_path is None:
+            output_dir = os.path.dirname(shopify_csv_paths[0])
+            output_path = os.path.join(output_dir, f'lingxin_import_{timestamp}.{output_format}')
+        elif not merge and output_path is not None:
+            os.makedirs(output_path, exist_ok=True)
+        
+        # 性能报告和警告明细：合并输出时在输出文件旁，否则以批次时间戳命名，写入输出目录
+        if merge:
+            batch_path = output_path
+        else:
+            output_dir = output_path if output_path is not None else os.path.dirname(shopify_csv_paths[0])
+            batch_path = os.path.join(output_dir, f'lingxin_import_{timestamp}')
+        
+        print(f"正在批量转换 {len(shopify_csv_paths)} 个店铺的Shopify导出文件")
         
-        for encoding in encodings:
+        with StageProfiler(profile) as profiler:
+            self.profiler = profiler
+            self.warnings = WarningSink(f"{os.path.splitext(batch_path)[0]}_warnings.jsonl")
+            # SKU冲突序号和分类统计在本批所有店铺间累计，同一个转换器多次转换时重新开始
+            self.sku_normalizer = SkuNormalizer()
+            self.category_counts = {}
+            
+            started = time.perf_counter()
+            sku_set = set()
+            timings = []
+            output_paths = []
+            
+            executor = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
             try:
-                df = pd.read_csv(file_path, encoding=encoding)
-                print(f"成功使用 {encoding} 编码读取文件")
-                return df
-            except UnicodeDecodeError:
-                continue
-            except Exception as e:
-                raise Exception(
-                    f"\n❌ 错误：读取CSV文件失败\n"
-                    f"   原因: {str(e)}\n"
-                    f"   请确保文件格式正确"
-                )
+                writer = None
+                if merge:
+                    writer = create_writer(output_path, output_format)
+                    writer.add_sheet('产品', self.LINGXIN_COLUMNS)
+                    output_paths.append(output_path)
+                
+                # 子进程中的读取和转换只能统计主进程等待结果的时间，各店铺的实际耗时见汇总
+                results = profiler.iterate('read_transform',
+                                           self._iter_store_results(shopify_csv_paths, executor, workers),
+                                           rows=lambda result: result[2])
+                for index, (shopify_csv_path, result) in enumerate(zip(shopify_csv_paths, results), 1):
+                    lingxin_df, sku_source, read_count, read_seconds, transform_seconds = result
+                    store = os.path.splitext(os.path.basename(shopify_csv_path))[0]
+                    self.row_offset = 0
+                    self.warnings.context = {'store': store}
+                    
+                    # SKU截断冲突和去重依赖之前所有店铺的SKU，按文件顺序统一处理
+                    step_started = time.perf_counter()
+                    with profiler.stage('sku', rows=read_count):
+                        lingxin_df['*SKU'] = self._resolve_skus(sku_source, lingxin_df['*SKU'], sku_set)
+                        lingxin_df = self._remove_duplicates(lingxin_df, sku_set)
+                        sku_set.update(lingxin_df['*SKU'])
+                        store_categories = {}
+                        self._count_categories(lingxin_df, store_categories)
+                        self._count_categories(lingxin_df)
+                    sku_seconds = time.perf_counter() - step_started
+                    
+                    step_started = time.perf_counter()
+                    with profiler.stage('write', rows=len(lingxin_df)):
+                        if merge:
+                            writer.append('产品', lingxin_df)
+                        else:
+                            output_dir = output_path if output_path is not None else os.path.dirname(shopify_csv_path)
+                            store_path = os.path.join(output_dir, f'lingxin_import_{store}_{timestamp}.{output_format}')
+                            self._write_output(lingxin_df, store_path, output_format,
+                                               categories=self._category_dictionary(store_categories))
+                            output_paths.append(store_path)
+                    write_seconds = time.perf_counter() - step_started
+                    
+                    print(f"  [{index}/{len(shopify_csv_paths)}] {store}: 读取 {read_count} 条，输出 {len(lingxin_df)} 个SKU")
+                    timings.append((store, read_count, len(lingxin_df), read_seconds, transform_seconds,
+                                    sku_seconds, write_seconds))
+                
+                if merge:
+                    step_started = time.perf_counter()
+                    print(f"正在写入领星ERP导入文件: {output_path}")
+                    with profiler.stage('write'):
+                        writer.write(self.CATEGORY_SHEET, self._category_dictionary())
+                        writer.close()
+                    merge_seconds = time.perf_counter() - step_started
+            except BaseException:
+                # 合并输出未写完时删除不完整的输出
+                if writer is not None:
+                    writer.discard()
+                raise
+            finally:
+                self.warnings.close()
+                if executor is not None:
+                    executor.shutdown()
+            
+            with profiler.stage('warnings'):
+                self._print_warnings()
+            self._print_timings(timings, time.perf_counter() - started, merge_seconds if merge else None)
+            
+            total = sum(timing[2] for timing in timings)
+            print(f"转换完成！{len(timings)} 个店铺共转换 {total} 条产品，{len(self.category_counts)} 个分类路径")
+            for path in output_paths:
+                print(f"输出文件: {path}")
+            
+            stores = [
+                dict(zip(['store', 'rows', 'skus', 'read_seconds', 'transform_seconds', 'sku_seconds', 'write_seconds'],
+                         [round(value, 4) if isinstance(value, float) else value for value in timing]))
+                for timing in timings
+            ]
+            profiler.write_report(batch_path, command='convert', input=shopify_csv_paths, output=output_paths,
+                                  mode='batch', merge=merge, workers=workers, rows=total, stores=stores)
+            
+            return output_paths
+    
+    def _iter_store_results(self, shopify_csv_paths, executor=None, workers=1):
+        """
+        按文件顺序逐个返回各店铺的读取和转换结果
         
-        raise Exception(
-            f"\n❌ 错误：无法识别CSV文件编码\n"
-            f"   已尝试编码: {', '.join(encodings)}\n"
-            f"   建议：使用UTF-8编码保存CSV文件"
-        )
-    
-    def _transform_data(self, shopify_df):
-        """转换数据格式"""
-        # 定义领星ERP的列头
-        lingxin_columns = [
-            '*SKU', '品名', '产品类型', '单品SKU1', '关联数量1', '单位加工费', '加工备注',
-            '关联单品成本', '识别码', '状态', '型号', '单位', '产品材质', '一级分类',
-            '二级分类', '三级分类', '品牌', '产品标签', '开发人', '产品负责人', '产品描述',
-            '图片链接', '采购员', '采购交期', '采购成本(CNY)', '采购备注', '单品规格长',
-            '单品规格宽', '单品规格高', '单品规格单位', '单品净重', '单品净重单位',
-            '单品毛重', '单品毛重单位', '包装规格长', '包装规格宽', '包装规格高',
-            '包装规格单位', '外箱规格长', '外箱规格宽', '外箱规格高', '外箱规格单位',
-            '单箱数量(pcs)', '单箱重量', '单箱重量单位', '供应商名称', '币种', '含税',
-            '税率', '最小采购量', '单价', '含税单价', '交期', '采购链接', '报价备注',
-            '默认质检方式', '质检模板', '中文报关名', '英文报关名', '中文材质', '英文材质',
-            '中文用途', '英文用途', '品牌类型', '出口享惠情况', '内部编码', '特殊属性',
-            '报关单价', '报关单价币种', '报关HSCODE', '报关型号', '原产国(地区)',
-            '境内货源地', '报关单位', '其他申报要素', '征免', '生产销售企业名称',
-            '生产销售企业代码', '清关型号', '配货备注', '织造方式', '默认清关HSCODE',
-            '默认清关单价', '默认清关单价币种', '默认清关税率', '默认清关备注',
-            '全部国家头程费用(含税)', '全部国家头程费用币种'
-        ]
-        
-        lingxin_data = []
-        sku_set = set()
+        使用进程池时最多同时提交workers + 1个文件，已完成但未取走的结果不会无限堆积。
+        """
+        if executor is None:
+            for shopify_csv_path in shopify_csv_paths:
+                yield _convert_store(shopify_csv_path)
+            return
+        
+        pending = deque()
+        for shopify_csv_path in shopify_csv_paths:
+            pending.append(executor.submit(_convert_store, shopify_csv_path))
+            if len(pending) > workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+    
+    def _convert_in_memory(self, shopify_csv_path, output_path, output_format, executor=None, workers=1,
+                           previous_hashes=None):
+        """一次性读取全部数据并转换，返回转换的产品数"""
+        profiler = self.profiler
         
-        # 用于记录上一个产品的信息（处理变体）
-        last_title = ''
-        last_vendor = ''
-        last_type = ''
-        last_category = ''
+        # 读取CSV文件
+        with profiler.stage('read') as stage:
+            shopify_df = self._read_shopify_csv(shopify_csv_path)
+            
+            # 过滤空行
+            shopify_df = shopify_df[shopify_df['Handle'].notna()]
+            stage['rows'] = len(shopify_df)
+        print(f"共读取 {len(shopify_df)} 条产品数据")
         
-        for idx, row in shopify_df.iterrows():
-            lingxin_row = self._transform_row(
-                row, sku_set, last_title, last_vendor, last_type, last_category
-            )
+        # 转换数据（结果的索引为行在shopify_df中的位置）
+        with profiler.stage('transform', rows=len(shopify_df)):
+            lingxin_df = self._transform_data(shopify_df, executor=executor,
+                                              shard_count=workers * self.SHARDS_PER_WORKER)
+        handles = shopify_df['Handle'].to_numpy()
+        
+        # 去重
+        with profiler.stage('dedup', rows=len(lingxin_df)):
+            lingxin_df = self._remove_duplicates(lingxin_df)
+            self._count_categories(lingxin_df)
+        
+        # 增量模式：只保留新增和变更的产品
+        removed_skus = None
+        if previous_hashes is not None:
+            with profiler.stage('delta', rows=len(lingxin_df)):
+                lingxin_df = self._select_changes(lingxin_df, previous_hashes)
+                removed_skus = self._collect_removed(previous_hashes)
+        
+        # 写入输出文件
+        with profiler.stage('write', rows=len(lingxin_df)):
+            self._write_output(lingxin_df, output_path, output_format, removed_skus,
+                               self._category_dictionary(), handles[lingxin_df.index])
+        
+        return len(lingxin_df)
+    
+    def _convert_stream(self, shopify_csv_path, output_path, chunk_size, output_format,
+                        executor=None, workers=1, previous_hashes=None):
+        """
+        流式转换：分块读取、转换、去重并追加写入，返回转换的产品数
+        
+        SKU集合跨块保留，用于截断冲突检测和去重；
+        同一Handle的行总在同一块中，变体继承不受分块影响。
+        """
+        profiler = self.profiler
+        sku_set = set()
+        read_count = 0
+        total = 0
+        
+        print(f"正在写入领星ERP导入文件: {output_path}")
+        writer = self._create_writer(output_path, output_format)
+        try:
+            writer.add_sheet('产品', self.LINGXIN_COLUMNS)
             
-            # 更新last变量
-            if pd.notna(row['Title']) and row['Title'] != '':
-                last_title = row['Title']
-            if pd.notna(row['Vendor']) and row['Vendor'] != '':
-                last_vendor = row['Vendor']
-            if pd.notna(row['Type']) and row['Type'] != '':
-                last_type = row['Type']
-            if pd.notna(row['Product Category']) and row['Product Category'] != '':
-                last_category = row['Product Category']
+            chunks = self._iter_handle_chunks(shopify_csv_path, chunk_size)
+            for shopify_df in profiler.iterate('read', chunks):
+                self.row_offset = read_count
+                read_count += len(shopify_df)
+                
+                with profiler.stage('transform', rows=len(shopify_df)):
+                    lingxin_df = self._transform_data(shopify_df, sku_set, executor,
+                                                     workers * self.SHARDS_PER_WORKER)
+                
+                with profiler.stage('dedup', rows=len(lingxin_df)):
+                    lingxin_df = self._remove_duplicates(lingxin_df, sku_set)
+                    sku_set.update(lingxin_df['*SKU'])
+                    self._count_categories(lingxin_df)
+                
+                if previous_hashes is not None:
+                    with profiler.stage('delta', rows=len(lingxin_df)):
+                        lingxin_df = self._select_changes(lingxin_df, previous_hashes)
+                
+                with profiler.stage('write', rows=len(lingxin_df)):
+                    writer.append('产品', lingxin_df, groups=shopify_df['Handle'].to_numpy()[lingxin_df.index])
+                total += len(lingxin_df)
+                print(f"  已处理 {read_count} 条产品数据")
             
-            # 填充空字段
-            for col in lingxin_columns:
-                if col not in lingxin_row:
-                    lingxin_row[col] = ''
+            with profiler.stage('write'):
+                writer.write(self.CATEGORY_SHEET, self._category_dictionary())
+                if previous_hashes is not None:
+                    writer.write(self.REMOVED_SHEET, self._collect_removed(previous_hashes))
+                writer.close()
+        except BaseException:
+            # 未写完时删除不完整的输出
+            writer.discard()
+            raise
+        self._print_parts(writer)
+        
+        print(f"共读取 {read_count} 条产品数据")
+        return total
+    
+    def _read_shopify_csv(self, file_path):
+        """读取Shopify CSV文件，自动检测编码，只读取转换用到的列"""
+        encoding = self._detect_csv_encoding(file_path)
+        columns = self._shopify_columns(file_path, encoding)
+        
+        try:
+            df = read_csv_columns(file_path, encoding, columns)
+        except UnicodeDecodeError as e:
+            raise self._encoding_error(e)
+        except Exception as e:
+            raise Exception(
+                f"\n❌ 错误：读取CSV文件失败\n"
+                f"   原因: {str(e)}\n"
+                f"   请确保文件格式正确"
+            )
+        
+        print(f"成功使用 {encoding} 编码读取文件")
+        return df
+    
+    def _shopify_columns(self, file_path, encoding):
+        """检查CSV列头，返回文件中存在的、转换需要的列"""
+        try:
+            header = read_csv_header(file_path, encoding)
+        except UnicodeDecodeError as e:
+            raise self._encoding_error(e)
+        
+        missing = [column for column in self.REQUIRED_COLUMNS if column not in header]
+        if missing:
+            raise Exception(
+                f"\n❌ 错误：CSV文件缺少必需的列\n"
+                f"   缺少的列: {', '.join(missing)}\n"
+                f"   请确保使用Shopify后台导出的产品CSV文件"
+            )
+        
+        return [column for column in header if column in self.SHOPIFY_COLUMNS]
+    
+    def _detect_csv_encoding(self, file_path):
+        """检测CSV文件编码（只读取样本，不解析文件）"""
+        encoding = detect_encoding(file_path, DEFAULT_ENCODINGS)
+        if encoding is None:
+            raise self._encoding_error()
+        return encoding
+    
+    def _encoding_error(self, reason=None):
+        """生成无法识别编码的错误"""
+        message = f"\n❌ 错误：无法识别CSV文件编码\n"
+        if reason is not None:
+            message += f"   原因: {str(reason)}\n"
+        else:
+            message += f"   已尝试编码: {', '.join(DEFAULT_ENCODINGS)}\n"
+        message += f"   建议：使用UTF-8编码保存CSV文件"
+        return Exception(message)
+    
+    def _iter_handle_chunks(self, file_path, chunk_size):
+        """
+        分块读取Shopify CSV文件
+        
+        每块末尾未结束的Handle分组会留到下一块，
+        保证同一产品的所有变体行位于同一块中。
+        """
+        encoding = self._detect_csv_encoding(file_path)
+        columns = self._shopify_columns(file_path, encoding)
+        print(f"使用 {encoding} 编码分块读取文件（每块 {chunk_size} 行）")
+        
+        try:
+            reader = pd.read_csv(file_path, encoding=encoding, usecols=columns, dtype=str,
+                                 chunksize=chunk_size)
+            pending = None
+            for chunk in reader:
+                # 过滤空行
+                chunk = chunk[chunk['Handle'].notna()]
+                if pending is not None:
+                    chunk = pd.concat([pending, chunk], ignore_index=True)
+                if chunk.empty:
+                    continue
+                
+                handles = chunk['Handle'].to_numpy()
+                boundaries = (handles != handles[-1]).nonzero()[0]
+                split = boundaries[-1] + 1 if len(boundaries) else 0
+                if split:
+                    yield chunk.iloc[:split]
+                pending = chunk.iloc[split:]
             
-            lingxin_data.append(lingxin_row)
+            if pending is not None and not pending.empty:
+                yield pending
+        except UnicodeDecodeError as e:
+            raise self._encoding_error(e)
+    
+    def _transform_data(self, shopify_df, sku_set=None, executor=None, shard_count=1):
+        """
+        转换数据格式（按列批量处理）
         
-        return pd.DataFrame(lingxin_data, columns=lingxin_columns)
+        Args:
+            shopify_df: Shopify产品数据
+            sku_set: 之前批次已使用的SKU集合（可选，用于跨批次检测SKU冲突，不会被修改）
+            executor: 进程池（可选），提供时按Handle分组分片并行转换
+            shard_count: 并行转换时的分片数
+        
+        Returns:
+            领星ERP格式的DataFrame
+        """
+        if sku_set is None:
+            sku_set = set()
+        
+        shopify_df = shopify_df.reset_index(drop=True)
+        
+        # 变体行继承主产品的品名、品牌和分类
+        inherited = self._inherit_variant_fields(shopify_df)
+        
+        # 没有数据行或只有一个分片时（如只有表头的导出文件）不必分发到进程池
+        bounds = self._handle_shard_bounds(shopify_df, shard_count) if executor is not None else []
+        if len(bounds) <= 1:
+            lingxin_df, sku_source = self._transform_columns(shopify_df, inherited)
+        else:
+            shards = [(shopify_df.iloc[start:stop], inherited.iloc[start:stop]) for start, stop in bounds]
+            results = list(executor.map(_transform_shard, shards))
+            lingxin_df = pd.concat([result[0] for result in results], ignore_index=True)
+            sku_source = pd.concat([result[1] for result in results], ignore_index=True)
+            # 各分片的分类取值不同，合并后变为object类型，需重新转换
+            for column in self.INTERNED_COLUMNS:
+                lingxin_df[column] = lingxin_df[column].astype('category')
+        
+        # SKU截断冲突依赖之前所有行，按原始顺序统一处理
+        lingxin_df['*SKU'] = self._resolve_skus(sku_source, lingxin_df['*SKU'], sku_set)
+        return lingxin_df
     
-    def _transform_row(self, row, sku_set, last_title, last_vendor, last_type, last_category):
-        """转换单行数据"""
-        lingxin_row = {}
+    def _transform_columns(self, shopify_df, inherited):
+        """
+        转换除SKU冲突处理以外的所有字段（只依赖传入的行，可在子进程中执行）
+        
+        Returns:
+            (领星ERP格式的DataFrame（*SKU列为清理后、未截断的SKU）, 原始SKU列)
+        """
+        lingxin_data = {}
         
         # SKU处理
-        lingxin_row['*SKU'] = self._process_sku(row, sku_set)
+        sku_source, lingxin_data['*SKU'] = self._clean_skus(shopify_df)
         
         # 品名处理
-        lingxin_row['品名'] = self._process_title(row, last_title)
-        
-        # 产品类型
-        lingxin_row['产品类型'] = self._process_type(row, last_type)
+        lingxin_data['品名'] = self._process_title(inherited['Title'])
         
         # 状态
-        lingxin_row['状态'] = self.STATUS_MAP.get(row['Status'], '在售') if pd.notna(row['Status']) else '在售'
+        lingxin_data['状态'] = self._process_status(shopify_df)
         
         # 品牌
-        lingxin_row['品牌'] = self._process_vendor(row, last_vendor)
-        
-        # 产品标签（留空避免冲突）
-        lingxin_row['产品标签'] = ''
+        lingxin_data['品牌'] = intern_series(inherited['Vendor'], lambda vendor: truncate_series(vendor, 50))
         
         # 产品描述
-        lingxin_row['产品描述'] = self._process_description(row)
+        lingxin_data['产品描述'] = self._process_description(shopify_df)
         
         # 图片链接
-        lingxin_row['图片链接'] = truncate_field(row['Image Src'], 500)
+        lingxin_data['图片链接'] = truncate_series(shopify_df['Image Src'], 500)
         
         # 采购成本
-        lingxin_row['采购成本(CNY)'] = self._process_cost(row)
+        lingxin_data['采购成本(CNY)'] = self._process_cost(shopify_df)
         
         # 单品净重
-        self._process_weight(row, lingxin_row)
+        lingxin_data['单品净重'], lingxin_data['单品净重单位'] = self._process_weight(shopify_df)
         
         # 识别码
-        lingxin_row['识别码'] = truncate_field(row['Variant Barcode'], 50)
+        lingxin_data['识别码'] = truncate_series(shopify_df['Variant Barcode'], 50)
         
         # 产品材质
-        lingxin_row['产品材质'] = self._process_material(row)
+        lingxin_data['产品材质'] = self._process_material(shopify_df)
         
         # 分类
-        self._process_category(row, lingxin_row, last_category)
+        lingxin_data.update(self._process_category(inherited['Product Category']))
         
-        return lingxin_row
+        # 其余字段（包括产品类型、产品标签）批量留空：
+        # 产品类型为空时领星ERP默认为普通产品，产品标签留空避免与系统已有标签冲突
+        lingxin_df = pd.DataFrame(lingxin_data)
+        return lingxin_df.reindex(columns=self.LINGXIN_COLUMNS, fill_value=''), sku_source
+    
+    def _inherit_variant_fields(self, shopify_df):
+        """变体行（字段为空）在同一Handle内向前继承主产品的品名、品牌和分类"""
+        fields = shopify_df[['Title', 'Vendor', 'Product Category']]
+        fields = fields.mask(fields == '')
+        return fields.groupby(shopify_df['Handle'], sort=False).ffill()
     
-    def _process_sku(self, row, sku_set):
-        """处理SKU字段"""
-        sku = row['Variant SKU'] if pd.notna(row['Variant SKU']) and row['Variant SKU'] != '' else row['Handle']
-        sku = str(sku) if pd.notna(sku) else ''
+    def _handle_shard_bounds(self, shopify_df, shard_count):
+        """把数据按行数大致均分为shard_count段，分段点对齐到Handle分组的起始行"""
+        handles = shopify_df['Handle'].to_numpy()
+        group_starts = np.flatnonzero(np.r_[True, handles[1:] != handles[:-1]])
+        targets = np.linspace(0, len(handles), shard_count + 1)[1:-1]
+        cuts = group_starts[np.minimum(np.searchsorted(group_starts, targets), len(group_starts) - 1)]
+        bounds = np.unique(np.r_[0, cuts[cuts > 0], len(handles)])
+        return list(zip(bounds[:-1], bounds[1:]))
+    
+    def _clean_skus(self, shopify_df):
+        """
+        选取SKU来源（Variant SKU为空时使用Handle）并清理非法字符
         
-        # 清理非法字符：只保留字母、数字、下划线、短划线、点、井号、斜杠
-        # 领星ERP要求：字母，数字，下划线（_），短划线（-），英文点（.），井号（#），斜杆（/）
-        original_sku = sku
-        sku = re.sub(r'[^a-zA-Z0-9_\-\.#/]', '', sku)
+        Returns:
+            (原始SKU列, 清理后的SKU列)
+        """
+        variant_sku = shopify_df['Variant SKU']
+        source = variant_sku.where(variant_sku.notna() & (variant_sku != ''), shopify_df['Handle'])
+        source = source.where(source.notna(), '').astype(str)
+        return source, self.sku_normalizer.sanitize(source)
+    
+    def _resolve_skus(self, source, cleaned, sku_set):
+        """截断过长的SKU、处理截断后的冲突，并按行顺序记录警告"""
+        skus, records = self.sku_normalizer.resolve(source, cleaned, sku_set)
+        
+        for record in records:
+            record['row'] += self.row_offset
+            self.warnings.add(record)
+        return skus
+    
+    def _process_title(self, title):
+        """处理品名字段"""
+        return truncate_series(clean_text_series(title), 200)
+    
+    def _process_status(self, shopify_df):
+        """处理状态字段，未知或为空的状态默认为在售"""
+        return intern_series(shopify_df['Status'], lambda status: status.map(self.STATUS_MAP).fillna('在售'))
+    
+    def _process_description(self, shopify_df):
+        """处理产品描述字段：HTML转纯文本（跳过样式和脚本、解码实体）并截断"""
+        return shopify_df['Body (HTML)'].map(lambda html: html_to_text(html, 1000))
+    
+    def _process_cost(self, shopify_df):
+        """处理采购成本字段，无法解析的成本留空"""
+        cost = pd.to_numeric(shopify_df['Cost per item'], errors='coerce')
+        return cost.astype(object).where(cost.notna(), '')
+    
+    def _process_weight(self, shopify_df):
+        """处理重量字段，克转换为千克"""
+        weight_grams = pd.to_numeric(shopify_df['Variant Grams'], errors='coerce')
+        has_weight = weight_grams.notna()
+        weight = (weight_grams / 1000).astype(object).where(has_weight, '')
+        unit = pd.Series('kg', index=shopify_df.index).where(has_weight, '')
+        return weight, unit
+    
+    def _process_material(self, shopify_df):
+        """处理产品材质字段"""
+        if self.MATERIAL_COLUMN in shopify_df.columns:
+            return truncate_series(shopify_df[self.MATERIAL_COLUMN], 50)
+        return pd.Series('', index=shopify_df.index)
+    
+    def _process_category(self, category):
+        """
+        处理分类字段，按' > '拆分为一级、二级、三级分类
         
-        if sku != original_sku and sku:
-            self.sku_warnings.append(f"SKU包含非法字符已清理: '{original_sku}' -> '{sku}'")
+        每个不同的分类路径只拆分一次，结果以分类（categorical）类型保存。
+        """
+        codes, paths = pd.factorize(category)
+        # 空值的编码为-1，对应末尾的空分类
+        levels = np.array([_split_category_path(path) for path in paths] + [('', '', '')],
+                          dtype=object).reshape(-1, len(self.CATEGORY_COLUMNS))
+        
+        result = {}
+        for level, column in enumerate(self.CATEGORY_COLUMNS):
+            level_codes, categories = pd.factorize(levels[:, level])
+            result[column] = pd.Series(
+                pd.Categorical.from_codes(level_codes[codes], categories=categories),
+                index=category.index,
+            )
+        return result
+    
+    def _remove_duplicates(self, df, seen_skus=None):
+        """
+        去除重复的SKU
         
-        if len(sku) > 50:
-            original_sku = sku
-            sku = sku[:50]
-            
-            # 处理重复
-            if sku in sku_set:
-                counter = 1
-                while f"{sku[:47]}-{counter:02d}" in sku_set and counter < 100:
-                    counter += 1
-                sku = f"{sku[:47]}-{counter:02d}"
-            
-            self.sku_warnings.append(f"SKU过长已截断: '{original_sku}' -> '{sku}'")
+        Args:
+            df: 领星ERP格式的数据
+            seen_skus: 之前批次已输出的SKU集合（可选，流式模式下跨块去重）
+        """
+        duplicated = df['*SKU'].duplicated(keep='first')
+        if seen_skus:
+            duplicated |= df['*SKU'].map(seen_skus.__contains__)
         
-        sku_set.add(sku)
-        return sku
+        for row, sku in zip(df.index[duplicated], df['*SKU'][duplicated]):
+            self.warnings.add({'type': 'duplicate', 'row': int(row) + self.row_offset, 'sku': sku})
+        return df[~duplicated]
     
-    def _process_title(self, row, last_title):
-        """处理品名字段"""
-        if pd.notna(row['Title']) and row['Title'] != '':
-            title = row['Title']
-        else:
-            title = last_title
-        
-        title_cleaned = clean_text(title)
-        return truncate_field(title_cleaned, 200)
+    def _count_categories(self, df, category_counts=None):
+        """按分类路径累计SKU数（流式模式下跨块累计，默认累计到self.category_counts）"""
+        if category_counts is None:
+            category_counts = self.category_counts
+        counts = df.groupby(self.CATEGORY_COLUMNS, observed=True, sort=False).size()
+        for path, count in counts.items():
+            if any(path):
+                category_counts[path] = category_counts.get(path, 0) + int(count)
     
-    def _process_type(self, row, last_type):
+    def _category_dictionary(self, category_counts=None):
+        """生成分类字典：全部分类路径（一级/二级/三级）及对应的SKU数，按路径排序"""
+        if category_counts is None:
+            category_counts = self.category_counts
+        rows = [path + (count,) for path, count in sorted(category_counts.items())]
+        return pd.DataFrame(rows, columns=self.CATEGORY_COLUMNS + ['SKU数'])
+    
+    def _load_snapshot_hashes(self, snapshot_path, chunk_size, executor=None, workers=1):
         """
-        处理产品类型字段
+        按相同规则转换上一次的导出快照，计算每个SKU的行哈希
         
-        领星ERP要求：
-        1、产品类型为组合产品时，支持填写右侧同底色字段及【包含单品】表格
-        2、产品类型为普通产品时，填写无效自动过滤
-        3、为空时，默认为普通产品
+        Args:
+            snapshot_path: 上一次的Shopify导出文件
+            chunk_size: 分块读取的行数
         
-        因此，对于Shopify导入的普通产品，应该留空
+        Returns:
+            {SKU: 行哈希}
         """
-        # 留空，让领星ERP默认为普通产品
-        return ''
-    
-    def _process_vendor(self, row, last_vendor):
-        """处理品牌字段"""
-        if pd.notna(row['Vendor']) and row['Vendor'] != '':
-            return truncate_field(row['Vendor'], 50)
-        return truncate_field(last_vendor, 50)
-    
-    def _process_description(self, row):
-        """处理产品描述字段"""
-        if pd.notna(row['Body (HTML)']):
-            description = re.sub('<[^<]+?>', '', str(row['Body (HTML)']))
-            return truncate_field(description.strip(), 1000)
-        return ''
-    
-    def _process_cost(self, row):
-        """处理采购成本字段"""
-        if pd.notna(row['Cost per item']) and row['Cost per item'] != '':
-            try:
-                return float(row['Cost per item'])
-            except:
-                return ''
-        return ''
-    
-    def _process_weight(self, row, lingxin_row):
-        """处理重量字段"""
-        if pd.notna(row['Variant Grams']) and row['Variant Grams'] != '':
-            try:
-                weight_grams = float(row['Variant Grams'])
-                lingxin_row['单品净重'] = weight_grams / 1000
-                lingxin_row['单品净重单位'] = 'kg'
-            except:
-                lingxin_row['单品净重'] = ''
-                lingxin_row['单品净重单位'] = ''
-        else:
-            lingxin_row['单品净重'] = ''
-            lingxin_row['单品净重单位'] = ''
+        if not os.path.exists(snapshot_path):
+            raise FileNotFoundError(
+                f"\n❌ 错误：找不到上一次的Shopify导出文件\n"
+                f"   文件路径: {snapshot_path}\n"
+                f"   请检查文件路径是否正确"
+            )
+        
+        print(f"正在读取上一次的Shopify导出快照: {snapshot_path}")
+        
+        # 快照的警告和去重统计不计入本次转换
+        snapshot = ShopifyToLingxinConverter()
+        sku_set = set()
+        hashes = {}
+        for shopify_df in snapshot._iter_handle_chunks(snapshot_path, chunk_size):
+            lingxin_df = snapshot._transform_data(shopify_df, sku_set, executor,
+                                                  workers * self.SHARDS_PER_WORKER)
+            lingxin_df = snapshot._remove_duplicates(lingxin_df, sku_set)
+            sku_set.update(lingxin_df['*SKU'])
+            hashes.update(zip(lingxin_df['*SKU'], self._row_hashes(lingxin_df)))
+        
+        print(f"快照共 {len(hashes)} 个SKU")
+        return hashes
     
-    def _process_material(self, row):
-        """处理产品材质字段"""
-        material_col = '物品材质 (product.metafields.shopify.item-material)'
-        if material_col in row and pd.notna(row[material_col]):
-            return truncate_field(row[material_col], 50)
-        return ''
-    
-    def _process_category(self, row, lingxin_row, last_category):
-        """处理分类字段"""
-        if pd.notna(row['Product Category']) and row['Product Category'] != '':
-            category = row['Product Category']
-        else:
-            category = last_category
+    def _row_hashes(self, lingxin_df):
+        """计算每行转换结果的哈希（按字符串形式，保证两次转换可比）"""
+        return pd.util.hash_pandas_object(lingxin_df.astype(str), index=False).tolist()
+    
+    def _select_changes(self, lingxin_df, previous_hashes):
+        """
+        与快照按SKU做哈希连接，只保留新增和变更的行
         
-        if category:
-            categories = str(category).split(' > ')
-            lingxin_row['一级分类'] = truncate_field(categories[0] if len(categories) > 0 else '', 50)
-            lingxin_row['二级分类'] = truncate_field(categories[1] if len(categories) > 1 else '', 50)
-            lingxin_row['三级分类'] = truncate_field(categories[2] if len(categories) > 2 else '', 50)
-        else:
-            lingxin_row['一级分类'] = ''
-            lingxin_row['二级分类'] = ''
-            lingxin_row['三级分类'] = ''
-    
-    def _remove_duplicates(self, df):
-        """去除重复的SKU"""
-        original_count = len(df)
-        df = df.drop_duplicates(subset=['*SKU'], keep='first')
-        self.duplicate_count = original_count - len(df)
-        return df
+        已匹配的SKU会从previous_hashes中移除，全部处理完后剩下的就是已删除的SKU。
+        """
+        if self.delta_counts is None:
+            self.delta_counts = {'新增': 0, '变更': 0, '未变': 0, '删除': 0}
+        
+        keep = []
+        for sku, row_hash in zip(lingxin_df['*SKU'], self._row_hashes(lingxin_df)):
+            previous_hash = previous_hashes.pop(sku, None)
+            if previous_hash is None:
+                self.delta_counts['新增'] += 1
+                keep.append(True)
+            elif previous_hash != row_hash:
+                self.delta_counts['变更'] += 1
+                keep.append(True)
+            else:
+                self.delta_counts['未变'] += 1
+                keep.append(False)
+        
+        return lingxin_df[keep]
+    
+    def _collect_removed(self, previous_hashes):
+        """快照中存在、本次导出中已不存在的SKU"""
+        self.delta_counts['删除'] = len(previous_hashes)
+        return pd.DataFrame({'*SKU': list(previous_hashes)})
+    
+    def _create_writer(self, output_path, output_format):
+        """创建输出写入器（设置了每个文件的行数上限时按行数拆分输出）"""
+        if self.max_rows_per_file:
+            return PartitionedWriter(output_path, output_format, self.max_rows_per_file, self.write_executor)
+        return create_writer(output_path, output_format)
     
-    def _write_excel(self, df, output_path):
-        """写入Excel文件"""
+    def _write_output(self, df, output_path, output_format='xlsx', removed_skus=None, categories=None,
+                      handles=None):
+        """
+        写入领星ERP导入文件（流式写入，空单元格不写入）
+        
+        handles为每行的Handle，拆分输出时同一Handle的变体写入同一个文件。
+        """
         print(f"正在写入领星ERP导入文件: {output_path}")
-        with pd.ExcelWriter(output_path, engine='openpyxl') as writer:
-            df.to_excel(writer, index=False, sheet_name='产品')
+        with self._create_writer(output_path, output_format) as writer:
+            writer.add_sheet('产品', df.columns)
+            writer.append('产品', df, groups=handles)
+            if categories is not None:
+                writer.write(self.CATEGORY_SHEET, categories)
+            if removed_skus is not None:
+                writer.write(self.REMOVED_SHEET, removed_skus)
+        self._print_parts(writer)
+    
+    def _print_parts(self, writer):
+        """拆分输出时打印各部分的文件"""
+        if not isinstance(writer, PartitionedWriter):
+            return
+        print(f"已拆分为 {len(writer.paths)} 个文件（每个文件最多 {writer.max_rows} 条产品）:")
+        for path, part in zip(writer.paths, writer.parts):
+            print(f"  {path}（{part['rows']} 条）")
+        if writer.oversized_groups:
+            print(f"  ⚠ {writer.oversized_groups} 个Handle的变体数超过上限，已单独放在一个文件中")
     
     def _print_warnings(self):
-        """打印警告信息"""
-        if self.sku_warnings:
-            print(f"\n⚠ 警告：发现 {len(self.sku_warnings)} 个SKU超过50字符限制，已自动截断：")
-            for warning in self.sku_warnings:
-                print(f"  - {warning}")
-        
-        if self.duplicate_count > 0:
-            print(f"\n⚠ 警告：发现 {self.duplicate_count} 个重复的SKU，已自动去重（保留首次出现的记录）")
+        """打印警告汇总（各类别的数量和样例，完整明细见明细文件）"""
+        self.warnings.print_summary()
+    
+    def _print_timings(self, timings, total_seconds, merge_seconds=None):
+        """打印批量转换各店铺的耗时汇总（秒）"""
+        print(f"\n各店铺耗时（秒，读取和转换在子进程中并行执行）:")
+        print(f"  {'店铺':<24}{'行数':>10}{'SKU数':>10}{'读取':>8}{'转换':>8}{'SKU处理':>8}{'写入':>8}")
+        for store, read_count, sku_count, read_seconds, transform_seconds, sku_seconds, write_seconds in timings:
+            print(f"  {store:<24}{read_count:>10}{sku_count:>10}{read_seconds:>8.2f}{transform_seconds:>8.2f}"
+                  f"{sku_seconds:>8.2f}{write_seconds:>8.2f}")
+        if merge_seconds is not None:
+            print(f"  合并文件保存: {merge_seconds:.2f}")
+        print(f"  总耗时: {total_seconds:.2f}")
+    
+    def _print_delta(self):
+        """打印增量转换统计"""
+        if self.delta_counts is None:
+            return
+        
+        counts = self.delta_counts
+        print(f"\n增量转换: 新增 {counts['新增']} 个SKU, 变更 {counts['变更']} 个, "
+              f"未变 {counts['未变']} 个（已跳过）, 删除 {counts['删除']} 个（见 {self.REMOVED_SHEET}）")
+
+
+@lru_cache(maxsize=65536)
+def _split_category_path(path):
+    """拆分一个分类路径为三级（每级截断到50字符，缺少的层级为空），结果按路径缓存"""
+    levels = str(path).split(' > ')
+    return tuple(levels[level][:50] if level < len(levels) else '' for level in range(3))
+
+
+def _convert_store(shopify_csv_path):
+    """
+    进程池任务：读取并转换一个店铺的导出文件（不含SKU冲突处理）
+    
+    Returns:
+        (领星ERP格式的DataFrame, 原始SKU列, 读取行数, 读取耗时, 转换耗时)
+    """
+    converter = ShopifyToLingxinConverter()
+    started = time.perf_counter()
+    shopify_df = converter._read_shopify_csv(shopify_csv_path)
+    shopify_df = shopify_df[shopify_df['Handle'].notna()].reset_index(drop=True)
+    read_seconds = time.perf_counter() - started
+    
+    started = time.perf_counter()
+    inherited = converter._inherit_variant_fields(shopify_df)
+    lingxin_df, sku_source = converter._transform_columns(shopify_df, inherited)
+    transform_seconds = time.perf_counter() - started
+    return lingxin_df, sku_source, len(shopify_df), read_seconds, transform_seconds
+
+
+def _transform_shard(shard):
+    """进程池任务：转换一个Handle分组分片（不含SKU冲突处理）"""
+    shopify_df, inherited = shard
+    return ShopifyToLingxinConverter()._transform_columns(shopify_df, inherited)
@@ -0,0 +1,321 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+ERP商品索引文件模块
+
+把ERP商品文件中配对需要的列和预先建立的配对查找表、模糊匹配索引保存为一个文件，
+同一个ERP文件配对多个店铺时不必每次重新读取Excel和建立索引。
+
+文件格式：8字节标识、8字节头部长度、JSON头部，之后是按64字节对齐的numpy数组。
+数值数组加载时直接内存映射（np.memmap），字符串数组以UTF-8字节保存，加载时一次解码。
+数字和文字混合的列按值保存类型标记和JSON数据，加载时只解析数据，不会执行文件中的任何内容。
+"""
+
+import datetime
+import hashlib
+import json
+import os
+import numpy as np
+import pandas as pd
+
+from .fuzzy_index import TitleIndex
+
+
+# 文件标识
+MAGIC = b'LXERPIDX'
+
+# 文件格式版本，格式或索引的建立方式变化时递增，旧版本的索引文件会自动重建
+FORMAT_VERSION = 6
+
+# 数组在文件中的对齐字节数
+ALIGNMENT = 64
+
+# 字符串数组中的分隔符
+SEPARATOR = '\x00'
+
+# 混合类型列中各值的类型标记
+VALUE_TYPES = ['null', 'str', 'int', 'float', 'bool', 'timestamp', 'datetime', 'date', 'time']
+
+
+def file_sha256(path):
+    """文件内容的SHA-256"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class ErpIndex:
+    """
+    ERP商品索引
+    
+    Attributes:
+        source: 源文件信息（path、sha256、size）
+        frame: 配对需要的ERP列（与读取源文件得到的DataFrame中对应列相同）
+        lookups: 各配对方法的查找表 {方法: (配对键pd.Index, ERP行位置数组)}
+        title_index: 模糊匹配的品名索引（ERP文件没有品名列时为None）
+        key_kinds: 建立查找表时指定的配对键规范化方式 {列名: 方式}
+    """
+    
+    def __init__(self, source, frame, lookups, title_index=None, key_kinds=None):
+        self.source = source
+        self.frame = frame
+        self.lookups = lookups
+        self.title_index = title_index
+        self.key_kinds = dict(key_kinds or {})
+    
+    def is_current(self, source_path):
+        """索引是否由源文件的当前内容建立"""
+        return self.source['sha256'] == file_sha256(source_path)
+    
+    def save(self, path):
+        """写入索引文件（先写入同目录的临时文件再替换，写入中断时不会留下不完整的索引文件）"""
+        arrays = {}
+        columns = encode_frame(arrays, self.frame)
+        
+        for method, (keys, positions) in self.lookups.items():
+            _encode_strings(arrays, f'lookup_{method}_keys', list(keys))
+            arrays[f'lookup_{method}_positions'] = np.asarray(positions, dtype=np.int64)
+        
+        if self.title_index is not None:
+            _encode_strings(arrays, 'fuzzy_titles', self.title_index.titles)
+            _encode_strings(arrays, 'fuzzy_chars', list(self.title_index.vocabulary))
+            arrays['fuzzy_postings'] = self.title_index.postings
+            arrays['fuzzy_counts'] = self.title_index.counts
+            arrays['fuzzy_lengths'] = self.title_index.lengths
+            arrays['fuzzy_offsets'] = self.title_index.offsets
+        
+        header = {
+            'version': FORMAT_VERSION,
+            'source': self.source,
+            'rows': len(self.frame),
+            'columns': columns,
+            'lookups': list(self.lookups),
+            'fuzzy': self.title_index is not None,
+            'key_kinds': self.key_kinds,
+        }
+        # 临时文件按进程号命名（mkstemp创建的文件只有所有者可读，替换后索引文件的权限会改变）
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            write_array_file(temp_path, MAGIC, header, arrays)
+            os.replace(temp_path, path)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+    
+    @classmethod
+    def load(cls, path):
+        """
+        读取索引文件
+        
+        Returns:
+            ErpIndex，文件格式版本不一致时返回None（需要重建）
+        
+        Raises:
+            ValueError: 不是ERP索引文件
+        """
+        header = read_array_header(path, MAGIC)
+        if header is None:
+            raise ValueError(f"不是ERP索引文件: {path}")
+        
+        if header['version'] != FORMAT_VERSION:
+            return None
+        
+        arrays = read_arrays(path, header)
+        frame = decode_frame(arrays, header['columns'], header['rows'])
+        
+        lookups = {}
+        for method in header['lookups']:
+            keys = _decode_strings(arrays, f'lookup_{method}_keys')
+            lookups[method] = (pd.Index(keys, dtype=object), arrays[f'lookup_{method}_positions'])
+        
+        title_index = None
+        if header['fuzzy']:
+            title_index = TitleIndex.from_arrays(
+                _decode_strings(arrays, 'fuzzy_titles'), _decode_strings(arrays, 'fuzzy_chars'),
+                arrays['fuzzy_postings'], arrays['fuzzy_counts'], arrays['fuzzy_lengths'], arrays['fuzzy_offsets'])
+        
+        return cls(header['source'], frame, lookups, title_index, header['key_kinds'])
+
+
+def write_array_file(path, magic, header, arrays):
+    """
+    写入数组文件：标识、头部长度、JSON头部，之后是按ALIGNMENT对齐的数组
+    
+    Args:
+        path: 文件路径
+        magic: 文件标识
+        header: 头部信息（可JSON序列化的字典，写入时加入数组的位置信息）
+        arrays: {名称: numpy数组}
+    """
+    header = dict(header, arrays={})
+    arrays = {name: np.ascontiguousarray(array) for name, array in arrays.items()}
+    
+    # 先计算各数组的偏移量（头部长度取决于偏移量，按头部长度的上限预留空间）
+    offset = 0
+    for name, array in arrays.items():
+        header['arrays'][name] = {'dtype': array.dtype.str, 'shape': list(array.shape), 'offset': offset}
+        offset += _aligned(array.nbytes)
+    header_bytes = json.dumps(header, ensure_ascii=False).encode('utf-8')
+    data_start = _aligned(len(magic) + 8 + len(header_bytes) + 64)
+    header['data_start'] = data_start
+    header_bytes = json.dumps(header, ensure_ascii=False).encode('utf-8')
+    
+    with open(path, 'wb') as f:
+        f.write(magic)
+        f.write(len(header_bytes).to_bytes(8, 'little'))
+        f.write(header_bytes)
+        for name, array in arrays.items():
+            f.seek(data_start + header['arrays'][name]['offset'])
+            f.write(array.tobytes())
+
+
+def read_array_header(path, magic):
+    """读取数组文件的头部，文件标识不同时返回None"""
+    with open(path, 'rb') as f:
+        if f.read(len(magic)) != magic:
+            return None
+        return json.loads(f.read(int.from_bytes(f.read(8), 'little')).decode('utf-8'))
+
+
+def read_arrays(path, header):
+    """读取数组文件中的数组（内存映射）"""
+    arrays = {}
+    for name, info in header['arrays'].items():
+        shape = tuple(info['shape'])
+        if 0 in shape:
+            arrays[name] = np.empty(shape, dtype=info['dtype'])
+        else:
+            arrays[name] = np.memmap(path, dtype=info['dtype'], mode='r',
+                                     offset=header['data_start'] + info['offset'], shape=shape)
+    return arrays
+
+
+def encode_frame(arrays, frame):
+    """
+    保存DataFrame的各列
+    
+    Returns:
+        各列的信息列表（列名和保存方式），读取时传给decode_frame
+    """
+    return [{'name': name, 'kind': _encode_column(arrays, f'column{position}', frame[name])}
+            for position, name in enumerate(frame.columns)]
+
+
+def decode_frame(arrays, columns, rows):
+    """读取encode_frame保存的DataFrame"""
+    return pd.DataFrame({
+        column['name']: _decode_column(arrays, f'column{position}', column['kind'], rows)
+        for position, column in enumerate(columns)
+    })
+
+
+def _aligned(size):
+    """按ALIGNMENT向上取整"""
+    return (size + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def _encode_strings(arrays, name, values):
+    """字符串列表保存为UTF-8字节数组（以SEPARATOR分隔）"""
+    arrays[f'{name}_data'] = np.frombuffer(SEPARATOR.join(values).encode('utf-8'), dtype=np.uint8)
+    arrays[f'{name}_count'] = np.array([len(values)], dtype=np.int64)
+
+
+def _decode_strings(arrays, name):
+    """读取_encode_strings保存的字符串列表"""
+    if not arrays[f'{name}_count'][0]:
+        return []
+    return bytes(arrays[f'{name}_data']).decode('utf-8').split(SEPARATOR)
+
+
+def _encode_column(arrays, name, series):
+    """
+    保存一列数据，返回保存方式
+    
+    数值列直接保存数组；只含字符串和空值的列保存为字符串数组和空值标记；
+    其他列（如数字和文字混合）按值保存类型标记（见VALUE_TYPES）和JSON数据，
+    读取后的值与原列相同（空值读取为NaN，不支持的类型按str()保存为文字）。
+    """
+    if series.dtype.kind in 'biuf':
+        arrays[name] = series.to_numpy()
+        return 'numeric'
+    
+    values = series.to_numpy(dtype=object)
+    nulls = pd.isna(values)
+    strings = values[~nulls]
+    if all(type(value) is str and SEPARATOR not in value for value in strings):
+        _encode_strings(arrays, name, list(strings))
+        arrays[f'{name}_nulls'] = nulls
+        return 'string'
+    
+    types = np.zeros(len(values), dtype=np.uint8)
+    payloads = []
+    for position, value in enumerate(values):
+        if nulls[position]:
+            value_type, payload = 'null', None
+        else:
+            value_type, payload = _encode_value(value)
+        types[position] = VALUE_TYPES.index(value_type)
+        payloads.append(payload)
+    arrays[f'{name}_types'] = types
+    arrays[f'{name}_data'] = np.frombuffer(json.dumps(payloads, ensure_ascii=False).encode('utf-8'), dtype=np.uint8)
+    return 'mixed'
+
+
+def _decode_column(arrays, name, kind, rows):
+    """读取_encode_column保存的列"""
+    if kind == 'numeric':
+        return np.array(arrays[name])
+    
+    if kind == 'string':
+        values = np.full(rows, np.nan, dtype=object)
+        values[~arrays[f'{name}_nulls']] = _decode_strings(arrays, name)
+        return values
+    
+    if kind != 'mixed':
+        raise ValueError(f"不支持的列保存方式: {kind}")
+    payloads = json.loads(bytes(arrays[f'{name}_data']).decode('utf-8'))
+    values = np.empty(rows, dtype=object)
+    values[:] = [_decode_value(VALUE_TYPES[value_type], payload)
+                 for value_type, payload in zip(arrays[f'{name}_types'].tolist(), payloads)]
+    return values
+
+
+def _encode_value(value):
+    """混合类型列中的一个值转为 (类型标记, 可JSON序列化的数据)"""
+    if isinstance(value, (bool, np.bool_)):
+        return 'bool', bool(value)
+    if isinstance(value, (int, np.integer)):
+        return 'int', int(value)
+    if isinstance(value, (float, np.floating)):
+        # JSON不能直接表示无穷大，按文字保存
+        return 'float', repr(float(value))
+    if isinstance(value, str):
+        return 'str', value
+    if isinstance(value, pd.Timestamp):
+        return 'timestamp', value.isoformat()
+    if isinstance(value, datetime.datetime):
+        return 'datetime', value.isoformat()
+    if isinstance(value, datetime.date):
+        return 'date', value.isoformat()
+    if isinstance(value, datetime.time):
+        return 'time', value.isoformat()
+    return 'str', str(value)
+
+
+def _decode_value(value_type, payload):
+    """_encode_value的逆变换"""
+    if value_type == 'null':
+        return np.nan
+    if value_type == 'float':
+        return float(payload)
+    if value_type == 'timestamp':
+        return pd.Timestamp(payload)
+    if value_type == 'datetime':
+        return datetime.datetime.fromisoformat(payload)
+    if value_type == 'date':
+        return datetime.date.fromisoformat(payload)
+    if value_type == 'time':
+        return datetime.time.fromisoformat(payload)
+    return payload
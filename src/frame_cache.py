@@ -0,0 +1,139 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+解析结果缓存模块
+
+Excel文件解析很慢：按文件内容的SHA-256保存解析得到的列（文件格式与ERP索引文件相同，
+数值列加载时内存映射），同一个文件再次读取时直接加载，不再解析Excel。
+缓存总大小超过上限时删除最久未使用的缓存文件。
+
+缓存文件只保存数据（数字和文字混合的列的保存方式见erp_index），加载时不会执行文件中的任何内容。
+"""
+
+import os
+import tempfile
+
+from .erp_index import decode_frame, encode_frame, read_array_header, read_arrays, write_array_file
+
+
+# 文件标识
+MAGIC = b'LXFRAMES'
+
+# 缓存文件格式版本，读取方式变化时递增，旧版本的缓存不再使用
+FORMAT_VERSION = 2
+
+# 默认缓存目录
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'shopify-lingxin-sync')
+
+# 默认的缓存总大小上限（字节）
+MAX_CACHE_BYTES = 2 * 1024 ** 3
+
+
+class FrameCache:
+    """
+    解析后的DataFrame缓存
+    
+    缓存文件为 <缓存目录>/<SHA-256>.frame，保存读取时选取的列；
+    再次读取需要的列都在缓存中时直接加载，否则重新解析并覆盖缓存。
+    读取缓存时更新文件的修改时间，写入缓存后按修改时间从旧到新删除缓存文件，直到总大小不超过上限。
+    """
+    
+    def __init__(self, directory=DEFAULT_CACHE_DIR, max_bytes=MAX_CACHE_BYTES):
+        """
+        Args:
+            directory: 缓存目录（不存在时写入缓存时创建）
+            max_bytes: 缓存总大小上限（字节），刚写入的缓存总会保留
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+    
+    def get(self, sha256, columns):
+        """
+        读取缓存
+        
+        Args:
+            sha256: 源文件内容的SHA-256
+            columns: 需要的列名列表
+        
+        Returns:
+            只含需要的列的DataFrame（列按文件中的顺序），没有可用的缓存时返回None
+        """
+        path = self._path(sha256)
+        if not os.path.exists(path):
+            return None
+        
+        try:
+            header = read_array_header(path, MAGIC)
+        except (OSError, ValueError):
+            return None
+        if header is None or header['version'] != FORMAT_VERSION:
+            return None
+        
+        cached = [column['name'] for column in header['columns']]
+        if not set(columns) <= set(cached):
+            return None
+        
+        frame = decode_frame(read_arrays(path, header), header['columns'], header['rows'])
+        try:
+            # 修改时间即最近使用时间，清理时保留最近用过的缓存
+            os.utime(path)
+        except OSError:
+            pass
+        wanted = set(columns)
+        return frame[[column for column in cached if column in wanted]]
+    
+    def put(self, sha256, frame):
+        """
+        写入缓存（先写入临时文件再替换，多个进程同时写入同一个缓存不会读到不完整的文件）
+        
+        缓存目录不可写时不缓存，返回False。
+        """
+        arrays = {}
+        header = {
+            'version': FORMAT_VERSION,
+            'rows': len(frame),
+            'columns': encode_frame(arrays, frame),
+        }
+        
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+            os.close(fd)
+            try:
+                write_array_file(temp_path, MAGIC, header, arrays)
+                os.replace(temp_path, self._path(sha256))
+            finally:
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+        except OSError:
+            return False
+        
+        self._prune(keep=self._path(sha256))
+        return True
+    
+    def _prune(self, keep):
+        """按修改时间从旧到新删除缓存文件，直到总大小不超过上限（keep总是保留）"""
+        entries = []
+        try:
+            with os.scandir(self.directory) as scan:
+                for entry in scan:
+                    if entry.name.endswith('.frame') and entry.path != keep:
+                        stat = entry.stat()
+                        entries.append((stat.st_mtime, stat.st_size, entry.path))
+            total = os.path.getsize(keep) + sum(size for _, size, _ in entries)
+        except OSError:
+            return
+        
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                # 其他进程已删除，或文件正在使用（Windows）
+                continue
+            total -= size
+    
+    def _path(self, sha256):
+        """缓存文件路径"""
+        return os.path.join(self.directory, f"{sha256}.frame")
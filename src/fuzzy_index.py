@@ -0,0 +1,384 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+模糊匹配的品名索引模块
+"""
+
+import zlib
+import numpy as np
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from difflib import SequenceMatcher
+from itertools import repeat
+
+
+class FuzzyIndex:
+    """
+    模糊匹配索引的基类
+    
+    子类实现match_chunk（为一组品名查找相似度最高的ERP品名），
+    本类负责分块和多进程并行。
+    """
+    
+    def best_matches(self, titles, workers=1, chunk_size=500, threshold=0.0):
+        """
+        批量查找相似度最高的ERP品名
+        
+        workers大于1时在进程池中并行计算：索引通过进程池的初始化函数在每个进程中只传递一次，
+        之后每个任务只传递一块品名；结果按输入顺序合并，与单进程计算完全一致。
+        
+        Args:
+            titles: 查询品名列表（已经过normalize_title，空字符串不查找）
+            workers: 并行计算的进程数
+            chunk_size: 每个任务的品名数
+            threshold: 配对阈值，子类可以跳过相似度不可能达到阈值的ERP品名（见各子类的match_chunk）
+        
+        Returns:
+            (ERP行位置数组, 相似度数组)，没有候选时位置为-1、相似度为0
+        """
+        if workers > 1 and len(titles) > chunk_size:
+            chunks = [titles[start:start + chunk_size] for start in range(0, len(titles), chunk_size)]
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(self,)) as executor:
+                results = [result for chunk in executor.map(_best_matches, chunks, repeat(threshold))
+                           for result in chunk]
+        else:
+            results = self.match_chunk(titles, threshold)
+        
+        positions = np.array([position for position, _ in results], dtype=np.int64)
+        ratios = np.array([ratio for _, ratio in results], dtype=np.float64)
+        return positions, ratios
+    
+    def best_ratio(self, title, positions, bounds=None):
+        """
+        在候选ERP品名中查找SequenceMatcher相似度最高的一个
+        
+        结果与逐一计算ratio()、取最高且靠前的候选完全相同，但先用上界剪枝：
+        候选按相似度上界（默认为长度上界 2×min(a,b)/(a+b)）从高到低检查，上界已不可能超过当前最佳时停止；
+        再用quick_ratio()（字符计数的上界）跳过不可能超过当前最佳的候选，只对剩余候选计算ratio()。
+        整个查询只用一个SequenceMatcher（查询品名为seq1，ERP品名为seq2，与逐一计算时相同）。
+        
+        Args:
+            title: 查询品名（已经过normalize_title）
+            positions: 候选ERP行位置
+            bounds: 各候选的相似度上界（可选，不小于实际的ratio()）
+        
+        Returns:
+            (ERP行位置, 相似度)，没有相似度大于0的候选时为 (-1, 0.0)；相似度相同时取靠前的行
+        """
+        size = len(title)
+        if bounds is None:
+            bounds = [2.0 * min(size, len(self.titles[position])) / (size + len(self.titles[position]))
+                      for position in positions]
+        bounds = sorted(zip([-bound for bound in bounds], positions))
+        
+        matcher = SequenceMatcher(None)
+        matcher.set_seq1(title)
+        best_position = -1
+        best_ratio = 0
+        for bound, position in bounds:
+            if not _may_beat(-bound, position, best_ratio, best_position):
+                break
+            matcher.set_seq2(self.titles[position])
+            if not _may_beat(matcher.quick_ratio(), position, best_ratio, best_position):
+                continue
+            ratio = matcher.ratio()
+            if ratio > best_ratio or (ratio == best_ratio and position < best_position):
+                best_ratio = ratio
+                best_position = position
+        return best_position, best_ratio
+
+
+class TitleIndex(FuzzyIndex):
+    """
+    ERP品名的字符倒排索引
+    
+    SequenceMatcher的相似度 2×匹配字符数/(a+b) 不会超过按两个品名共有的字符数（按出现次数取较小值）
+    计算的上界（即quick_ratio()），也不会超过长度上界 2×min(a,b)/(a+b)。查询时只统计长度上界达到
+    配对阈值的ERP品名，用倒排表一次算出它们与查询共有的字符数，只对上界达到阈值的品名计算相似度，
+    不会漏掉相似度达到阈值的品名。
+    
+    倒排表以CSR数组保存：offsets[c]:offsets[c+1] 为包含第c个字符的ERP行位置（postings）、
+    该字符在这些品名中的出现次数（counts）和品名长度（lengths），每个字符内按品名长度排序。
+    """
+    
+    def __init__(self, titles):
+        """
+        Args:
+            titles: ERP品名（按ERP行顺序，已经过normalize_title，空字符串不参与匹配）
+        """
+        self.titles = list(titles)
+        self.title_lengths = np.array([len(title) for title in self.titles], dtype=np.int32)
+        self.vocabulary = {}
+        
+        char_ids, owners, counts = [], [], []
+        for position, title in enumerate(self.titles):
+            for char, count in Counter(title).items():
+                char_ids.append(self.vocabulary.setdefault(char, len(self.vocabulary)))
+                owners.append(position)
+                counts.append(count)
+        
+        char_ids = np.array(char_ids, dtype=np.int64)
+        owners = np.array(owners, dtype=np.int32)
+        lengths = self.title_lengths[owners]
+        order = np.lexsort((owners, lengths, char_ids))
+        self.postings = owners[order]
+        self.counts = np.array(counts, dtype=np.int32)[order]
+        self.lengths = lengths[order]
+        self.offsets = np.zeros(len(self.vocabulary) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(char_ids, minlength=len(self.vocabulary)), out=self.offsets[1:])
+    
+    @classmethod
+    def from_arrays(cls, titles, chars, postings, counts, lengths, offsets):
+        """
+        由已建立的数组恢复索引（如从ERP索引文件读取）
+        
+        Args:
+            titles: ERP品名列表
+            chars: 按编号排列的字符
+            postings, counts, lengths, offsets: 同建立索引时的同名属性
+        """
+        index = cls.__new__(cls)
+        index.titles = titles
+        index.title_lengths = np.array([len(title) for title in titles], dtype=np.int32)
+        index.vocabulary = {char: char_id for char_id, char in enumerate(chars)}
+        index.postings = postings
+        index.counts = counts
+        index.lengths = lengths
+        index.offsets = offsets
+        return index
+    
+    def candidates(self, title, threshold=0.0):
+        """
+        查找相似度上界达到阈值的ERP行
+        
+        Args:
+            title: 查询品名（已经过normalize_title）
+            threshold: 配对阈值（为0时返回与品名有共同字符的全部ERP行）
+        
+        Returns:
+            (候选ERP行位置数组（升序）, 各候选的相似度上界数组)
+        """
+        size = len(title)
+        # 长度上界达到阈值的品名长度范围（略微放宽，浮点误差只会多一些候选）
+        shortest = size * threshold / (2 - threshold) - 1e-9
+        longest = size * (2 - threshold) / threshold + 1e-9 if threshold > 0 else np.inf
+        
+        single, repeated = [], []
+        for char, count in Counter(title).items():
+            char_id = self.vocabulary.get(char)
+            if char_id is None:
+                continue
+            start, end = self.offsets[char_id], self.offsets[char_id + 1]
+            lengths = self.lengths[start:end]
+            start, end = start + np.searchsorted(lengths, shortest), start + np.searchsorted(lengths, longest, 'right')
+            if count == 1:
+                # 查询中只出现一次的字符：共有数为1，不需要出现次数
+                single.append(self.postings[start:end])
+            else:
+                repeated.append((self.postings[start:end], np.minimum(self.counts[start:end], count)))
+        if not single and not repeated:
+            return np.array([], dtype=np.int64), np.array([], dtype=np.float64)
+        
+        shared = np.bincount(np.concatenate(single), minlength=len(self.titles)) if single else 0
+        if repeated:
+            shared = shared + np.bincount(np.concatenate([owners for owners, _ in repeated]), minlength=len(self.titles),
+                                          weights=np.concatenate([counts for _, counts in repeated])).astype(np.int64)
+        
+        # 上界达到阈值要求共有字符数不少于 size×t/(2-t)（品名长度取下限时），先按共有数筛选
+        positions = np.flatnonzero(shared >= max(shortest, 1))
+        bounds = 2.0 * shared[positions] / (size + self.title_lengths[positions])
+        keep = bounds >= threshold
+        return positions[keep], bounds[keep]
+    
+    def best_match(self, title, threshold=0.0):
+        """
+        查找相似度最高的ERP品名
+        
+        只比较相似度上界达到阈值的ERP品名：相似度达到阈值的品名一定会找到，结果与逐一比较全部ERP品名相同；
+        没有达到阈值的品名时，返回的是上界达到阈值的品名中相似度最高的一个（没有时为 (-1, 0.0)）。
+        
+        Args:
+            title: 查询品名（已经过normalize_title）
+            threshold: 配对阈值
+        
+        Returns:
+            (ERP行位置, 相似度)，没有相似度大于0的候选时为 (-1, 0.0)；
+            相似度相同时取靠前的行
+        """
+        positions, bounds = self.candidates(title, threshold)
+        return self.best_ratio(title, positions.tolist(), bounds.tolist())
+    
+    def match_chunk(self, titles, threshold=0.0):
+        """为一组品名查找相似度最高的ERP品名（空字符串不查找）"""
+        return [self.best_match(title, threshold) if title else (-1, 0.0) for title in titles]
+
+
+class VectorIndex(FuzzyIndex):
+    """
+    基于哈希n-gram向量余弦相似度的ERP品名索引
+    
+    品名的字符2-gram和3-gram经CRC32哈希为特征，按出现次数加权并归一化为单位向量，
+    ERP品名向量按特征转置保存（CSR数组：offsets/postings/weights）。
+    查询时分块计算平台品名×ERP品名的余弦相似度（稀疏矩阵乘法，每块在一个稠密累加数组上按特征累加，
+    不生成完整的N×M矩阵；块的大小同时受累加数组元素数和展开的倒排表总长度限制），
+    每个平台品名保留余弦相似度最高的TOP_K个候选；
+    rescore为True时再用SequenceMatcher计算这些候选的相似度，匹配度与默认引擎可比。
+    """
+    
+    # 字符n-gram长度
+    NGRAMS = (2, 3)
+    
+    # 每个平台品名保留的候选数
+    TOP_K = 10
+    
+    # 每块累加数组的元素数上限（块内平台品名数 × ERP品名数）
+    BLOCK_CELLS = 2000000
+    
+    # 每块展开的倒排表总长度上限（块内每个平台品名的各特征倒排表长度之和）
+    BLOCK_POSTINGS = 2000000
+    
+    def __init__(self, titles, rescore=True):
+        """
+        Args:
+            titles: ERP品名（按ERP行顺序，已经过normalize_title，空字符串不参与匹配）
+            rescore: 是否用SequenceMatcher重新计算候选的相似度（否则以余弦相似度作为相似度）
+        """
+        self.titles = list(titles)
+        self.rescore = rescore
+        
+        positions = [position for position, title in enumerate(self.titles) if title]
+        hashed = [np.array(ngram_hashes(self.titles[position], self.NGRAMS), dtype=np.uint64) for position in positions]
+        owners = np.repeat(np.array(positions, dtype=np.uint64), [len(hashes) for hashes in hashed])
+        
+        # (特征, ERP行)编码为一个整数（高32位为特征哈希），排序并统计出现次数即得到转置的CSR数组
+        pairs = np.concatenate(hashed) if hashed else np.array([], dtype=np.uint64)
+        del hashed
+        pairs <<= np.uint64(32)
+        pairs |= owners
+        del owners
+        pairs, counts = np.unique(pairs, return_counts=True)
+        
+        # 权重按行归一化为单位向量（与title_vector相同）
+        hashed = (pairs >> np.uint64(32)).astype(np.int64)
+        self.postings = (pairs & np.uint64(0xFFFFFFFF)).astype(np.int32)
+        norms = np.sqrt(np.bincount(self.postings, weights=np.square(counts), minlength=len(self.titles)))
+        self.weights = counts / norms[self.postings]
+        
+        starts = np.flatnonzero(np.diff(hashed, prepend=-1))
+        self.features = hashed[starts]
+        self.offsets = np.append(starts, len(hashed)).astype(np.int64)
+    
+    def match_chunk(self, titles, threshold=0.0):
+        """分块计算余弦相似度，为一组品名查找相似度最高的ERP品名（空字符串不查找；候选只取决于余弦相似度，不使用阈值）"""
+        results = [(-1, 0.0)] * len(titles)
+        if not len(self.features):
+            return results
+        
+        for block in self._blocks(titles):
+            scores = self._block_scores(block)
+            k = min(self.TOP_K, scores.shape[1])
+            candidates = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+            for row, (i, _, _) in enumerate(block):
+                results[i] = self._best_candidate(titles[i], scores[row], candidates[row])
+        return results
+    
+    def _blocks(self, titles):
+        """
+        把品名分块：每块的累加数组不超过BLOCK_CELLS个元素，展开的倒排表总长度不超过BLOCK_POSTINGS
+        
+        Yields:
+            [(品名序号, 特征编号数组, 权重数组), ...]（不含空字符串和没有已知特征的品名）
+        """
+        max_rows = max(1, self.BLOCK_CELLS // len(self.titles))
+        block, volume = [], 0
+        for i, title in enumerate(titles):
+            if not title:
+                continue
+            title_features, title_weights = title_vector(title, self.NGRAMS)
+            positions = np.searchsorted(self.features, title_features)
+            positions = np.minimum(positions, len(self.features) - 1)
+            known = self.features[positions] == title_features
+            if not known.any():
+                continue
+            
+            features = positions[known]
+            postings = int((self.offsets[features + 1] - self.offsets[features]).sum())
+            if block and (len(block) >= max_rows or volume + postings > self.BLOCK_POSTINGS):
+                yield block
+                block, volume = [], 0
+            block.append((i, features, title_weights[known]))
+            volume += postings
+        if block:
+            yield block
+    
+    def _block_scores(self, block):
+        """
+        一块平台品名与全部ERP品名的余弦相似度
+        
+        每个平台品名按特征累加到累加数组的对应行：该特征倒排表中的ERP品名加上权重乘积，
+        除累加数组外只需要一个倒排表长度的临时数组。
+        
+        Returns:
+            (品名数, ERP品名数) 的数组
+        """
+        scores = np.zeros((len(block), len(self.titles)))
+        for row, (_, features, weights) in enumerate(block):
+            row_scores = scores[row]
+            for feature, weight in zip(features.tolist(), weights.tolist()):
+                start, end = self.offsets[feature], self.offsets[feature + 1]
+                # 同一特征的倒排表中每个ERP品名只出现一次，按下标累加不会重复
+                row_scores[self.postings[start:end]] += weight * self.weights[start:end]
+        return scores
+    
+    def _best_candidate(self, title, scores, candidates):
+        """从一个平台品名余弦相似度最高的候选中选出最佳匹配：(ERP行位置, 相似度)"""
+        candidates = np.sort(candidates[scores[candidates] > 0])
+        if self.rescore:
+            return self.best_ratio(title, candidates.tolist())
+        
+        best_position = -1
+        best_ratio = 0
+        for position in candidates.tolist():
+            ratio = min(float(scores[position]), 1.0)
+            if ratio > best_ratio:
+                best_ratio = ratio
+                best_position = position
+        return best_position, best_ratio
+
+
+def title_vector(title, ngrams):
+    """
+    品名的哈希n-gram向量
+    
+    Returns:
+        (特征数组（升序）, 权重数组)，权重为n-gram出现次数，归一化为单位向量
+    """
+    features, counts = np.unique(np.array(ngram_hashes(title, ngrams), dtype=np.int64), return_counts=True)
+    weights = counts / np.sqrt(np.square(counts).sum())
+    return features, weights
+
+
+def ngram_hashes(title, ngrams):
+    """品名各个字符n-gram（可重复）的CRC32哈希，品名短于最短的n-gram时为品名本身的哈希"""
+    grams = [title[i:i + n] for n in ngrams for i in range(len(title) - n + 1)] or [title]
+    return [zlib.crc32(gram.encode('utf-8')) for gram in grams]
+
+
+def _may_beat(bound, position, best_ratio, best_position):
+    """相似度上界为bound的候选是否可能取代当前最佳（相似度相同时靠前的行优先）"""
+    return bound > best_ratio or (bound == best_ratio and position < best_position)
+
+
+# 进程池中每个进程的索引（由_init_worker设置）
+_worker_index = None
+
+
+def _init_worker(index):
+    """进程池初始化：保存索引，供该进程的所有任务使用"""
+    global _worker_index
+    _worker_index = index
+
+
+def _best_matches(titles, threshold):
+    """进程池任务：为一块品名查找相似度最高的ERP品名"""
+    return _worker_index.match_chunk(titles, threshold)
@@ -0,0 +1,140 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+配对键规范化模块
+
+各配对方法使用的配对键在这里统一生成：每个DataFrame的每列只规范化一次并缓存，
+相同的值只计算一次，所有配对方法读取同一份配对键。
+"""
+
+import unicodedata
+import numpy as np
+import pandas as pd
+
+
+def key_text(value):
+    """单元格值转为字符串，整数值的浮点数（如Excel读出的 6901234567890.0）不带小数部分"""
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+def normalize_text(text):
+    """NFKC规范化（全角字母数字和空格转为半角），合并连续空白并去掉首尾空白"""
+    return ' '.join(unicodedata.normalize('NFKC', text).split())
+
+
+def normalize_sku(text):
+    """SKU配对键：规范化（不改变大小写，大小写不同的SKU是不同的商品）"""
+    return normalize_text(text)
+
+
+def normalize_title(title):
+    """品名配对键：规范化后去掉大小写差异（casefold），中英文混合的品名都适用"""
+    return normalize_text(title).casefold()
+
+
+def normalize_barcode(text):
+    """
+    条形码配对键
+    
+    只含数字（可带空格和短横线）的条形码按GTIN处理：先去掉前导零（补零到14位的GTIN、
+    带前导零的文本和Excel按数字保存丢了前导零的值是同一个码），最后一位是正确的GTIN
+    校验位时不再变化；校验位不正确且录入的是7位、11位或12位时视为省略了校验位（EAN-8、
+    UPC-A、EAN-13的前7位、11位、12位），补上校验位；其他长度的数字码不补校验位。
+    其他条形码只做规范化（不改变大小写）。
+    """
+    text = normalize_text(text)
+    digits = text.replace(' ', '').replace('-', '')
+    if not digits.isdigit():
+        return text
+    
+    body_length = len(digits)
+    digits = digits.lstrip('0') or '0'
+    if len(digits) <= 14 and gtin_check_digit(digits[:-1]) == digits[-1]:
+        return digits
+    if body_length in (7, 11, 12):
+        return digits + gtin_check_digit(digits)
+    return digits
+
+
+def gtin_check_digit(body):
+    """GTIN校验位（body为不含校验位的数字串）"""
+    total = sum(int(digit) * (3 if i % 2 == 0 else 1) for i, digit in enumerate(reversed(body)))
+    return str((10 - total % 10) % 10)
+
+
+# 配对键的规范化方式
+KEY_KINDS = {
+    'sku': normalize_sku,
+    'barcode': normalize_barcode,
+    'title': normalize_title,
+    'text': str.strip,
+}
+
+
+def key_series(series, kind):
+    """
+    按规范化方式生成一列的配对键
+    
+    Args:
+        series: 原始列
+        kind: 规范化方式（见KEY_KINDS）
+    
+    Returns:
+        配对键Series（索引与原始列相同），空值为空字符串
+    """
+    normalizer = KEY_KINDS[kind]
+    codes, uniques = pd.factorize(series.to_numpy(dtype=object))
+    normalized = np.array([normalizer(key_text(value)) for value in uniques], dtype=object)
+    
+    keys = np.full(len(series), '', dtype=object)
+    found = codes >= 0
+    keys[found] = normalized[codes[found]]
+    return pd.Series(keys, index=series.index)
+
+
+class MatchKeys:
+    """
+    一个DataFrame的配对键缓存
+    
+    kinds可以为指定的列设置规范化方式（如 {'Variant SKU': 'text'}），覆盖配对方法的默认方式；
+    显示用的原始值（text）不受影响。take得到部分行的配对键，与原DataFrame共用缓存。
+    """
+    
+    def __init__(self, df, kinds=None):
+        """
+        Args:
+            df: 商品数据
+            kinds: 各列的规范化方式 {列名: 方式}（可选）
+        """
+        self.df = df
+        self.kinds = dict(kinds or {})
+        self.cache = {}
+        self.parent = None
+        self.positions = None
+    
+    def get(self, column, kind):
+        """列的配对键（kind为配对方法的默认规范化方式）"""
+        return self._keys(column, self.kinds.get(column, kind))
+    
+    def text(self, column):
+        """列的原始值（去掉首尾空白，空值为空字符串），用于输出"""
+        return self._keys(column, 'text')
+    
+    def take(self, positions):
+        """部分行（按行位置）的配对键"""
+        keys = MatchKeys(self.df.iloc[positions], self.kinds)
+        keys.parent = self
+        keys.positions = positions
+        return keys
+    
+    def _keys(self, column, kind):
+        """按规范化方式取列的配对键（第一次使用时生成）"""
+        if (column, kind) not in self.cache:
+            if self.parent is not None:
+                keys = self.parent._keys(column, kind).to_numpy()[self.positions]
+                self.cache[column, kind] = pd.Series(keys, index=self.df.index)
+            else:
+                self.cache[column, kind] = key_series(self.df[column], kind)
+        return self.cache[column, kind]
@@ -4,21 +4,68 @@
 平台商品与领星ERP商品配对工具
 """
 
+import numpy as np
 import pandas as pd
 import os
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
-from difflib import SequenceMatcher
+from .utils import detect_encoding, read_xlsx_columns, read_xlsx_header
+from .writer import create_writer, frame_rows, part_path, write_manifest
+from .profiler import StageProfiler
+from .fuzzy_index import TitleIndex, VectorIndex
+from .match_keys import KEY_KINDS, MatchKeys
+from .erp_index import ErpIndex, file_sha256
+from .frame_cache import DEFAULT_CACHE_DIR, FrameCache
 
 
 class ProductMatcher:
     """商品配对器"""
     
-    def __init__(self):
+    # CSV文件的候选编码（按优先级排序）
+    CSV_ENCODINGS = ['utf-8', 'utf-8-sig', 'gbk', 'gb2312']
+    
+    # 配对方法及名称（级联配对按给定顺序依次使用）
+    MATCH_METHODS = {
+        'sku': 'SKU配对',
+        'barcode': '条形码配对',
+        'title': '品名配对',
+        'fuzzy': '模糊匹配',
+    }
+    
+    # 级联配对的默认顺序：先用精确匹配，最后用模糊匹配
+    DEFAULT_CASCADE = ['sku', 'barcode', 'title', 'fuzzy']
+    
+    # 模糊匹配引擎
+    FUZZY_ENGINES = {
+        'index': '字符倒排索引',
+        'vector': 'n-gram向量余弦相似度',
+    }
+    
+    # 配对结果中取自ERP商品的列（除检测到的SKU、品名、条形码列外，ERP索引还需要保存这些列）
+    ERP_OUTPUT_COLUMNS = ['*SKU', 'SKU', '品名', 'Title']
+    
+    # 读取Excel文件时除检测到的SKU、品名、条形码列外还需要读取的列（配对结果中使用）
+    READ_COLUMNS = ERP_OUTPUT_COLUMNS + ['Variant SKU']
+    
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR):
+        """
+        Args:
+            cache_dir: Excel解析结果的缓存目录（为None时不使用缓存）
+        """
         self.match_results = []
         self.unmatched_platform = []
         self.unmatched_erp = []
+        self.profiler = StageProfiler()
+        # 使用ERP索引文件时加载的索引
+        self.erp_index = None
+        # 各列配对键的规范化方式（覆盖配对方法的默认方式）和已生成的配对键
+        self.key_kinds = {}
+        self.frame_keys = []
+        self.frame_cache = FrameCache(cache_dir) if cache_dir else None
     
-    def match(self, platform_file, erp_file, output_path=None, match_method='sku', shop_name=None):
+    def match(self, platform_file, erp_file, output_path=None, match_method='sku', shop_name=None,
+              output_format='xlsx', profile=None, max_rows_per_file=None, workers=1, erp_index=None,
+              cascade=None, fuzzy_engine='index', rescore=True, key_kinds=None):
         """
         执行商品配对
         
@@ -26,11 +73,26 @@ class ProductMatcher:
             platform_file: 平台商品文件路径（CSV或Excel）
             erp_file: 领星ERP商品文件路径（CSV或Excel）
             output_path: 输出文件路径（可选）
-            match_method: 配对方法 ('sku', 'title', 'barcode', 'fuzzy')
+            match_method: 配对方法 ('sku', 'title', 'barcode', 'fuzzy', 'cascade')
             shop_name: 店铺名称（必填），格式：店铺名称（不含平台前缀）
+            output_format: 输出格式（'xlsx' 或 'csv'，csv时每个sheet单独输出一个文件）
+            profile: 性能分析模式（'memory' 或 'time'，可选），提供时记录各阶段的耗时（和内存峰值），
+                     并在输出文件旁写入JSON报告
+            max_rows_per_file: 每个输出文件的最大商品数（可选），提供时按平台商品行拆分为
+                               <文件名>_partNN 多个文件，各文件在子进程中并行写入，
+                               并生成 <文件名>_manifest.json 清单
+            workers: 模糊匹配时并行计算相似度的进程数（结果与单进程一致）
+            erp_index: ERP索引文件路径（可选），提供时从索引加载ERP商品和已建立的查找表；
+                       索引不存在或ERP文件内容已变化时自动重新建立
+            cascade: 级联配对的方法顺序（可选，默认DEFAULT_CASCADE），
+                     每种方法只处理之前的方法未配对的商品
+            fuzzy_engine: 模糊匹配引擎（'index' 或 'vector'，见FUZZY_ENGINES）
+            rescore: vector引擎是否用SequenceMatcher重新计算候选的相似度（匹配度与index引擎可比）
+            key_kinds: 指定列的配对键规范化方式 {列名: 方式}（可选，方式见KEY_KINDS），
+                       默认SKU列按sku、条形码列按barcode、品名列按title规范化
         
         Returns:
-            输出文件路径
+            输出文件路径（拆分输出时为清单文件路径）
         """
         if not shop_name:
             raise ValueError(
@@ -40,6 +102,16 @@ class ProductMatcher:
                 f"   示例: python main.py match -p shopify.csv -e erp.xlsx -s MyStore"
             )
         
+        if match_method == 'cascade':
+            cascade = self._check_cascade(cascade or self.DEFAULT_CASCADE)
+        elif match_method not in self.MATCH_METHODS:
+            raise ValueError(f"不支持的配对方法: {match_method}")
+        
+        if fuzzy_engine not in self.FUZZY_ENGINES:
+            raise ValueError(f"不支持的模糊匹配引擎: {fuzzy_engine}")
+        
+        self._set_key_kinds(key_kinds)
+        
         # 检查文件是否存在
         if not os.path.exists(platform_file):
             raise FileNotFoundError(
@@ -55,72 +127,92 @@ class ProductMatcher:
                 f"   请检查文件路径是否正确"
             )
         
-        print(f"正在读取平台商品数据: {platform_file}")
-        platform_df = self._read_file(platform_file)
-        
-        print(f"正在读取领星ERP商品数据: {erp_file}")
-        erp_df = self._read_file(erp_file)
-        
-        print(f"平台商品数量: {len(platform_df)}")
-        print(f"ERP商品数量: {len(erp_df)}")
-        
-        # 执行配对
-        if match_method == 'sku':
-            results_df = self._match_by_sku(platform_df, erp_df)
-        elif match_method == 'title':
-            results_df = self._match_by_title(platform_df, erp_df)
-        elif match_method == 'barcode':
-            results_df = self._match_by_barcode(platform_df, erp_df)
-        elif match_method == 'fuzzy':
-            results_df = self._match_fuzzy(platform_df, erp_df)
-        else:
-            raise ValueError(f"不支持的配对方法: {match_method}")
-        
-        # 生成输出路径
-        if output_path is None:
-            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-            output_dir = os.path.dirname(platform_file)
-            output_path = os.path.join(output_dir, f'lingxin_msku_match_{timestamp}.xlsx')
-        
-        # 转换为领星MSKU配对格式
-        lingxin_df = self._convert_to_lingxin_format(results_df, shop_name)
-        
-        # 写入结果
-        self._write_lingxin_results(results_df, lingxin_df, output_path, shop_name)
-        
-        # 打印统计信息
-        self._print_statistics(results_df)
-        
-        return output_path
+        with StageProfiler(profile) as profiler:
+            self.profiler = profiler
+            
+            print(f"正在读取平台商品数据: {platform_file}")
+            with profiler.stage('read_platform') as stage:
+                platform_df = self._read_file(platform_file)
+                stage['rows'] = len(platform_df)
+            
+            with profiler.stage('read_erp') as stage:
+                if erp_index is not None:
+                    self.erp_index = self._load_erp_index(erp_index, erp_file)
+                    erp_df = self.erp_index.frame
+                else:
+                    print(f"正在读取领星ERP商品数据: {erp_file}")
+                    self.erp_index = None
+                    erp_df = self._read_file(erp_file)
+                stage['rows'] = len(erp_df)
+            
+            print(f"平台商品数量: {len(platform_df)}")
+            print(f"ERP商品数量: {len(erp_df)}")
+            
+            # 执行配对
+            with profiler.stage('match', rows=len(platform_df)):
+                if match_method == 'cascade':
+                    results_df = self._match_cascade(platform_df, erp_df, cascade, workers, fuzzy_engine, rescore)
+                else:
+                    results_df = self._match_by(match_method, platform_df, erp_df, workers, fuzzy_engine, rescore)
+            
+            # 生成输出路径
+            if output_path is None:
+                timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+                output_dir = os.path.dirname(platform_file)
+                output_path = os.path.join(output_dir, f'lingxin_msku_match_{timestamp}.{output_format}')
+            
+            # 写入结果（一次遍历写入全部sheet，同时统计）
+            with profiler.stage('write', rows=len(results_df)):
+                if max_rows_per_file:
+                    manifest, statistics = self._write_lingxin_parts(results_df, output_path, shop_name,
+                                                                     output_format, max_rows_per_file)
+                else:
+                    statistics = self._write_lingxin_results(results_df, output_path, shop_name, output_format)
+            
+            # 打印统计信息
+            self._print_statistics(statistics)
+            
+            profiler.write_report(output_path, command='match', platform=platform_file, erp=erp_file,
+                                  method=match_method, rows=len(results_df), matched=statistics['matched'],
+                                  max_rows_per_file=max_rows_per_file, workers=workers, erp_index=erp_index,
+                                  cascade=cascade, fuzzy_engine=fuzzy_engine, rescore=rescore,
+                                  key_kinds=self.key_kinds or None)
+            return manifest if max_rows_per_file else output_path
     
     def _read_file(self, file_path):
         """读取文件（支持CSV和Excel）"""
         ext = os.path.splitext(file_path)[1].lower()
         
         if ext == '.csv':
-            # 尝试多种编码
-            encodings = ['utf-8', 'utf-8-sig', 'gbk', 'gb2312']
-            for encoding in encodings:
-                try:
-                    return pd.read_csv(file_path, encoding=encoding)
-                except UnicodeDecodeError:
-                    continue
-                except Exception as e:
-                    raise Exception(
-                        f"\n❌ 错误：读取CSV文件失败\n"
-                        f"   文件: {file_path}\n"
-                        f"   原因: {str(e)}\n"
-                        f"   请确保文件格式正确"
-                    )
-            raise Exception(
-                f"\n❌ 错误：无法识别CSV文件编码\n"
-                f"   文件: {file_path}\n"
-                f"   已尝试编码: {', '.join(encodings)}\n"
-                f"   建议：使用UTF-8编码保存CSV文件"
-            )
+            encoding = detect_encoding(file_path, self.CSV_ENCODINGS)
+            if encoding is None:
+                raise Exception(
+                    f"\n❌ 错误：无法识别CSV文件编码\n"
+                    f"   文件: {file_path}\n"
+                    f"   已尝试编码: {', '.join(self.CSV_ENCODINGS)}\n"
+                    f"   建议：使用UTF-8编码保存CSV文件"
+                )
+            try:
+                return pd.read_csv(file_path, encoding=encoding)
+            except UnicodeDecodeError as e:
+                raise Exception(
+                    f"\n❌ 错误：无法识别CSV文件编码\n"
+                    f"   文件: {file_path}\n"
+                    f"   原因: {str(e)}\n"
+                    f"   建议：使用UTF-8编码保存CSV文件"
+                )
+            except Exception as e:
+                raise Exception(
+                    f"\n❌ 错误：读取CSV文件失败\n"
+                    f"   文件: {file_path}\n"
+                    f"   原因: {str(e)}\n"
+                    f"   请确保文件格式正确"
+                )
         
         elif ext in ['.xlsx', '.xls']:
             try:
+                if ext == '.xlsx':
+                    return self._read_xlsx(file_path)
                 return pd.read_excel(file_path)
             except Exception as e:
                 raise Exception(
@@ -138,6 +230,114 @@ class ProductMatcher:
                 f"   支持的格式: .csv, .xlsx, .xls"
             )
     
+    def _read_xlsx(self, file_path):
+        """
+        读取xlsx文件中配对需要的列
+        
+        只读模式逐行读取，只解析检测到的SKU、品名、条形码列和READ_COLUMNS；
+        解析结果按文件内容缓存，同一个文件再次读取时不再解析Excel。
+        """
+        header = read_xlsx_header(file_path)
+        columns = self._read_columns(header)
+        if self.frame_cache is None:
+            return read_xlsx_columns(file_path, columns)
+        
+        sha256 = file_sha256(file_path)
+        df = self.frame_cache.get(sha256, columns)
+        if df is not None:
+            print(f"已从缓存加载: {file_path}")
+            return df
+        
+        df = read_xlsx_columns(file_path, columns)
+        self.frame_cache.put(sha256, df)
+        return df
+    
+    def _read_columns(self, header):
+        """读取文件时需要的列（按文件中的顺序），没有可识别的列时读取全部列"""
+        df = pd.DataFrame(columns=header)
+        wanted = {self._detect_sku_column(df), self._detect_title_column(df), self._detect_barcode_column(df)}
+        wanted.update(self.READ_COLUMNS)
+        columns = [column for column in header if column in wanted and column != '']
+        return columns or [column for column in header if column != '']
+    
+    def _match_by(self, method, platform_df, erp_df, workers=1, fuzzy_engine='index', rescore=True):
+        """使用一种配对方法配对"""
+        if method == 'sku':
+            return self._match_by_sku(platform_df, erp_df)
+        if method == 'title':
+            return self._match_by_title(platform_df, erp_df)
+        if method == 'barcode':
+            return self._match_by_barcode(platform_df, erp_df)
+        return self._match_fuzzy(platform_df, erp_df, workers=workers, engine=fuzzy_engine, rescore=rescore)
+    
+    def _check_cascade(self, cascade):
+        """检查级联配对的方法顺序，返回方法列表"""
+        if isinstance(cascade, str):
+            cascade = [method.strip() for method in cascade.split(',') if method.strip()]
+        
+        unknown = [method for method in cascade if method not in self.MATCH_METHODS]
+        if unknown or not cascade or len(set(cascade)) != len(cascade):
+            raise ValueError(
+                f"\n❌ 错误：级联配对的方法顺序不正确: {','.join(cascade)}\n"
+                f"   可选方法: {', '.join(self.MATCH_METHODS)}（每种方法最多出现一次）\n"
+                f"   示例: --cascade {','.join(self.DEFAULT_CASCADE)}"
+            )
+        return list(cascade)
+    
+    def _match_cascade(self, platform_df, erp_df, cascade, workers=1, fuzzy_engine='index', rescore=True):
+        """
+        级联配对：按顺序使用多种配对方法，每种方法只处理之前未配对的商品
+        
+        精确匹配在前时，只有剩余的商品才进入较慢的模糊匹配。
+        配对方法列记录每个商品由哪种方法配对；未配对商品的配对详情取自最后处理它的方法。
+        平台或ERP文件缺少某种方法需要的列时跳过该方法。
+        """
+        print(f"\n使用级联配对: {' -> '.join(self.MATCH_METHODS[method] for method in cascade)}")
+        
+        columns = {}
+        remaining = np.arange(len(platform_df))
+        for method in cascade:
+            # 平台文件没有商品时仍执行第一个可用的方法，得到列齐全的空结果
+            if columns and not len(remaining):
+                break
+            
+            missing = self._missing_match_column(method, platform_df, erp_df)
+            if missing:
+                print(f"\n跳过{self.MATCH_METHODS[method]}：{missing}")
+                continue
+            
+            remaining_keys = self._keys(platform_df).take(remaining)
+            self.frame_keys.append(remaining_keys)
+            results_df = self._match_by(method, remaining_keys.df, erp_df, workers, fuzzy_engine, rescore)
+            for column in results_df.columns:
+                values = columns.setdefault(column, np.full(len(platform_df), '', dtype=object))
+                values[remaining] = results_df[column].to_numpy(dtype=object)
+            
+            matched = (results_df['配对状态'] == '已配对').to_numpy()
+            print(f"{self.MATCH_METHODS[method]}: 已配对 {matched.sum()} 个，剩余 {(~matched).sum()} 个")
+            remaining = remaining[~matched]
+        
+        if not columns:
+            raise ValueError(
+                f"\n❌ 错误：级联配对的方法都无法使用\n"
+                f"   平台或ERP文件缺少SKU、条形码和品名列"
+            )
+        return pd.DataFrame(columns)
+    
+    def _missing_match_column(self, method, platform_df, erp_df):
+        """配对方法需要的列是否缺失，缺失时返回说明"""
+        detect, name = {
+            'sku': (self._detect_sku_column, 'SKU列'),
+            'barcode': (self._detect_barcode_column, '条形码列'),
+            'title': (self._detect_title_column, '品名列'),
+            'fuzzy': (self._detect_title_column, '品名列'),
+        }[method]
+        if not detect(platform_df):
+            return f"平台商品缺少{name}"
+        if not detect(erp_df):
+            return f"ERP商品缺少{name}"
+        return None
+    
     def _match_by_sku(self, platform_df, erp_df):
         """基于SKU配对"""
         print("\n使用SKU进行配对...")
@@ -167,41 +367,18 @@ class ProductMatcher:
         print(f"平台SKU列: {platform_sku_col}")
         print(f"ERP SKU列: {erp_sku_col}")
         
-        # 创建ERP的SKU索引
-        erp_dict = {}
-        for idx, row in erp_df.iterrows():
-            sku = str(row[erp_sku_col]).strip() if pd.notna(row[erp_sku_col]) else ''
-            if sku:
-                erp_dict[sku] = row
-        
-        # 配对
-        results = []
-        for idx, platform_row in platform_df.iterrows():
-            platform_sku = str(platform_row[platform_sku_col]).strip() if pd.notna(platform_row[platform_sku_col]) else ''
-            
-            if platform_sku and platform_sku in erp_dict:
-                erp_row = erp_dict[platform_sku]
-                results.append({
-                    '配对状态': '已配对',
-                    '平台SKU': platform_sku,
-                    'ERP SKU': platform_sku,
-                    '平台品名': platform_row.get('Title', platform_row.get('品名', '')),
-                    'ERP品名': erp_row.get('品名', erp_row.get('Title', '')),
-                    '匹配度': '100%',
-                    '配对方法': 'SKU精确匹配'
-                })
-            else:
-                results.append({
-                    '配对状态': '未配对',
-                    '平台SKU': platform_sku,
-                    'ERP SKU': '',
-                    '平台品名': platform_row.get('Title', platform_row.get('品名', '')),
-                    'ERP品名': '',
-                    '匹配度': '0%',
-                    '配对方法': ''
-                })
-        
-        return pd.DataFrame(results)
+        # 按SKU关联ERP商品
+        platform_keys = self._keys(platform_df)
+        erp_rows = self._join_keys(platform_keys.get(platform_sku_col, 'sku'),
+                                   self._erp_lookup(erp_df, 'sku', erp_sku_col))
+        
+        return self._build_results(
+            erp_rows, 'SKU精确匹配',
+            platform_sku=platform_keys.text(platform_sku_col),
+            erp_sku=self._keys(erp_df).text(erp_sku_col),
+            platform_title=self._column(platform_df, 'Title', '品名'),
+            erp_title=self._column(erp_df, '品名', 'Title'),
+        )
     
     def _match_by_title(self, platform_df, erp_df):
         """基于品名配对"""
@@ -232,41 +409,17 @@ class ProductMatcher:
         print(f"平台品名列: {platform_title_col}")
         print(f"ERP品名列: {erp_title_col}")
         
-        # 创建ERP的品名索引
-        erp_dict = {}
-        for idx, row in erp_df.iterrows():
-            title = str(row[erp_title_col]).strip().lower() if pd.notna(row[erp_title_col]) else ''
-            if title:
-                erp_dict[title] = row
-        
-        # 配对
-        results = []
-        for idx, platform_row in platform_df.iterrows():
-            platform_title = str(platform_row[platform_title_col]).strip().lower() if pd.notna(platform_row[platform_title_col]) else ''
-            
-            if platform_title and platform_title in erp_dict:
-                erp_row = erp_dict[platform_title]
-                results.append({
-                    '配对状态': '已配对',
-                    '平台SKU': platform_row.get('Variant SKU', platform_row.get('*SKU', '')),
-                    'ERP SKU': erp_row.get('*SKU', erp_row.get('SKU', '')),
-                    '平台品名': platform_row[platform_title_col],
-                    'ERP品名': erp_row[erp_title_col],
-                    '匹配度': '100%',
-                    '配对方法': '品名精确匹配'
-                })
-            else:
-                results.append({
-                    '配对状态': '未配对',
-                    '平台SKU': platform_row.get('Variant SKU', platform_row.get('*SKU', '')),
-                    'ERP SKU': '',
-                    '平台品名': platform_row[platform_title_col],
-                    'ERP品名': '',
-                    '匹配度': '0%',
-                    '配对方法': ''
-                })
-        
-        return pd.DataFrame(results)
+        # 按品名（不区分大小写）关联ERP商品
+        erp_rows = self._join_keys(self._keys(platform_df).get(platform_title_col, 'title'),
+                                   self._erp_lookup(erp_df, 'title', erp_title_col))
+        
+        return self._build_results(
+            erp_rows, '品名精确匹配',
+            platform_sku=self._column(platform_df, 'Variant SKU', '*SKU'),
+            erp_sku=self._column(erp_df, '*SKU', 'SKU'),
+            platform_title=platform_df[platform_title_col],
+            erp_title=erp_df[erp_title_col],
+        )
     
     def _match_by_barcode(self, platform_df, erp_df):
         """基于条形码配对"""
@@ -294,45 +447,128 @@ class ProductMatcher:
                 f"   - 条形码, 识别码"
             )
         
-        # 创建ERP的条形码索引
-        erp_dict = {}
-        for idx, row in erp_df.iterrows():
-            barcode = str(row[erp_barcode_col]).strip() if pd.notna(row[erp_barcode_col]) else ''
-            if barcode:
-                erp_dict[barcode] = row
-        
-        # 配对
-        results = []
-        for idx, platform_row in platform_df.iterrows():
-            platform_barcode = str(platform_row[platform_barcode_col]).strip() if pd.notna(platform_row[platform_barcode_col]) else ''
-            
-            if platform_barcode and platform_barcode in erp_dict:
-                erp_row = erp_dict[platform_barcode]
-                results.append({
-                    '配对状态': '已配对',
-                    '平台SKU': platform_row.get('Variant SKU', ''),
-                    'ERP SKU': erp_row.get('*SKU', ''),
-                    '平台品名': platform_row.get('Title', ''),
-                    'ERP品名': erp_row.get('品名', ''),
-                    '匹配度': '100%',
-                    '配对方法': '条形码精确匹配'
-                })
-            else:
-                results.append({
-                    '配对状态': '未配对',
-                    '平台SKU': platform_row.get('Variant SKU', ''),
-                    'ERP SKU': '',
-                    '平台品名': platform_row.get('Title', ''),
-                    'ERP品名': '',
-                    '匹配度': '0%',
-                    '配对方法': ''
-                })
-        
-        return pd.DataFrame(results)
-    
-    def _match_fuzzy(self, platform_df, erp_df, threshold=0.8):
-        """模糊匹配（基于品名相似度）"""
-        print(f"\n使用模糊匹配（相似度阈值: {threshold*100}%）...")
+        # 按条形码关联ERP商品
+        erp_rows = self._join_keys(self._keys(platform_df).get(platform_barcode_col, 'barcode'),
+                                   self._erp_lookup(erp_df, 'barcode', erp_barcode_col))
+        
+        return self._build_results(
+            erp_rows, '条形码精确匹配',
+            platform_sku=self._column(platform_df, 'Variant SKU'),
+            erp_sku=self._column(erp_df, '*SKU'),
+            platform_title=self._column(platform_df, 'Title'),
+            erp_title=self._column(erp_df, '品名'),
+        )
+    
+    def _set_key_kinds(self, key_kinds):
+        """设置各列配对键的规范化方式，清空已生成的配对键"""
+        key_kinds = dict(key_kinds or {})
+        unknown = {column: kind for column, kind in key_kinds.items() if kind not in KEY_KINDS}
+        if unknown:
+            raise ValueError(
+                f"\n❌ 错误：不支持的配对键规范化方式: "
+                f"{', '.join(f'{column}={kind}' for column, kind in unknown.items())}\n"
+                f"   可选方式: {', '.join(KEY_KINDS)}\n"
+                f"   示例: --match-key \"Variant SKU=text\""
+            )
+        self.key_kinds = key_kinds
+        self.frame_keys = []
+    
+    def _keys(self, df):
+        """DataFrame的配对键（同一个DataFrame只生成一次，各配对方法共用）"""
+        for keys in self.frame_keys:
+            if keys.df is df:
+                return keys
+        keys = MatchKeys(df, self.key_kinds)
+        self.frame_keys.append(keys)
+        return keys
+    
+    def _erp_lookup(self, erp_df, method, column):
+        """
+        ERP商品的配对键查找表（使用ERP索引文件时直接取索引中已建立的查找表）
+        
+        Args:
+            erp_df: ERP商品数据
+            method: 配对方法（'sku'、'title' 或 'barcode'，同时是配对键的默认规范化方式）
+            column: 配对键所在的列
+        """
+        if self.erp_index is not None and method in self.erp_index.lookups:
+            return self.erp_index.lookups[method]
+        return self._key_lookup(self._keys(erp_df).get(column, method))
+    
+    def _key_lookup(self, erp_keys):
+        """
+        建立配对键查找表
+        
+        ERP中配对键重复时取最后一行，空键不参与配对。
+        
+        Returns:
+            (配对键pd.Index, 每个配对键对应的ERP行位置数组)
+        """
+        erp_keys = erp_keys.to_numpy()
+        erp_positions = np.flatnonzero((erp_keys != '') & ~pd.Series(erp_keys).duplicated(keep='last').to_numpy())
+        return pd.Index(erp_keys[erp_positions], dtype=object), erp_positions
+    
+    def _join_keys(self, platform_keys, lookup):
+        """
+        按配对键关联平台商品和ERP商品（哈希连接）
+        
+        Returns:
+            每个平台商品对应的ERP行位置数组，-1表示未配对
+        """
+        keys, erp_positions = lookup
+        positions = keys.get_indexer(platform_keys.to_numpy())
+        erp_rows = np.full(len(positions), -1, dtype=np.int64)
+        found = positions >= 0
+        # 查找表为空（如ERP的配对列全部为空）时没有可取的位置，全部未配对
+        erp_rows[found] = np.asarray(erp_positions)[positions[found]]
+        return erp_rows
+    
+    def _column(self, df, *names):
+        """按顺序取第一个存在的列，都不存在时为空字符串"""
+        for name in names:
+            if name in df.columns:
+                return df[name]
+        return pd.Series('', index=df.index, dtype=object)
+    
+    def _build_results(self, erp_rows, method, platform_sku, erp_sku, platform_title, erp_title, scores=None):
+        """
+        生成配对详情
+        
+        Args:
+            erp_rows: 每个平台商品对应的ERP行位置（-1表示未配对）
+            method: 配对方法名称
+            platform_sku, platform_title: 平台商品的SKU和品名（按平台商品顺序）
+            erp_sku, erp_title: ERP商品的SKU和品名（按ERP行位置取值）
+            scores: 每个平台商品的匹配度（可选），默认已配对为100%、未配对为0%
+        
+        Returns:
+            配对结果DataFrame，未配对商品的ERP字段为空
+        """
+        matched = erp_rows >= 0
+        
+        def take(values):
+            result = np.full(len(erp_rows), '', dtype=object)
+            result[matched] = values.to_numpy(dtype=object)[erp_rows[matched]]
+            return result
+        
+        return pd.DataFrame({
+            '配对状态': np.where(matched, '已配对', '未配对').astype(object),
+            '平台SKU': platform_sku.to_numpy(),
+            'ERP SKU': take(erp_sku),
+            '平台品名': platform_title.to_numpy(),
+            'ERP品名': take(erp_title),
+            '匹配度': np.where(matched, '100%', '0%').astype(object) if scores is None else scores,
+            '配对方法': np.where(matched, method, '').astype(object),
+        })
+    
+    def _match_fuzzy(self, platform_df, erp_df, threshold=0.8, workers=1, engine='index', rescore=True):
+        """
+        模糊匹配（基于品名相似度），workers大于1时多进程并行计算相似度
+        
+        engine为'index'时用字符倒排索引筛选相似度可能达到阈值的候选（配对结果与逐一比较相同）；
+        为'vector'时用哈希n-gram向量的余弦相似度选出候选，rescore为False时直接以余弦相似度作为匹配度。
+        """
+        print(f"\n使用模糊匹配（相似度阈值: {threshold*100}%，引擎: {self.FUZZY_ENGINES[engine]}）...")
         
         platform_title_col = self._detect_title_column(platform_df)
         erp_title_col = self._detect_title_column(erp_df)
@@ -355,58 +591,127 @@ class ProductMatcher:
                 f"   - 品名, 产品名称, 商品名称"
             )
         
-        results = []
-        for idx, platform_row in platform_df.iterrows():
-            platform_title = str(platform_row[platform_title_col]).strip() if pd.notna(platform_row[platform_title_col]) else ''
-            
-            if not platform_title:
-                results.append({
-                    '配对状态': '未配对',
-                    '平台SKU': platform_row.get('Variant SKU', ''),
-                    'ERP SKU': '',
-                    '平台品名': '',
-                    'ERP品名': '',
-                    '匹配度': '0%',
-                    '配对方法': ''
-                })
-                continue
-            
-            # 查找最佳匹配
-            best_match = None
-            best_ratio = 0
-            
-            for erp_idx, erp_row in erp_df.iterrows():
-                erp_title = str(erp_row[erp_title_col]).strip() if pd.notna(erp_row[erp_title_col]) else ''
-                if not erp_title:
-                    continue
-                
-                ratio = SequenceMatcher(None, platform_title.lower(), erp_title.lower()).ratio()
-                if ratio > best_ratio:
-                    best_ratio = ratio
-                    best_match = erp_row
-            
-            if best_match is not None and best_ratio >= threshold:
-                results.append({
-                    '配对状态': '已配对',
-                    '平台SKU': platform_row.get('Variant SKU', ''),
-                    'ERP SKU': best_match.get('*SKU', ''),
-                    '平台品名': platform_title,
-                    'ERP品名': best_match[erp_title_col],
-                    '匹配度': f'{best_ratio*100:.1f}%',
-                    '配对方法': '模糊匹配'
-                })
-            else:
-                results.append({
-                    '配对状态': '未配对',
-                    '平台SKU': platform_row.get('Variant SKU', ''),
-                    'ERP SKU': '',
-                    '平台品名': platform_title,
-                    'ERP品名': '',
-                    '匹配度': f'{best_ratio*100:.1f}%' if best_match else '0%',
-                    '配对方法': ''
-                })
-        
-        return pd.DataFrame(results)
+        # ERP品名索引，每个平台品名只与相似度可能达到阈值的候选比较
+        index = self._erp_title_index(erp_df, erp_title_col, engine, rescore)
+        
+        # 查找最佳匹配
+        platform_keys = self._keys(platform_df)
+        best_positions, best_ratios = index.best_matches(
+            platform_keys.get(platform_title_col, 'title').tolist(), workers=workers, threshold=threshold)
+        
+        found = best_positions >= 0
+        erp_rows = np.where(found & (best_ratios >= threshold), best_positions, -1)
+        scores = np.full(len(platform_df), '0%', dtype=object)
+        scores[found] = [f'{ratio*100:.1f}%' for ratio in best_ratios[found]]
+        
+        return self._build_results(
+            erp_rows, '模糊匹配',
+            platform_sku=self._column(platform_df, 'Variant SKU'),
+            erp_sku=self._column(erp_df, '*SKU'),
+            platform_title=platform_keys.text(platform_title_col),
+            erp_title=erp_df[erp_title_col],
+            scores=scores,
+        )
+    
+    def _erp_title_index(self, erp_df, erp_title_col, engine='index', rescore=True):
+        """
+        ERP品名的模糊匹配索引
+        
+        使用ERP索引文件时index引擎直接取索引中已建立的品名索引；
+        ERP索引文件只保存字符倒排索引，vector引擎的向量每次重新建立。
+        """
+        if engine == 'vector':
+            return VectorIndex(self._keys(erp_df).get(erp_title_col, 'title'), rescore=rescore)
+        if self.erp_index is not None and self.erp_index.title_index is not None:
+            return self.erp_index.title_index
+        return TitleIndex(self._keys(erp_df).get(erp_title_col, 'title'))
+    
+    def build_erp_index(self, erp_file, index_path=None, key_kinds=None):
+        """
+        建立ERP商品索引文件
+        
+        读取ERP商品文件，保存配对需要的列、SKU/品名/条形码查找表和模糊匹配的品名索引，
+        之后配对时用 erp_index 参数加载，不必重新读取ERP文件。
+        
+        Args:
+            erp_file: 领星ERP商品文件路径（CSV或Excel）
+            index_path: 索引文件路径（可选，默认为ERP文件同名的.idx文件）
+            key_kinds: 指定列的配对键规范化方式（可选，同match）
+        
+        Returns:
+            索引文件路径
+        """
+        self._set_key_kinds(key_kinds)
+        if not os.path.exists(erp_file):
+            raise FileNotFoundError(
+                f"\n❌ 错误：找不到ERP商品文件\n"
+                f"   文件路径: {erp_file}\n"
+                f"   请检查文件路径是否正确"
+            )
+        if index_path is None:
+            index_path = f"{os.path.splitext(erp_file)[0]}.idx"
+        
+        print(f"正在读取领星ERP商品数据: {erp_file}")
+        erp_df = self._read_file(erp_file)
+        print(f"ERP商品数量: {len(erp_df)}")
+        
+        print(f"正在建立ERP商品索引: {index_path}")
+        self._create_erp_index(erp_file, erp_df).save(index_path)
+        return index_path
+    
+    def _create_erp_index(self, erp_file, erp_df):
+        """由ERP商品数据建立索引"""
+        self.erp_index = None
+        columns = {
+            'sku': self._detect_sku_column(erp_df),
+            'title': self._detect_title_column(erp_df),
+            'barcode': self._detect_barcode_column(erp_df),
+        }
+        lookups = {method: self._erp_lookup(erp_df, method, column)
+                   for method, column in columns.items() if column}
+        title_index = self._erp_title_index(erp_df, columns['title']) if columns['title'] else None
+        
+        # 只保存配对时用到的列（保持原来的列顺序，检测到的列不变）
+        used = set(columns.values()) | set(self.ERP_OUTPUT_COLUMNS)
+        frame = erp_df[[column for column in erp_df.columns if column in used]]
+        
+        source = {'path': os.path.abspath(erp_file), 'sha256': file_sha256(erp_file),
+                  'size': os.path.getsize(erp_file)}
+        return ErpIndex(source, frame, lookups, title_index, self._frame_key_kinds(frame))
+    
+    def _frame_key_kinds(self, frame):
+        """指定的配对键规范化方式中与ERP索引保存的列有关的部分"""
+        return {column: kind for column, kind in self.key_kinds.items() if column in frame.columns}
+    
+    def _load_erp_index(self, index_path, erp_file):
+        """
+        加载ERP商品索引文件，索引文件不存在、格式版本不同、ERP文件内容已变化
+        或配对键的规范化方式不同时重新建立
+        
+        Returns:
+            ErpIndex
+        """
+        erp_index = None
+        if os.path.exists(index_path):
+            try:
+                erp_index = ErpIndex.load(index_path)
+            except ValueError:
+                raise ValueError(
+                    f"\n❌ 错误：ERP索引文件格式不正确\n"
+                    f"   文件: {index_path}\n"
+                    f"   请用 python main.py index-erp 重新建立，或删除该文件"
+                )
+            if (erp_index is not None and erp_index.is_current(erp_file)
+                    and erp_index.key_kinds == self._frame_key_kinds(erp_index.frame)):
+                print(f"已加载ERP商品索引: {index_path}")
+                return erp_index
+            print(f"ERP商品文件已变化或索引版本、配对键规范化方式不同，重新建立索引: {index_path}")
+        else:
+            print(f"ERP商品索引不存在，正在建立: {index_path}")
+        
+        erp_index = self._create_erp_index(erp_file, self._read_file(erp_file))
+        erp_index.save(index_path)
+        return erp_index
     
     def _detect_sku_column(self, df):
         """检测SKU列名"""
@@ -432,63 +737,65 @@ class ProductMatcher:
                 return col
         return None
     
-    def _convert_to_lingxin_format(self, df, shop_name):
+    def _write_lingxin_results(self, results_df, output_path, shop_name, output_format='xlsx'):
         """
-        转换为领星MSKU配对格式
+        写入领星MSKU配对结果
         
         Args:
-            df: 配对结果DataFrame
+            results_df: 原始配对结果
+            output_path: 输出文件路径
             shop_name: 店铺名称
+            output_format: 输出格式（'xlsx' 或 'csv'）
         
         Returns:
-            领星格式的DataFrame
+            统计信息 {'total': 商品数, 'matched': 已配对数}
         """
-        lingxin_data = []
-        
-        # 只处理已配对的商品
-        matched_df = df[df['配对状态'] == '已配对']
+        print(f"\n正在写入领星MSKU配对文件: {output_path}")
         
-        for idx, row in matched_df.iterrows():
-            lingxin_data.append({
-                '*MSKU': row['平台SKU'],  # 平台SKU作为MSKU
-                '*SKU': row['ERP SKU'],    # ERP SKU
-                '店铺': f'[Shopify].{shop_name}'  # 店铺格式：[平台].店铺名
-            })
+        statistics = write_match_results(output_path, output_format, results_df, shop_name)
         
-        return pd.DataFrame(lingxin_data, columns=['*MSKU', '*SKU', '店铺'])
+        print(f"✓ 领星MSKU配对格式已生成")
+        print(f"  - Sheet1: 领星导入格式（{statistics['matched']} 条配对记录）")
+        print(f"  - 店铺: [Shopify].{shop_name}")
+        return statistics
     
-    def _write_lingxin_results(self, results_df, lingxin_df, output_path, shop_name):
-        """
-        写入领星MSKU配对结果
-        
-        Args:
-            results_df: 原始配对结果
-            lingxin_df: 领星格式的配对结果
-            output_path: 输出文件路径
-            shop_name: 店铺名称
+    def _write_lingxin_parts(self, results_df, output_path, shop_name, output_format, max_rows):
         """
-        print(f"\n正在写入领星MSKU配对文件: {output_path}")
+        按行数上限拆分写入领星MSKU配对结果
         
-        with pd.ExcelWriter(output_path, engine='openpyxl') as writer:
-            # Sheet1: 领星MSKU配对导入格式（必须是第一个sheet）
-            lingxin_df.to_excel(writer, index=False, sheet_name='Sheet1')
-            
-            # 配对详情（供参考）
-            results_df.to_excel(writer, index=False, sheet_name='配对详情')
-            
-            # 已配对的商品
-            matched_df = results_df[results_df['配对状态'] == '已配对']
-            if len(matched_df) > 0:
-                matched_df.to_excel(writer, index=False, sheet_name='已配对')
-            
-            # 未配对的商品
-            unmatched_df = results_df[results_df['配对状态'] == '未配对']
-            if len(unmatched_df) > 0:
-                unmatched_df.to_excel(writer, index=False, sheet_name='未配对')
+        每max_rows个平台商品一个文件（<文件名>_partNN），每个文件包含该部分的全部sheet，
+        各文件在子进程中并行写入，最后生成清单文件。
         
+        Returns:
+            (清单文件路径, 统计信息 {'total': 商品数, 'matched': 已配对数})
+        """
+        starts = range(0, max(len(results_df), 1), max_rows)
+        print(f"\n正在写入领星MSKU配对文件（拆分为 {len(starts)} 个文件，每个文件最多 {max_rows} 个商品）")
+        
+        paths = [part_path(output_path, index) for index in range(1, len(starts) + 1)]
+        with ProcessPoolExecutor(max_workers=min(len(starts), os.cpu_count() or 1)) as executor:
+            futures = [executor.submit(write_match_results, path, output_format,
+                                       results_df.iloc[start:start + max_rows], shop_name)
+                       for path, start in zip(paths, starts)]
+            part_statistics = [future.result() for future in futures]
+        
+        parts = [{
+            'file': os.path.basename(path),
+            'rows': statistics['total'],
+            'matched': statistics['matched'],
+            'sheets': match_result_sheets(statistics),
+        } for path, statistics in zip(paths, part_statistics)]
+        
+        manifest = write_manifest(output_path, parts, max_rows)
         print(f"✓ 领星MSKU配对格式已生成")
-        print(f"  - Sheet1: 领星导入格式（{len(lingxin_df)} 条配对记录）")
+        for path, part in zip(paths, parts):
+            print(f"  - {path}（{part['rows']} 个商品，{part['matched']} 条配对记录）")
+        print(f"  - 清单: {manifest}")
         print(f"  - 店铺: [Shopify].{shop_name}")
+        
+        statistics = {'total': sum(part['rows'] for part in parts),
+                      'matched': sum(part['matched'] for part in parts)}
+        return manifest, statistics
     
     def _write_results(self, df, output_path):
         """写入配对结果（旧版方法，保留兼容）"""
@@ -508,10 +815,10 @@ class ProductMatcher:
             if len(unmatched_df) > 0:
                 unmatched_df.to_excel(writer, index=False, sheet_name='未配对')
     
-    def _print_statistics(self, df):
-        """打印统计信息"""
-        total = len(df)
-        matched = len(df[df['配对状态'] == '已配对'])
+    def _print_statistics(self, statistics):
+        """打印统计信息（写入结果时统计的商品数和已配对数）"""
+        total = statistics['total']
+        matched = statistics['matched']
         unmatched = total - matched
         match_rate = (matched / total * 100) if total > 0 else 0
         
@@ -522,3 +829,78 @@ class ProductMatcher:
         print(f"已配对: {matched} ({match_rate:.1f}%)")
         print(f"未配对: {unmatched} ({100-match_rate:.1f}%)")
         print(f"{'='*50}\n")
+
+
+# 领星MSKU配对导入格式（Sheet1）的列
+LINGXIN_COLUMNS = ['*MSKU', '*SKU', '店铺']
+
+# 写入配对结果时每批写入的行数（各sheet的行先按批累积，减少逐行调用写入器）
+WRITE_BATCH_ROWS = 1000
+
+
+def write_match_results(output_path, output_format, results_df, shop_name):
+    """
+    一次遍历配对结果，写入领星MSKU配对文件的全部sheet（可作为进程池任务）
+    
+    每行只转换一次：写入配对详情，按配对状态写入已配对或未配对，已配对的行同时写入Sheet1
+    （领星导入格式，必须是第一个sheet）。已配对、未配对sheet在出现第一行时才建立，
+    没有商品时不建立。商品数和已配对数在同一次遍历中统计。
+    
+    Args:
+        output_path: 输出文件路径
+        output_format: 输出格式（'xlsx' 或 'csv'）
+        results_df: 配对结果
+        shop_name: 店铺名称
+    
+    Returns:
+        统计信息 {'total': 商品数, 'matched': 已配对数}
+    """
+    columns = list(results_df.columns)
+    status = columns.index('配对状态')
+    platform_sku = columns.index('平台SKU')
+    erp_sku = columns.index('ERP SKU')
+    shop = f'[Shopify].{shop_name}'
+    
+    total = 0
+    matched = 0
+    batches = {'Sheet1': [], '配对详情': [], '已配对': [], '未配对': []}
+    with create_writer(output_path, output_format) as writer:
+        writer.add_sheet('Sheet1', LINGXIN_COLUMNS)
+        writer.add_sheet('配对详情', columns)
+        for row in frame_rows(results_df):
+            total += 1
+            batches['配对详情'].append(row)
+            if row[status] == '已配对':
+                if not matched:
+                    writer.add_sheet('已配对', columns, index=2)
+                matched += 1
+                batches['Sheet1'].append((row[platform_sku], row[erp_sku], shop))
+                batches['已配对'].append(row)
+            else:
+                if total - matched == 1:
+                    writer.add_sheet('未配对', columns)
+                batches['未配对'].append(row)
+            
+            if total % WRITE_BATCH_ROWS == 0:
+                _write_batches(writer, batches)
+        _write_batches(writer, batches)
+    
+    return {'total': total, 'matched': matched}
+
+
+def _write_batches(writer, batches):
+    """写入各sheet已累积的行并清空"""
+    for sheet_name, rows in batches.items():
+        if rows:
+            writer.append_rows(sheet_name, rows)
+            rows.clear()
+
+
+def match_result_sheets(statistics):
+    """write_match_results写入的sheet名称（按顺序）"""
+    sheets = ['Sheet1', '配对详情']
+    if statistics['matched']:
+        sheets.append('已配对')
+    if statistics['total'] > statistics['matched']:
+        sheets.append('未配对')
+    return sheets
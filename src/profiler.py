@@ -0,0 +1,188 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+分阶段性能分析模块
+
+记录各处理阶段的墙钟时间、CPU时间、处理行数和内存峰值，并输出JSON报告。
+"""
+
+import json
+import os
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+
+
+# 性能分析模式：memory=记录耗时和内存峰值（tracemalloc会使运行明显变慢），time=只记录耗时
+PROFILE_MODES = ['memory', 'time']
+
+# 迭代结束标记
+_END = object()
+
+
+class StageProfiler:
+    """
+    分阶段性能分析器
+    
+    同名阶段多次执行（如流式模式的每一块）时累加耗时和行数，内存峰值取最大值。
+    未启用时不做任何记录，开销可以忽略。
+    内存峰值由tracemalloc统计，只包含当前进程中Python和numpy分配的内存，
+    CPU时间也只统计当前进程（多进程时子进程的开销不计入）。
+    tracemalloc会使大量小对象分配的阶段（如HTML解析、Excel写入）慢数倍，
+    需要准确耗时时使用time模式。阶段不能嵌套。
+    作为上下文管理器使用时进入时开始计时，退出时（包括出错时）停止内存跟踪。
+    """
+    
+    def __init__(self, mode=None):
+        """
+        Args:
+            mode: 性能分析模式（PROFILE_MODES之一），None表示不启用
+        """
+        if mode is not None and mode not in PROFILE_MODES:
+            raise ValueError(f"不支持的性能分析模式: {mode}")
+        self.enabled = mode is not None
+        self.trace_memory = mode == 'memory'
+        self.stages = {}
+        self.started_at = None
+        self.wall_start = None
+        self.cpu_start = None
+        self.owns_tracing = False
+    
+    def start(self):
+        """开始计时并启动内存跟踪"""
+        if not self.enabled:
+            return
+        
+        self.started_at = datetime.now()
+        self.wall_start = time.perf_counter()
+        self.cpu_start = time.process_time()
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self.owns_tracing = True
+    
+    def stop(self):
+        """停止本分析器启动的内存跟踪（可重复调用）"""
+        if self.owns_tracing:
+            tracemalloc.stop()
+            self.owns_tracing = False
+    
+    def __enter__(self):
+        self.start()
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.stop()
+    
+    @contextmanager
+    def stage(self, name, rows=None):
+        """
+        记录一个阶段
+        
+        Args:
+            name: 阶段名称
+            rows: 处理的行数（可选，也可以在with块中设置 record['rows']）
+        
+        Yields:
+            阶段记录字典
+        """
+        record = {'rows': rows}
+        if not self.enabled:
+            yield record
+            return
+        
+        if self.trace_memory and hasattr(tracemalloc, 'reset_peak'):
+            # Python 3.8没有reset_peak，各阶段的峰值为从开始到该阶段结束的累计峰值
+            tracemalloc.reset_peak()
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        yield record
+        self._add(
+            name,
+            time.perf_counter() - wall_start,
+            time.process_time() - cpu_start,
+            record['rows'],
+            tracemalloc.get_traced_memory()[1] if self.trace_memory else None,
+        )
+    
+    def iterate(self, name, iterable, rows=len):
+        """
+        逐项迭代，每次取下一项的耗时记入name阶段（取出后的处理不计入）
+        
+        Args:
+            name: 阶段名称
+            iterable: 可迭代对象（如分块读取器）
+            rows: 计算每一项行数的函数
+        """
+        iterator = iter(iterable)
+        while True:
+            with self.stage(name) as record:
+                item = next(iterator, _END)
+                if item is not _END:
+                    record['rows'] = rows(item)
+            if item is _END:
+                return
+            yield item
+    
+    def _add(self, name, wall_seconds, cpu_seconds, rows, peak_bytes):
+        """累加一次阶段执行的记录"""
+        stage = self.stages.setdefault(name, {
+            'calls': 0, 'wall_seconds': 0.0, 'cpu_seconds': 0.0, 'rows': None, 'peak_bytes': None,
+        })
+        stage['calls'] += 1
+        stage['wall_seconds'] += wall_seconds
+        stage['cpu_seconds'] += cpu_seconds
+        if rows is not None:
+            stage['rows'] = (stage['rows'] or 0) + rows
+        if peak_bytes is not None:
+            stage['peak_bytes'] = max(stage['peak_bytes'] or 0, peak_bytes)
+    
+    def write_report(self, output_path, **info):
+        """
+        把性能报告写入输出文件旁的 <输出文件名>_profile.json
+        
+        Args:
+            output_path: 输出文件路径
+            **info: 写入报告的其他信息（命令、输入文件等）
+        
+        Returns:
+            报告文件路径，未启用时返回None
+        """
+        if not self.enabled:
+            return None
+        
+        stages = []
+        for name, stage in self.stages.items():
+            wall_seconds = stage['wall_seconds']
+            rows = stage['rows']
+            peak_bytes = stage['peak_bytes']
+            stages.append({
+                'name': name,
+                'calls': stage['calls'],
+                'wall_seconds': round(wall_seconds, 4),
+                'cpu_seconds': round(stage['cpu_seconds'], 4),
+                'rows': rows,
+                'rows_per_sec': round(rows / wall_seconds, 1) if rows and wall_seconds > 0 else None,
+                'peak_memory_mb': round(peak_bytes / 1024 / 1024, 2) if peak_bytes is not None else None,
+            })
+        
+        report = dict(info)
+        report['started_at'] = self.started_at.isoformat(timespec='seconds')
+        report['profile_mode'] = 'memory' if self.trace_memory else 'time'
+        report.setdefault('output', output_path)
+        report['total'] = {
+            'wall_seconds': round(time.perf_counter() - self.wall_start, 4),
+            'cpu_seconds': round(time.process_time() - self.cpu_start, 4),
+            'peak_memory_mb': max((stage['peak_memory_mb'] for stage in stages
+                                   if stage['peak_memory_mb'] is not None), default=None),
+        }
+        report['stages'] = stages
+        
+        self.stop()
+        
+        report_path = f"{os.path.splitext(output_path)[0]}_profile.json"
+        with open(report_path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        
+        print(f"性能报告: {report_path}")
+        return report_path
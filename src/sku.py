@@ -0,0 +1,120 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+SKU批量规范化模块
+"""
+
+import pandas as pd
+
+
+class SkuNormalizer:
+    """
+    SKU批量规范化器
+    
+    按列清理非法字符、截断过长的SKU，并为截断后冲突的SKU添加序号后缀。
+    每个截断前缀的下一个可用序号记录在索引中，冲突处理是均摊O(1)的；
+    同一个实例可以跨批次使用（流式模式），索引会持续保留。
+    """
+    
+    # 领星ERP的SKU最大长度
+    MAX_LENGTH = 50
+    
+    # 添加序号后缀时保留的前缀长度（前缀 + '-' + 两位序号 = 50）
+    PREFIX_LENGTH = 47
+    
+    # 非法字符：领星ERP只允许字母，数字，下划线（_），短划线（-），英文点（.），井号（#），斜杆（/）
+    ILLEGAL_PATTERN = r'[^a-zA-Z0-9_\-\.#/]'
+    
+    def __init__(self):
+        self.next_suffix = {}
+    
+    def sanitize(self, source):
+        """
+        按列清理非法字符
+        
+        Args:
+            source: 原始SKU列（字符串）
+        
+        Returns:
+            清理后的SKU列
+        """
+        return source.str.replace(self.ILLEGAL_PATTERN, '', regex=True)
+    
+    def resolve(self, source, cleaned, used_skus=None):
+        """
+        截断过长的SKU并处理截断后的冲突
+        
+        冲突判断只考虑之前的行：used_skus中的SKU、本批之前行的SKU。
+        序号1-99使用两位后缀（-01），超过99时缩短前缀使用更宽的后缀（-100），
+        保证结果不超过50字符且不会重复。
+        
+        Args:
+            source: 原始SKU列
+            cleaned: 清理非法字符后的SKU列
+            used_skus: 之前批次已使用的SKU集合（可选，不会被修改）
+        
+        Returns:
+            (最终SKU列, 处理记录列表)
+            处理记录为字典，type为 illegal_char（清理非法字符）、
+            truncated（截断）或 collision（截断后冲突，已添加序号）
+        """
+        if used_skus is None:
+            used_skus = set()
+        
+        illegal = (cleaned != source) & (cleaned != '')
+        too_long = cleaned.str.len() > self.MAX_LENGTH
+        skus = cleaned.tolist()
+        suffixes = {}
+        
+        if too_long.any():
+            # 未截断SKU首次出现的位置，用于判断截断后的SKU是否与之前的行冲突
+            short_skus = pd.Series(skus)[~too_long.to_numpy()].drop_duplicates()
+            first_position = dict(zip(short_skus.values, short_skus.index))
+            truncated_skus = set()
+            
+            def is_taken(candidate, position):
+                return (candidate in used_skus or candidate in truncated_skus
+                        or first_position.get(candidate, position) < position)
+            
+            for position in too_long.to_numpy().nonzero()[0]:
+                sku = skus[position][:self.MAX_LENGTH]
+                
+                if is_taken(sku, position):
+                    prefix = sku[:self.PREFIX_LENGTH]
+                    # 已被占用的候选只会越来越多，从上次分配的序号之后继续查找
+                    counter = self.next_suffix.get(prefix, 1)
+                    while is_taken(self._with_suffix(prefix, counter), position):
+                        counter += 1
+                    self.next_suffix[prefix] = counter + 1
+                    sku = self._with_suffix(prefix, counter)
+                    suffixes[position] = counter
+                
+                truncated_skus.add(sku)
+                skus[position] = sku
+        
+        records = []
+        for position in (illegal | too_long).to_numpy().nonzero()[0]:
+            if illegal.iat[position]:
+                records.append({
+                    'type': 'illegal_char',
+                    'row': int(position),
+                    'source': source.iat[position],
+                    'sku': cleaned.iat[position],
+                })
+            if too_long.iat[position]:
+                record = {
+                    'type': 'collision' if position in suffixes else 'truncated',
+                    'row': int(position),
+                    'source': cleaned.iat[position],
+                    'sku': skus[position],
+                }
+                if position in suffixes:
+                    record['suffix'] = suffixes[position]
+                records.append(record)
+        
+        return pd.Series(skus, index=cleaned.index, dtype=object), records
+    
+    def _with_suffix(self, prefix, counter):
+        """生成带序号后缀的SKU，序号超过两位时缩短前缀"""
+        suffix = f"{counter:02d}"
+        return f"{prefix[:self.MAX_LENGTH - 1 - len(suffix)]}-{suffix}"
@@ -4,8 +4,53 @@
 通用工具函数模块
 """
 
+import numpy as np
 import pandas as pd
+import codecs
+import csv
+import os
 import re
+from html.parser import HTMLParser
+from openpyxl import load_workbook
+from openpyxl.cell.cell import ERROR_CODES
+from pandas.io.parsers import TextParser
+
+try:
+    # 可选依赖：安装pyarrow后使用其多线程CSV解析器
+    import pyarrow as pa
+    from pyarrow import csv as pa_csv
+except ImportError:
+    pa = None
+    pa_csv = None
+
+
+# 自动检测CSV编码时的候选编码（按优先级排序）
+DEFAULT_ENCODINGS = ['utf-8', 'utf-8-sig', 'gbk', 'gb2312', 'latin1', 'iso-8859-1']
+
+# 编码检测每次读取的样本字节数
+ENCODING_SAMPLE_SIZE = 1024 * 1024
+
+# HTML转文本时，开始和结束都视为分隔（输出一个空格）的块级标签
+HTML_BLOCK_TAGS = {
+    'p', 'br', 'div', 'li', 'ul', 'ol', 'tr', 'td', 'th', 'table', 'section', 'article',
+    'header', 'footer', 'blockquote', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'hr',
+}
+
+# HTML转文本时跳过内容的标签
+HTML_SKIP_TAGS = {'style', 'script'}
+
+# HTML转文本时每次送入解析器的字符数
+HTML_FEED_SIZE = 4096
+
+_WHITESPACE = re.compile(r'\s+')
+
+# style/script块直接跳过，不送入解析器
+# （HTMLParser在这类标签内部每次送入新内容都会重新扫描已缓冲的全部内容）
+_SKIPPED_OPEN = re.compile(r'<(style|script)\b[^>]*>', re.IGNORECASE)
+_SKIPPED_CLOSE = {tag: re.compile(rf'</{tag}\s*>', re.IGNORECASE) for tag in HTML_SKIP_TAGS}
+
+# 编码检测结果缓存：(文件路径, 修改时间, 文件大小, 候选编码) -> 编码
+_encoding_cache = {}
 
 
 def clean_text(value):
@@ -49,24 +94,326 @@ def truncate_field(value, max_length, field_name=''):
     return value_str
 
 
-def detect_encoding(file_path):
+def _has_value(series):
+    """判断每个值是否非空（与clean_text/truncate_field的空值判断一致）"""
+    return series.notna() & series.astype(bool)
+
+
+def clean_text_series(series):
+    """
+    按列清理文本（clean_text的向量化版本）
+    
+    Args:
+        series: 文本列
+    
+    Returns:
+        清理后的文本列，空值返回空字符串
+    """
+    mask = _has_value(series)
+    cleaned = series.where(mask, '').astype(str)
+    cleaned = cleaned.str.replace(r'\s+', ' ', regex=True).str.strip()
+    return cleaned.where(mask, '')
+
+
+def truncate_series(series, max_length):
+    """
+    按列截断字段到指定长度（truncate_field的向量化版本）
+    
+    Args:
+        series: 字段列
+        max_length: 最大长度
+    
+    Returns:
+        截断后的字符串列，空值返回空字符串
+    """
+    mask = _has_value(series)
+    return series.where(mask, '').astype(str).str[:max_length].where(mask, '')
+
+
+def intern_series(series, transform):
+    """
+    按唯一值处理低基数列，结果保存为分类（categorical）类型
+    
+    每个不同的值只处理一次、只保存一份，各行只保存整数编码。
+    
+    Args:
+        series: 字段列
+        transform: 处理函数，接收由唯一值（末尾附加一个空值）组成的列，返回等长的列
+    
+    Returns:
+        分类类型的结果列（索引与series一致）
+    """
+    codes, uniques = pd.factorize(series)
+    # 空值的编码为-1，正好对应末尾附加的空值
+    values = transform(pd.Series(list(uniques) + [None], dtype=object))
+    value_codes, categories = pd.factorize(values)
+    return pd.Series(
+        pd.Categorical.from_codes(value_codes[codes], categories=categories),
+        index=series.index,
+    )
+
+
+class _HtmlTextExtractor(HTMLParser):
+    """
+    增量HTML文本提取器
+    
+    跳过style/script内容，解码实体，合并连续空白；
+    输出超过max_length个字符后标记完成，调用方可停止送入剩余HTML。
+    """
+    
+    def __init__(self, max_length):
+        super().__init__(convert_charrefs=True)
+        self.max_length = max_length
+        self.parts = []
+        self.length = 0
+        self.skip_depth = 0
+        self.last_space = True
+        self.done = False
+    
+    def handle_starttag(self, tag, attrs):
+        if tag in HTML_SKIP_TAGS:
+            self.skip_depth += 1
+        elif tag in HTML_BLOCK_TAGS and not self.last_space:
+            self._emit(' ')
+    
+    def handle_endtag(self, tag):
+        if tag in HTML_SKIP_TAGS:
+            self.skip_depth = max(self.skip_depth - 1, 0)
+        elif tag in HTML_BLOCK_TAGS and not self.last_space:
+            self._emit(' ')
+    
+    def handle_data(self, data):
+        if not self.skip_depth:
+            self._emit(data)
+    
+    def _emit(self, text):
+        if self.done:
+            return
+        
+        text = _WHITESPACE.sub(' ', text)
+        # 与已输出内容衔接处不产生连续空格（开头的空格直接丢弃）
+        if self.last_space and text.startswith(' '):
+            text = text[1:]
+        if not text:
+            return
+        
+        self.parts.append(text)
+        self.length += len(text)
+        self.last_space = text.endswith(' ')
+        # 多保留一个字符，保证去除末尾空格后仍有足够的内容
+        if self.length > self.max_length:
+            self.done = True
+    
+    def text(self):
+        return ''.join(self.parts).rstrip()[:self.max_length]
+
+
+def html_to_text(html, max_length):
+    """
+    HTML转纯文本，并截断到指定长度
+    
+    HTML分段送入增量解析器，得到足够的文本后即停止解析，
+    超长描述中最终会被截掉的部分不会被处理。
+    
+    Args:
+        html: HTML文本
+        max_length: 最大长度
+    
+    Returns:
+        纯文本
+    """
+    if not html or pd.isna(html):
+        return ''
+    
+    html = str(html)
+    parser = _HtmlTextExtractor(max_length)
+    position = 0
+    while True:
+        opening = _SKIPPED_OPEN.search(html, position)
+        if opening is None:
+            break
+        closing = _SKIPPED_CLOSE[opening.group(1).lower()].search(html, opening.end())
+        if closing is None:
+            # 未闭合的块交给解析器处理
+            break
+        if _feed_html(parser, html, position, opening.start()):
+            return parser.text()
+        position = closing.end()
+    
+    if not _feed_html(parser, html, position, len(html)):
+        parser.close()
+    return parser.text()
+
+
+def _feed_html(parser, html, start, end):
+    """把html[start:end]分段送入解析器，已得到足够文本时返回True"""
+    for piece_start in range(start, end, HTML_FEED_SIZE):
+        parser.feed(html[piece_start:min(piece_start + HTML_FEED_SIZE, end)])
+        if parser.done:
+            return True
+    return False
+
+
+def detect_encoding(file_path, encodings=None, sample_size=ENCODING_SAMPLE_SIZE):
     """
     检测文件编码
     
+    只读取有限的字节样本：先检查BOM，再跳过开头的纯ASCII部分，
+    用增量解码器依次尝试候选编码解码第一段非ASCII样本。
+    结果按文件路径和修改时间缓存，同一文件不会重复检测。
+    
+    Args:
+        file_path: 文件路径
+        encodings: 候选编码列表（按优先级排序，默认DEFAULT_ENCODINGS）
+        sample_size: 每次读取的样本字节数
+    
+    Returns:
+        编码名称，所有候选编码都无法解码时返回None
+    """
+    encodings = tuple(encodings or DEFAULT_ENCODINGS)
+    stat = os.stat(file_path)
+    cache_key = (os.path.abspath(file_path), stat.st_mtime_ns, stat.st_size, encodings)
+    if cache_key in _encoding_cache:
+        return _encoding_cache[cache_key]
+    
+    with open(file_path, 'rb') as f:
+        sample = f.read(sample_size)
+        
+        if sample.startswith(codecs.BOM_UTF8) and 'utf-8-sig' in encodings:
+            encoding = 'utf-8-sig'
+        else:
+            # 纯ASCII内容任何候选编码都能解码，继续读取直到出现非ASCII字节
+            # 上一块是纯ASCII，因此新样本一定从完整字符开始
+            while sample.isascii():
+                block = f.read(sample_size)
+                if not block:
+                    break
+                sample = block
+            
+            at_eof = not f.read(1)
+            encoding = None
+            for candidate in encodings:
+                decoder = codecs.getincrementaldecoder(candidate)()
+                try:
+                    # 样本末尾可能截断多字节字符，非文件结尾时不要求解码完整
+                    decoder.decode(sample, final=at_eof)
+                except (UnicodeDecodeError, UnicodeError):
+                    continue
+                encoding = candidate
+                break
+    
+    _encoding_cache[cache_key] = encoding
+    return encoding
+
+
+def read_csv_header(file_path, encoding):
+    """
+    只读取CSV文件的列头
+    
+    Args:
+        file_path: 文件路径
+        encoding: 文件编码
+    
+    Returns:
+        列名列表
+    """
+    with open(file_path, 'r', encoding=encoding, newline='') as f:
+        return next(csv.reader(f), [])
+
+
+def read_csv_columns(file_path, encoding, columns):
+    """
+    只读取CSV文件中的指定列，所有列都按字符串读取（不做类型推断）
+    
+    安装了pyarrow时使用其多线程解析器，否则使用pandas的C解析器。
+    空字段读取为空值。
+    
     Args:
         file_path: 文件路径
+        encoding: 文件编码
+        columns: 要读取的列名列表（必须都存在于文件中）
     
     Returns:
-        编码名称
+        DataFrame
+    """
+    if pa_csv is None:
+        return pd.read_csv(file_path, encoding=encoding, usecols=columns, dtype=str)
+    
+    table = pa_csv.read_csv(
+        file_path,
+        read_options=pa_csv.ReadOptions(encoding=encoding, use_threads=True),
+        parse_options=pa_csv.ParseOptions(newlines_in_values=True),
+        convert_options=pa_csv.ConvertOptions(
+            include_columns=columns,
+            column_types={column: pa.string() for column in columns},
+            strings_can_be_null=True,
+        ),
+    )
+    return table.to_pandas()
+
+
+def read_xlsx_header(file_path):
     """
-    encodings = ['utf-8', 'utf-8-sig', 'gbk', 'gb2312', 'latin1', 'iso-8859-1']
+    只读取Excel文件第一个工作表的列头
     
-    for encoding in encodings:
-        try:
-            with open(file_path, 'r', encoding=encoding) as f:
-                f.read()
-            return encoding
-        except (UnicodeDecodeError, UnicodeError):
-            continue
+    Args:
+        file_path: 文件路径
     
-    return 'utf-8'  # 默认返回utf-8
+    Returns:
+        列名列表（空单元格为空字符串）
+    """
+    workbook = load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        sheet = workbook.worksheets[0]
+        sheet.reset_dimensions()
+        return [_excel_value(value) for value in next(sheet.iter_rows(values_only=True), ())]
+    finally:
+        workbook.close()
+
+
+def read_xlsx_columns(file_path, columns):
+    """
+    只读取Excel文件第一个工作表中的指定列
+    
+    用openpyxl的只读模式逐行读取，只转换指定列的单元格，
+    结果与 pd.read_excel 读取后取这些列相同（类型推断、空值和末尾空行的处理一致）。
+    
+    Args:
+        file_path: 文件路径
+        columns: 要读取的列名列表
+    
+    Returns:
+        DataFrame（列按文件中的顺序）
+    """
+    workbook = load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        sheet = workbook.worksheets[0]
+        sheet.reset_dimensions()
+        rows = sheet.iter_rows(values_only=True)
+        header = [_excel_value(value) for value in next(rows, ())]
+        wanted = set(columns)
+        positions = [i for i, name in enumerate(header) if name in wanted]
+        
+        data = [[header[i] for i in positions]]
+        last_row = 0
+        for row in rows:
+            if any(value is not None and value != '' for value in row):
+                last_row = len(data)
+            data.append([_excel_value(row[i]) if i < len(row) else '' for i in positions])
+        # 去掉末尾的空行（整行为空）
+        del data[last_row + 1:]
+    finally:
+        workbook.close()
+    
+    return TextParser(data, header=0, skip_blank_lines=False).read()
+
+
+def _excel_value(value):
+    """Excel单元格值转换（与pandas读取Excel时相同）：空单元格为空字符串，整数值的浮点数转为整数，错误值为空值"""
+    if value is None:
+        return ''
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    if isinstance(value, str) and value in ERROR_CODES:
+        return np.nan
+    return value
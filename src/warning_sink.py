@@ -0,0 +1,89 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+转换警告汇总模块
+"""
+
+import json
+
+
+class WarningSink:
+    """
+    转换警告汇总器
+    
+    按类别计数并只保留少量样例用于终端输出；
+    提供明细文件路径时，每条警告在产生时即写入JSONL文件（每行一个JSON对象），
+    内存占用与警告数量无关。
+    """
+    
+    # 警告类别及说明（按输出顺序）
+    CATEGORIES = {
+        'illegal_char': 'SKU包含非法字符，已清理',
+        'truncated': 'SKU超过50字符限制，已截断',
+        'collision': 'SKU截断后与已有SKU冲突，已添加序号',
+        'duplicate': 'SKU重复，已去重（保留首次出现的记录）',
+    }
+    
+    # 每个类别在终端显示的样例数
+    SAMPLE_SIZE = 5
+    
+    def __init__(self, detail_path=None):
+        """
+        Args:
+            detail_path: 明细文件路径（可选，有警告时才创建）
+        """
+        self.detail_path = detail_path
+        self.detail_file = None
+        self.counts = {category: 0 for category in self.CATEGORIES}
+        self.samples = {category: [] for category in self.CATEGORIES}
+        # 写入每条记录的附加字段（如批量转换时的店铺名）
+        self.context = {}
+    
+    def add(self, record):
+        """
+        记录一条警告
+        
+        Args:
+            record: 警告字典，type为CATEGORIES中的类别
+        """
+        category = record['type']
+        self.counts[category] += 1
+        if len(self.samples[category]) < self.SAMPLE_SIZE:
+            self.samples[category].append(record)
+        
+        if self.detail_path is not None:
+            if self.detail_file is None:
+                self.detail_file = open(self.detail_path, 'w', encoding='utf-8')
+            self.detail_file.write(json.dumps({**record, **self.context}, ensure_ascii=False) + '\n')
+    
+    def total(self):
+        """警告总数"""
+        return sum(self.counts.values())
+    
+    def close(self):
+        """关闭明细文件"""
+        if self.detail_file is not None:
+            self.detail_file.close()
+            self.detail_file = None
+    
+    def print_summary(self):
+        """按类别打印警告数量和样例"""
+        if not self.total():
+            return
+        
+        print(f"\n⚠ 警告：共 {self.total()} 条SKU警告")
+        for category, description in self.CATEGORIES.items():
+            if not self.counts[category]:
+                continue
+            print(f"  - {description}: {self.counts[category]} 个，例如：")
+            for record in self.samples[category]:
+                print(f"      {self._format_sample(record)}")
+        
+        if self.detail_path is not None:
+            print(f"  完整明细: {self.detail_path}")
+    
+    def _format_sample(self, record):
+        """格式化一条样例"""
+        if record['type'] == 'duplicate':
+            return f"'{record['sku']}'"
+        return f"'{record['source']}' -> '{record['sku']}'"
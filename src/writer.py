@@ -0,0 +1,419 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+输出文件写入模块
+
+提供xlsx和csv两种流式写入器，接口一致：
+按工作表追加DataFrame或行迭代器，已写入的行不会保留在内存中。
+另提供按行数上限拆分输出、在进程池中并行写入各部分的写入器。
+"""
+
+import csv
+import json
+import os
+import numpy as np
+import pandas as pd
+from collections import deque
+from concurrent.futures import wait
+from openpyxl import Workbook
+
+
+# 支持的输出格式
+OUTPUT_FORMATS = ['xlsx', 'csv']
+
+
+def create_writer(output_path, output_format='xlsx'):
+    """
+    根据输出格式创建流式写入器
+    
+    Args:
+        output_path: 输出文件路径
+        output_format: 输出格式（'xlsx' 或 'csv'）
+    
+    Returns:
+        写入器对象
+    """
+    if output_format == 'xlsx':
+        return ExcelStreamWriter(output_path)
+    if output_format == 'csv':
+        return CsvStreamWriter(output_path)
+    raise ValueError(f"不支持的输出格式: {output_format}")
+
+
+def part_path(output_path, index):
+    """拆分输出时第index个部分的文件路径：<文件名>_partNN.<扩展名>"""
+    root, ext = os.path.splitext(output_path)
+    return f"{root}_part{index:02d}{ext}"
+
+
+def manifest_path(output_path):
+    """拆分输出时清单文件的路径：<文件名>_manifest.json"""
+    return f"{os.path.splitext(output_path)[0]}_manifest.json"
+
+
+def write_workbook(output_path, output_format, sheets):
+    """
+    一次写入整个文件（可作为进程池任务）
+    
+    Args:
+        output_path: 输出文件路径
+        output_format: 输出格式（'xlsx' 或 'csv'）
+        sheets: [(工作表名称, DataFrame)]
+    
+    Returns:
+        写入的文件路径列表（csv时每个工作表一个文件）
+    """
+    with create_writer(output_path, output_format) as writer:
+        for sheet_name, df in sheets:
+            writer.write(sheet_name, df)
+    return writer.paths
+
+
+def write_manifest(output_path, parts, max_rows):
+    """
+    写入拆分输出的清单文件
+    
+    Args:
+        output_path: 拆分前的输出文件路径
+        parts: 各部分的信息列表（file、rows、sheets）
+        max_rows: 每个文件的行数上限
+    
+    Returns:
+        清单文件路径
+    """
+    path = manifest_path(output_path)
+    manifest = {
+        'output': os.path.basename(output_path),
+        'max_rows_per_file': max_rows,
+        'total_rows': sum(part['rows'] for part in parts),
+        'parts': parts,
+    }
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    return path
+
+
+def remove_files(paths):
+    """删除存在的文件（放弃写入时清理不完整的输出）"""
+    for path in paths:
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def close_or_discard(writer, exc_type):
+    """
+    写入器退出with语句时调用：没有异常时关闭（保存）输出；
+    出现异常或关闭本身出错时放弃写入，删除不完整的输出
+    """
+    if exc_type is not None:
+        writer.discard()
+        return
+    try:
+        writer.close()
+    except BaseException:
+        writer.discard()
+        raise
+
+
+def frame_rows(df):
+    """逐行生成DataFrame的值，空字符串和空值转换为None（不写入单元格）"""
+    values = df.astype(object)
+    values = values.where(values.notna() & (values != ''), None)
+    return values.itertuples(index=False, name=None)
+
+
+class _StreamWriter:
+    """流式写入器基类"""
+    
+    def __init__(self, output_path):
+        self.output_path = output_path
+        self.paths = []
+    
+    def write(self, sheet_name, df):
+        """新建工作表并写入整个DataFrame"""
+        self.add_sheet(sheet_name, df.columns)
+        self.append(sheet_name, df)
+    
+    def append(self, sheet_name, df, groups=None):
+        """
+        追加DataFrame中的行
+        
+        Args:
+            sheet_name: 工作表名称
+            df: 要追加的数据
+            groups: 每行的分组键（只在拆分写入时使用）
+        """
+        self.append_rows(sheet_name, frame_rows(df))
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        close_or_discard(self, exc_type)
+
+
+class ExcelStreamWriter(_StreamWriter):
+    """
+    流式Excel写入器
+    
+    基于openpyxl的只写（write-only）模式，不构建单元格对象图，
+    值为None的单元格不会写入文件。
+    保存时先写入同目录的临时文件，完成后再替换为输出文件。
+    """
+    
+    def __init__(self, output_path):
+        super().__init__(output_path)
+        self.workbook = Workbook(write_only=True)
+        self.sheets = {}
+        # 保存用的临时文件（按进程号命名，与输出文件的权限相同）
+        self.temp_path = f"{output_path}.{os.getpid()}.tmp"
+        self.paths.append(output_path)
+    
+    def add_sheet(self, sheet_name, columns, index=None):
+        """
+        新建工作表并写入列头
+        
+        Args:
+            sheet_name: 工作表名称
+            columns: 列头列表
+            index: 工作表的位置（可选，默认在最后）
+        """
+        worksheet = self.workbook.create_sheet(title=sheet_name, index=index)
+        worksheet.append(list(columns))
+        self.sheets[sheet_name] = worksheet
+    
+    def append_rows(self, sheet_name, rows):
+        """追加行迭代器中的行（None表示空单元格）"""
+        worksheet = self.sheets[sheet_name]
+        for row in rows:
+            worksheet.append(row)
+    
+    def close(self):
+        """保存到临时文件，完成后替换为输出文件"""
+        self.workbook.save(self.temp_path)
+        os.replace(self.temp_path, self.output_path)
+    
+    def discard(self):
+        """
+        放弃写入：结束各工作表的写入（只写模式的行暂存在openpyxl的临时文件中，进程退出时删除），
+        删除保存中途出错时不完整的临时文件。输出文件只在保存完成后才被替换，出错时不影响已有的同名文件。
+        """
+        for worksheet in self.sheets.values():
+            try:
+                worksheet.close()
+            except Exception:
+                # 保存时已经结束写入的工作表
+                pass
+        remove_files([self.temp_path])
+
+
+class CsvStreamWriter(_StreamWriter):
+    """
+    流式CSV写入器
+    
+    CSV没有工作表的概念：第一个工作表写入output_path，
+    其余工作表写入同目录下的 <文件名>_<工作表名>.csv。
+    使用带BOM的UTF-8编码，便于Excel直接打开中文内容。
+    """
+    
+    def __init__(self, output_path):
+        super().__init__(output_path)
+        self.files = {}
+        self.writers = {}
+    
+    def add_sheet(self, sheet_name, columns, index=None):
+        """
+        新建工作表对应的CSV文件并写入列头
+        
+        Args:
+            sheet_name: 工作表名称
+            columns: 列头列表
+            index: 工作表的位置（CSV文件没有顺序，忽略）
+        """
+        if self.files:
+            root, ext = os.path.splitext(self.output_path)
+            path = f"{root}_{sheet_name}{ext}"
+        else:
+            path = self.output_path
+        
+        f = open(path, 'w', encoding='utf-8-sig', newline='')
+        self.files[sheet_name] = f
+        self.writers[sheet_name] = csv.writer(f)
+        self.writers[sheet_name].writerow(list(columns))
+        self.paths.append(path)
+    
+    def append_rows(self, sheet_name, rows):
+        """追加行迭代器中的行（None写为空字段）"""
+        self.writers[sheet_name].writerows(rows)
+    
+    def close(self):
+        """关闭所有文件"""
+        for f in self.files.values():
+            f.close()
+    
+    def discard(self):
+        """放弃写入：关闭并删除已写入的文件"""
+        self.close()
+        remove_files(self.paths)
+
+
+class PartitionedWriter:
+    """
+    按行数上限拆分输出的写入器
+    
+    第一个工作表（主表）按行数上限拆分为多个文件（<文件名>_partNN），
+    分组键相同的连续行（如同一Handle的变体）总在同一个文件中，
+    单个分组超过上限时单独成为一个文件。每个文件凑满后即提交到进程池写入，
+    多个文件并行写入，同时在写的文件数有上限，内存占用有界。
+    其余工作表（如分类字典）写入最后一个文件。关闭时生成清单文件（<文件名>_manifest.json）。
+    """
+    
+    def __init__(self, output_path, output_format, max_rows, executor=None, max_in_flight=8):
+        """
+        Args:
+            output_path: 拆分前的输出文件路径
+            output_format: 输出格式（'xlsx' 或 'csv'）
+            max_rows: 每个文件主表的行数上限
+            executor: 进程池（可选，不提供时在当前进程中依次写入）
+            max_in_flight: 同时提交写入的文件数上限
+        """
+        if max_rows < 1:
+            raise ValueError(f"每个文件的行数上限必须大于0: {max_rows}")
+        
+        self.output_path = output_path
+        self.output_format = output_format
+        self.max_rows = max_rows
+        self.executor = executor
+        self.max_in_flight = max_in_flight
+        self.sheet_name = None
+        self.columns = None
+        self.pending = []
+        self.pending_rows = 0
+        # 最后一个分组的键、在待写入行中的起始位置和已有行数（分组可能跨越多次append）
+        self.last_key = None
+        self.group_start = 0
+        self.group_rows = 0
+        self.extra_sheets = []
+        self.futures = deque()
+        self.parts = []
+        self.paths = []
+        # 已写完的文件（csv时每个工作表一个文件），放弃写入时删除
+        self.written = []
+        self.oversized_groups = 0
+        self.manifest = None
+    
+    def add_sheet(self, sheet_name, columns):
+        """设置主表的名称和列头"""
+        self.sheet_name = sheet_name
+        self.columns = list(columns)
+    
+    def append(self, sheet_name, df, groups=None):
+        """
+        追加主表的行，凑满行数上限时提交写入
+        
+        Args:
+            sheet_name: 工作表名称（必须是主表）
+            df: 要追加的数据
+            groups: 每行的分组键（可选，不提供时每行单独成组）
+        """
+        if groups is None:
+            keys = None
+            starts = np.arange(len(df))
+        else:
+            keys = np.asarray(groups)
+            starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]]) if len(keys) else np.arange(0)
+        ends = np.r_[starts[1:], len(df)]
+        
+        piece_start = 0
+        for start, end in zip(starts.tolist(), ends.tolist()):
+            size = end - start
+            if start == 0 and keys is not None and self.group_rows and keys[0] == self.last_key:
+                # 上一次append最后一个分组的后续行：放不下时把整个分组移到下一个文件
+                if self.pending_rows + size > self.max_rows and self.group_start > 0:
+                    pending = pd.concat(self.pending)
+                    self.pending = [pending.iloc[:self.group_start]]
+                    self._flush()
+                    self.pending = [pending.iloc[self.group_start:]]
+                    self.pending_rows = len(pending) - self.group_start
+                    self.group_start = 0
+            else:
+                if self.pending_rows and self.pending_rows + size > self.max_rows:
+                    self.pending.append(df.iloc[piece_start:start])
+                    self._flush()
+                    piece_start = start
+                self.group_start = self.pending_rows
+                self.group_rows = 0
+            
+            if self.group_rows <= self.max_rows < self.group_rows + size:
+                self.oversized_groups += 1
+            self.group_rows += size
+            self.pending_rows += size
+        
+        if keys is not None and len(keys):
+            self.last_key = keys[-1]
+        if piece_start < len(df):
+            self.pending.append(df.iloc[piece_start:])
+    
+    def write(self, sheet_name, df):
+        """写入其他工作表（在最后一个文件中）；未设置主表时作为主表写入"""
+        if self.sheet_name is None:
+            self.add_sheet(sheet_name, df.columns)
+            self.append(sheet_name, df)
+        else:
+            self.extra_sheets.append((sheet_name, df))
+    
+    def close(self):
+        """写入最后一个文件，等待全部文件写完并生成清单"""
+        self._flush(self.extra_sheets)
+        while self.futures:
+            self._collect(self.futures.popleft())
+        self.manifest = write_manifest(self.output_path, self.parts, self.max_rows)
+    
+    def discard(self):
+        """
+        放弃写入：取消还未开始的写入任务，等待正在写入的文件写完，删除已写入的文件和清单
+        （写入出错的文件由写入任务自己删除）
+        """
+        for future in self.futures:
+            future.cancel()
+        wait(self.futures)
+        for future in self.futures:
+            if not future.cancelled() and future.exception() is None:
+                self.written.extend(future.result())
+        self.futures.clear()
+        remove_files(self.written + [manifest_path(self.output_path)])
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        close_or_discard(self, exc_type)
+    
+    def _flush(self, extra_sheets=()):
+        """把已累积的行作为一个文件提交写入"""
+        if self.pending:
+            df = pd.concat(self.pending)
+        else:
+            df = pd.DataFrame(columns=self.columns)
+        sheets = [(self.sheet_name, df)] + list(extra_sheets)
+        path = part_path(self.output_path, len(self.parts) + 1)
+        
+        if self.executor is None:
+            self.written.extend(write_workbook(path, self.output_format, sheets))
+        else:
+            self.futures.append(self.executor.submit(write_workbook, path, self.output_format, sheets))
+            while len(self.futures) > self.max_in_flight:
+                self._collect(self.futures.popleft())
+        
+        self.parts.append({
+            'file': os.path.basename(path),
+            'rows': len(df),
+            'sheets': [sheet_name for sheet_name, _ in sheets],
+        })
+        self.paths.append(path)
+        self.pending = []
+        self.pending_rows = 0
+    
+    def _collect(self, future):
+        """等待一个写入任务完成，记录写入的文件（写入出错时抛出异常）"""
+        self.written.extend(future.result())
@@ -7,12 +7,33 @@
 
 import sys
 import os
+import datetime
+import random
+import tempfile
+import pandas as pd
+from difflib import SequenceMatcher
 
 # 添加src目录到路径
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
 
 from src.converter import ShopifyToLingxinConverter
 from src.matcher import ProductMatcher
+from src.match_keys import normalize_barcode, normalize_title, key_text
+from src.fuzzy_index import TitleIndex
+from src.frame_cache import FrameCache
+from src.writer import create_writer
+
+
+# 同一个条形码的不同写法（带前导零的文本、Excel按数字保存、省略校验位、带短横线），配对键应相同
+BARCODE_GROUPS = {
+    'EAN-8': ['01234565', 1234565, 1234565.0, '0123456', '00000001234565'],
+    'UPC-A': ['012345678905', 12345678905, 12345678905.0, '01234567890', '0012345678905', '0-12345-67890-5'],
+    'EAN-13': ['0401234567893', 401234567893, 401234567893.0, '040123456789', '00401234567893'],
+    'EAN-13（无前导零）': ['4006381333931', 4006381333931, 4006381333931.0, '400638133393'],
+}
+
+# 不同的条形码，配对键应不同（只有7位、11位、12位的数字码补校验位；含字母的条形码区分大小写）
+BARCODE_DISTINCT = [('1234', '12348'), ('4006381333932', '40063813339320'), ('abc123', 'ABC123')]
 
 
 def test_converter():
@@ -77,6 +98,335 @@ def test_matcher():
         return False
 
 
+def check_barcode_keys():
+    """检查条形码配对键：同一个条形码的不同写法配对键相同"""
+    print("\n" + "="*60)
+    print("测试条形码配对键")
+    print("="*60)
+    
+    passed = True
+    for name, values in BARCODE_GROUPS.items():
+        keys = {value: normalize_barcode(key_text(value)) for value in values}
+        if len(set(keys.values())) == 1:
+            print(f"✓ {name}: {next(iter(keys.values()))}")
+        else:
+            passed = False
+            print(f"✗ {name}: " + ', '.join(f"{value!r} -> {key}" for value, key in keys.items()))
+    
+    for first, second in BARCODE_DISTINCT:
+        keys = normalize_barcode(first), normalize_barcode(second)
+        if keys[0] != keys[1]:
+            print(f"✓ {first!r} 与 {second!r} 不同: {keys[0]}, {keys[1]}")
+        else:
+            passed = False
+            print(f"✗ {first!r} 与 {second!r} 的配对键相同: {keys[0]}")
+    return passed
+
+
+def test_barcode_keys():
+    """测试条形码配对键"""
+    assert check_barcode_keys()
+
+
+def check_blank_erp_keys():
+    """检查ERP配对列全部为空或ERP文件没有商品时，各配对方法正常完成、全部商品未配对"""
+    print("\n" + "="*60)
+    print("测试ERP配对列为空")
+    print("="*60)
+    
+    passed = True
+    with tempfile.TemporaryDirectory() as directory:
+        platform_file = os.path.join(directory, 'shopify.csv')
+        pd.DataFrame({
+            'Handle': ['red-mug', 'blue-lamp'],
+            'Title': ['Red Mug', 'Blue Lamp'],
+            'Variant SKU': ['S1', 'S2'],
+            'Variant Barcode': ['012345678905', '4006381333931'],
+        }).to_csv(platform_file, index=False)
+        
+        erp_files = {
+            '条形码列为空': pd.DataFrame({'*SKU': ['X1', 'X2'], '品名': ['Green Cup', 'Desk Fan'], '识别码': [None, None]}),
+            'SKU列为空': pd.DataFrame({'*SKU': [None, None], '品名': ['Green Cup', 'Desk Fan'], '识别码': [None, None]}),
+            '没有商品': pd.DataFrame({'*SKU': [], '品名': [], '识别码': []}),
+        }
+        for name, erp_df in erp_files.items():
+            erp_file = os.path.join(directory, f'{name}.xlsx')
+            erp_df.to_excel(erp_file, index=False)
+            for method in ['sku', 'barcode', 'cascade']:
+                for erp_index in [None, os.path.join(directory, f'{name}.idx')]:
+                    output_path = os.path.join(directory, 'result.csv')
+                    try:
+                        ProductMatcher(cache_dir=None).match(platform_file, erp_file, output_path=output_path,
+                                                             match_method=method, shop_name='Test',
+                                                             output_format='csv', erp_index=erp_index)
+                        details = pd.read_csv(os.path.join(directory, 'result_配对详情.csv'))
+                        ok = (details['配对状态'] == '未配对').all()
+                    except Exception as e:
+                        print(f"✗ {name} {method}: {type(e).__name__}: {e}")
+                        ok = False
+                    passed = passed and ok
+    
+    print(f"\n{'✓' if passed else '✗'} ERP配对列为空时全部商品未配对")
+    return passed
+
+
+def test_blank_erp_keys():
+    """测试ERP配对列为空"""
+    assert check_blank_erp_keys()
+
+
+def check_empty_platform():
+    """检查平台文件没有商品时，各配对方法都输出列齐全的空结果"""
+    print("\n" + "="*60)
+    print("测试平台文件没有商品")
+    print("="*60)
+    
+    passed = True
+    with tempfile.TemporaryDirectory() as directory:
+        platform_file = os.path.join(directory, 'shopify.csv')
+        pd.DataFrame(columns=['Handle', 'Title', 'Variant SKU', 'Variant Barcode']).to_csv(platform_file, index=False)
+        erp_file = os.path.join(directory, 'erp.xlsx')
+        pd.DataFrame({'*SKU': ['X1'], '品名': ['Green Cup'], '识别码': ['012345678905']}).to_excel(erp_file, index=False)
+        
+        for method in ['sku', 'barcode', 'title', 'fuzzy', 'cascade']:
+            try:
+                ProductMatcher(cache_dir=None).match(platform_file, erp_file,
+                                                     output_path=os.path.join(directory, 'result.csv'),
+                                                     match_method=method, shop_name='Test', output_format='csv')
+                details = pd.read_csv(os.path.join(directory, 'result_配对详情.csv'))
+                ok = len(details) == 0 and {'配对状态', '平台SKU', 'ERP SKU', '匹配度'} <= set(details.columns)
+            except Exception as e:
+                print(f"✗ {method}: {type(e).__name__}: {e}")
+                ok = False
+            passed = passed and ok
+    
+    print(f"\n{'✓' if passed else '✗'} 平台文件没有商品时输出空结果")
+    return passed
+
+
+def test_empty_platform():
+    """测试平台文件没有商品"""
+    assert check_empty_platform()
+
+
+def check_header_only_export():
+    """检查只有表头的Shopify导出文件在多进程转换时正常完成"""
+    print("\n" + "="*60)
+    print("测试只有表头的导出文件")
+    print("="*60)
+    
+    passed = True
+    with tempfile.TemporaryDirectory() as directory:
+        shopify_csv = os.path.join(directory, 'shopify.csv')
+        pd.DataFrame(columns=ShopifyToLingxinConverter.REQUIRED_COLUMNS).to_csv(shopify_csv, index=False)
+        for name, options in [('一次读取', {}), ('分块读取', {'stream': True})]:
+            try:
+                output_path = ShopifyToLingxinConverter().convert(
+                    shopify_csv, os.path.join(directory, 'lingxin.csv'), output_format='csv', workers=2, **options)
+                ok = len(pd.read_csv(output_path)) == 0
+            except Exception as e:
+                print(f"✗ {name}: {type(e).__name__}: {e}")
+                ok = False
+            passed = passed and ok
+    
+    print(f"\n{'✓' if passed else '✗'} 只有表头的导出文件转换为空表")
+    return passed
+
+
+def test_header_only_export():
+    """测试只有表头的导出文件"""
+    assert check_header_only_export()
+
+
+def check_sku_collisions():
+    """检查截断后冲突的SKU序号：同一个转换器再次转换时从-01开始，超过99个冲突时仍不重复"""
+    print("\n" + "="*60)
+    print("测试SKU截断冲突序号")
+    print("="*60)
+    
+    prefix = 'A' * 50
+    passed = True
+    with tempfile.TemporaryDirectory() as directory:
+        def shopify_csv(name, count):
+            """count个截断后相同的SKU（每个商品一个Handle）"""
+            path = os.path.join(directory, f'{name}.csv')
+            df = pd.DataFrame('', index=range(count), columns=ShopifyToLingxinConverter.REQUIRED_COLUMNS)
+            df['Handle'] = [f'p{i}' for i in range(count)]
+            df['Title'] = 'Mug'
+            df['Variant SKU'] = [f'{prefix}{i:03d}' for i in range(count)]
+            df.to_csv(path, index=False)
+            return path
+        
+        def convert_skus(converter, path, **options):
+            output_path = converter.convert(path, os.path.join(directory, 'lingxin.csv'), output_format='csv',
+                                            **options)
+            return pd.read_csv(output_path, dtype=str, keep_default_na=False)['*SKU'].tolist()
+        
+        expected = [prefix] + [f'{prefix[:47]}-{i:02d}' for i in range(1, 6)]
+        converter = ShopifyToLingxinConverter()
+        small = shopify_csv('small', 6)
+        for run, options in [('第一次转换', {}), ('再次转换', {}), ('再次转换（流式）', {'stream': True})]:
+            skus = convert_skus(converter, small, **options)
+            ok = skus == expected
+            print(f"{'✓' if ok else '✗'} {run}: {skus[1]} ... {skus[-1]}")
+            passed = passed and ok
+        
+        skus = convert_skus(converter, shopify_csv('large', 105))
+        ok = len(set(skus)) == 105 and max(len(sku) for sku in skus) <= 50 and skus[-1] == f'{prefix[:46]}-104'
+        print(f"{'✓' if ok else '✗'} 105个冲突的SKU: 最后一个为 {skus[-1]}，共 {len(set(skus))} 个不同的SKU")
+        passed = passed and ok
+    
+    return passed
+
+
+def test_sku_collisions():
+    """测试SKU截断冲突序号"""
+    assert check_sku_collisions()
+
+
+def check_repeated_counts():
+    """检查同一个转换器再次转换时分类字典的SKU数和增量统计不会累计上一次的结果"""
+    print("\n" + "="*60)
+    print("测试再次转换的统计")
+    print("="*60)
+    
+    passed = True
+    with tempfile.TemporaryDirectory() as directory:
+        shopify_csv = os.path.join(directory, 'shopify.csv')
+        df = pd.DataFrame('', index=range(3), columns=ShopifyToLingxinConverter.REQUIRED_COLUMNS)
+        df['Handle'] = ['mug', 'lamp', 'cup']
+        df['Variant SKU'] = ['S1', 'S2', 'S3']
+        df['Product Category'] = 'Home > Kitchen'
+        df.to_csv(shopify_csv, index=False)
+        
+        converter = ShopifyToLingxinConverter()
+        for run in ['第一次转换', '再次转换']:
+            converter.convert(shopify_csv, os.path.join(directory, 'lingxin.csv'), output_format='csv',
+                              since=shopify_csv)
+            categories = pd.read_csv(os.path.join(directory, 'lingxin_分类字典.csv'))
+            ok = categories['SKU数'].tolist() == [3] and converter.delta_counts['未变'] == 3
+            print(f"{'✓' if ok else '✗'} {run}: 分类SKU数 {categories['SKU数'].tolist()}，未变 {converter.delta_counts['未变']}")
+            passed = passed and ok
+    
+    return passed
+
+
+def test_repeated_counts():
+    """测试再次转换的统计"""
+    assert check_repeated_counts()
+
+
+def check_writer_discard():
+    """检查写入出错时不留下不完整的输出，已有的同名文件保持不变"""
+    print("\n" + "="*60)
+    print("测试写入出错时的输出")
+    print("="*60)
+    
+    passed = True
+    with tempfile.TemporaryDirectory() as directory:
+        for output_format in ['xlsx', 'csv']:
+            output_path = os.path.join(directory, f'result.{output_format}')
+            with create_writer(output_path, output_format) as writer:
+                writer.write('产品', pd.DataFrame({'*SKU': ['S1']}))
+            with open(output_path, 'rb') as f:
+                before = f.read()
+            
+            try:
+                with create_writer(output_path, output_format) as writer:
+                    writer.write('产品', pd.DataFrame({'*SKU': ['S2']}))
+                    raise KeyboardInterrupt
+            except KeyboardInterrupt:
+                pass
+            
+            if output_format == 'xlsx':
+                with open(output_path, 'rb') as f:
+                    ok = f.read() == before
+            else:
+                # CSV逐行写入输出文件，出错时删除
+                ok = not os.path.exists(output_path)
+            ok = ok and not [name for name in os.listdir(directory) if name.endswith('.tmp')]
+            print(f"{'✓' if ok else '✗'} {output_format}")
+            passed = passed and ok
+    
+    return passed
+
+
+def test_writer_discard():
+    """测试写入出错时的输出"""
+    assert check_writer_discard()
+
+
+def check_mixed_columns():
+    """检查数字和文字混合的列写入缓存文件后读取的值和类型不变"""
+    print("\n" + "="*60)
+    print("测试混合类型列的缓存")
+    print("="*60)
+    
+    values = ['SKU-1', 6901234567890, 6901234567890.0, True, None, '带\x00分隔符',
+              datetime.datetime(2024, 1, 2, 3, 4, 5), pd.Timestamp('2024-01-02'), datetime.date(2024, 1, 2)]
+    frame = pd.DataFrame({'识别码': values, '数量': range(len(values))})
+    
+    with tempfile.TemporaryDirectory() as directory:
+        cache = FrameCache(directory)
+        cache.put('mixed', frame)
+        loaded = cache.get('mixed', list(frame.columns))
+    
+    passed = True
+    for original, value in zip(values, loaded['识别码']):
+        ok = pd.isna(value) if original is None else (type(value) is type(original) and value == original)
+        if not ok:
+            passed = False
+            print(f"✗ {original!r} 读取为 {value!r}")
+    passed = passed and loaded['数量'].tolist() == list(range(len(values)))
+    
+    print(f"{'✓' if passed else '✗'} 混合类型列读取的值与写入时相同")
+    return passed
+
+
+def test_mixed_columns():
+    """测试混合类型列的缓存"""
+    assert check_mixed_columns()
+
+
+def check_fuzzy_exhaustive():
+    """检查品名索引的模糊配对结果与逐一比较全部ERP品名相同"""
+    print("\n" + "="*60)
+    print("测试模糊配对与逐一比较一致")
+    print("="*60)
+    
+    threshold = 0.8
+    words = ['蓝色', '红色', '运动', '鞋', '男款', '女款', '加厚', '的', '款', '保温', '杯', 'mug', 'red', ' ']
+    rng = random.Random(0)
+    erp_titles = ['蓝色 运动 鞋 男款', '加厚的运动款鞋']
+    erp_titles += [''.join(rng.choices(words, k=rng.randint(1, 6))) for _ in range(300)]
+    platform_titles = ['蓝色运动鞋男款', '加厚运动鞋']
+    platform_titles += [''.join(rng.choices(words, k=rng.randint(1, 6))) for _ in range(200)]
+    erp_titles = [normalize_title(title) for title in erp_titles]
+    platform_titles = [normalize_title(title) for title in platform_titles]
+    
+    positions, ratios = TitleIndex(erp_titles).best_matches(platform_titles, threshold=threshold)
+    
+    passed = True
+    for title, position, ratio in zip(platform_titles, positions, ratios):
+        # 逐一比较：相似度最高、相同时靠前的ERP品名
+        scores = [SequenceMatcher(None, title, erp_title).ratio() if title and erp_title else 0.0
+                  for erp_title in erp_titles]
+        best = max(scores)
+        expected = (scores.index(best), best) if best >= threshold else None
+        found = (position, ratio) if ratio >= threshold else None
+        if found != expected:
+            passed = False
+            print(f"✗ {title!r}: 索引 {found}，逐一比较 {expected}")
+    
+    print(f"{'✓' if passed else '✗'} {len(platform_titles)}个品名的配对结果与逐一比较相同")
+    return passed
+
+
+def test_fuzzy_exhaustive():
+    """测试模糊配对与逐一比较一致"""
+    assert check_fuzzy_exhaustive()
+
+
 def main():
     """主测试函数"""
     print("\n" + "🔧 开始测试工具功能...\n")
@@ -89,6 +439,33 @@ def main():
     # 测试配对功能
     results.append(("配对功能", test_matcher()))
     
+    # 测试条形码配对键
+    results.append(("条形码配对键", check_barcode_keys()))
+    
+    # 测试ERP配对列为空
+    results.append(("ERP配对列为空", check_blank_erp_keys()))
+    
+    # 测试平台文件没有商品
+    results.append(("平台文件没有商品", check_empty_platform()))
+    
+    # 测试只有表头的导出文件
+    results.append(("只有表头的导出文件", check_header_only_export()))
+    
+    # 测试SKU截断冲突序号
+    results.append(("SKU截断冲突序号", check_sku_collisions()))
+    
+    # 测试再次转换的统计
+    results.append(("再次转换的统计", check_repeated_counts()))
+    
+    # 测试写入出错时的输出
+    results.append(("写入出错时的输出", check_writer_discard()))
+    
+    # 测试混合类型列的缓存
+    results.append(("混合类型列的缓存", check_mixed_columns()))
+    
+    # 测试模糊配对与逐一比较一致
+    results.append(("模糊配对与逐一比较一致", check_fuzzy_exhaustive()))
+    
     # 打印测试结果
     print("\n" + "="*60)
     print("测试结果汇总")